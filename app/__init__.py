@@ -12,10 +12,16 @@ from app.controllers.user import UserController
 
 from app.controllers.category import CategoryController
 from app.controllers.review import ReviewController
+from app.controllers.metrics import MetricsController
 
 
-from app.db import sqlalchemy_plugin
-from app.security import oauth2_auth
+from app.db import instrument_engine, sqlalchemy_plugin
+from app.jobs import overdue_sweeper
+from app.metrics import request_metrics
+from app.query_debug import query_detector
+from app.passwords import password_pool
+from app.replicas import replica_router
+from app.security import oauth2_auth, token_revocations
 
 openapi_config = OpenAPIConfig(
     title="Mi API",
@@ -34,9 +40,25 @@ app = Litestar(
         AuthController,
         CategoryController,
         ReviewController,
+        MetricsController,
     ],
     openapi_config=openapi_config,
     debug=settings.debug,
     plugins=[sqlalchemy_plugin],
-    on_app_init=[oauth2_auth.on_app_init],
+    # Cada uno inserta su middleware al principio: el último queda más externo.
+    # El enrutado a réplicas envuelve la autenticación, así la carga del usuario también lee de la réplica.
+    on_app_init=[
+        oauth2_auth.on_app_init,
+        replica_router.on_app_init,
+        request_metrics.on_app_init,
+        query_detector.on_app_init,
+    ],
+    on_startup=[
+        instrument_engine,
+        replica_router.instrument,
+        overdue_sweeper.start,
+        replica_router.start,
+        token_revocations.start,
+    ],
+    on_shutdown=[overdue_sweeper.stop, replica_router.stop, token_revocations.stop, password_pool.shutdown],
 )
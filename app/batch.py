@@ -0,0 +1,145 @@
+"""Item shapes and per-item results of the ``/batch`` endpoints.
+
+A batch is ``{"create": [...], "update": [...], "delete": [ids]}``. Every
+item is converted on its own, so a malformed item fails alone; the rest are
+checked with the same rules as the single-item endpoints and written by the
+repository with one bulk statement per kind of change, in one transaction.
+"""
+
+from datetime import date
+from typing import Any, TypeVar
+
+import msgspec
+from litestar.exceptions import ValidationException
+from msgspec import UNSET, UnsetType
+
+from app.config import settings
+from app.models import BatchItemResult, BatchReport, BatchRequest, LoanStatus
+
+S = TypeVar("S", bound=msgspec.Struct)
+
+OPERATIONS = ("create", "update", "delete")
+
+
+class BookChanges(msgspec.Struct, forbid_unknown_fields=True):
+    """Partial update of one book."""
+
+    id: int
+    title: str | UnsetType = UNSET
+    author: str | UnsetType = UNSET
+    isbn: str | UnsetType = UNSET
+    pages: int | UnsetType = UNSET
+    published_year: int | UnsetType = UNSET
+    stock: int | UnsetType = UNSET
+    description: str | None | UnsetType = UNSET
+    language: str | UnsetType = UNSET
+    publisher: str | None | UnsetType = UNSET
+
+
+class NewLoan(msgspec.Struct, forbid_unknown_fields=True):
+    """Loan to create; due date, status and fine are set as in ``POST /loans``."""
+
+    user_id: int
+    book_id: int
+    loan_dt: date = msgspec.field(default_factory=date.today)
+    return_dt: date | None = None
+
+
+class LoanChanges(msgspec.Struct, forbid_unknown_fields=True):
+    """Status change of one loan, the only update ``PATCH /loans/{id}`` allows."""
+
+    id: int
+    status: LoanStatus
+
+
+class NewReview(msgspec.Struct, forbid_unknown_fields=True):
+    """Review to create; its date is the current one, as in ``POST /reviews``."""
+
+    user_id: int
+    book_id: int
+    rating: int
+    comment: str
+
+
+class ReviewChanges(msgspec.Struct, forbid_unknown_fields=True):
+    """Partial update of one review."""
+
+    id: int
+    user_id: int | UnsetType = UNSET
+    book_id: int | UnsetType = UNSET
+    rating: int | UnsetType = UNSET
+    comment: str | UnsetType = UNSET
+    review_date: date | UnsetType = UNSET
+
+
+def changes(item: msgspec.Struct) -> dict[str, Any]:
+    """Fields sent in a partial update, without its ``id``."""
+    return {
+        name: getattr(item, name)
+        for name in item.__struct_fields__
+        if name != "id" and getattr(item, name) is not UNSET
+    }
+
+
+def not_found(id: int) -> str:
+    """Detail of a missing row, the same the single-item endpoints return."""
+    return f"No item found when filtering by id={id}"
+
+
+class BatchResults:
+    """Per-item results of a batch, filled in by the controller and the repository."""
+
+    def __init__(self, data: BatchRequest) -> None:
+        size = len(data.create) + len(data.update) + len(data.delete)
+        if size > settings.batch_max_items:
+            raise ValidationException(detail=f"Máximo {settings.batch_max_items} operaciones por lote.")
+        self._results: list[BatchItemResult] = []
+        self._ids: set[int] = set()
+
+    def succeed(self, operation: str, index: int, status: int, id: int) -> None:
+        """Record that item ``index`` of ``operation`` was applied."""
+        self._results.append(BatchItemResult(operation, index, status, id=id))
+
+    def fail(self, operation: str, index: int, status: int, detail: str, id: int | None = None) -> None:
+        """Record that item ``index`` of ``operation`` was rejected."""
+        self._results.append(BatchItemResult(operation, index, status, id=id, detail=detail))
+
+    def parse(self, operation: str, items: list[Any], shape: type[S]) -> list[tuple[int, S]]:
+        """Convert ``items`` to ``shape``, failing the malformed ones.
+
+        Updates and deletes of an id already used by another item of the
+        batch fail too: their order inside the bulk statements is not defined.
+        """
+        parsed = []
+        for index, item in enumerate(items):
+            try:
+                value = msgspec.convert(item, shape)
+            except msgspec.ValidationError as exc:
+                self.fail(operation, index, 400, str(exc))
+                continue
+            id = getattr(value, "id", None)
+            if id is not None and not self._claim(operation, index, id):
+                continue
+            parsed.append((index, value))
+        return parsed
+
+    def parse_ids(self, ids: list[int]) -> list[tuple[int, int]]:
+        """Deletes of the batch, failing the ids already used by another item."""
+        return [(index, id) for index, id in enumerate(ids) if self._claim("delete", index, id)]
+
+    def _claim(self, operation: str, index: int, id: int) -> bool:
+        if id in self._ids:
+            self.fail(operation, index, 400, f"El id {id} aparece más de una vez en el lote.", id=id)
+            return False
+        self._ids.add(id)
+        return True
+
+    def ids(self) -> set[int]:
+        """Ids of the rows the batch created, updated or deleted."""
+        return {result.id for result in self._results if result.detail is None and result.id is not None}
+
+    def report(self) -> BatchReport:
+        """Results in request order: creates, then updates, then deletes."""
+        results = sorted(self._results, key=lambda result: (OPERATIONS.index(result.operation), result.index))
+        failed = sum(result.detail is not None for result in results)
+        return BatchReport(succeeded=len(results) - failed, failed=failed, results=results)
@@ -0,0 +1,190 @@
+"""Conditional GET (``ETag`` / ``Last-Modified``) for read endpoints.
+
+Handlers opt in with a route middleware::
+
+    @get("/{id:int}", middleware=[conditional_get(entity_version(BookRepository))])
+
+The validators are a hash of the keys and ``updated_at`` of the rows and of
+their read relationships (see :meth:`AsyncRepository.get_version`). For a
+request with ``If-None-Match`` or ``If-Modified-Since`` the middleware reads
+them with one metadata query before the handler and, if they still match,
+answers ``304 Not Modified`` without loading or serializing anything. Other
+requests run no extra query: the validators are computed from the rows the
+handler loaded (only when it skipped a read relationship, e.g. with
+``?fields=``, the metadata query runs before the response is sent).
+"""
+
+import hashlib
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any
+
+from litestar import Request
+from litestar.exceptions import ValidationException
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import ColumnElement, Select, select
+
+from app.db import sqlalchemy_config
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.repositories import AsyncRepository, VersionCapture, VersionRow, version_capture
+
+
+@dataclass(frozen=True)
+class Version:
+    """Validators of one representation of a resource."""
+
+    etag: str
+    last_modified: datetime | None
+
+    def matches(self, request: Request) -> bool:
+        """Whether the client's cached copy is still current (RFC 9110, 13.2.2)."""
+        # If-None-Match tiene prioridad; If-Modified-Since solo se mira sin él.
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag.removeprefix("W/") in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # Las fechas HTTP tienen resolución de segundos.
+        return self.last_modified.replace(microsecond=0) <= since
+
+    def headers(self) -> list[tuple[bytes, bytes]]:
+        """Raw ``ETag`` / ``Last-Modified`` headers for the ASGI response."""
+        headers = [(b"etag", self.etag.encode())]
+        if self.last_modified is not None:
+            headers.append((b"last-modified", format_datetime(self.last_modified, usegmt=True).encode()))
+        return headers
+
+    @classmethod
+    def from_headers(cls, headers: list[tuple[bytes, bytes]]) -> "Version | None":
+        """Validators stored with a response (e.g. by the response cache), if it has them."""
+        values = {bytes(name).lower(): bytes(value).decode() for name, value in headers}
+        if b"etag" not in values:
+            return None
+        last_modified = parsedate_to_datetime(values[b"last-modified"]) if b"last-modified" in values else None
+        return cls(etag=values[b"etag"], last_modified=last_modified)
+
+
+def is_conditional(request: Request) -> bool:
+    """Whether the request carries ``If-None-Match`` or ``If-Modified-Since``."""
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+PageFilters = Callable[[Request], tuple[ColumnElement[bool], ...] | None]
+
+
+@dataclass(frozen=True)
+class VersionSource:
+    """Rows whose version validates a representation: one entity or one page."""
+
+    repository: type[AsyncRepository]
+    # SELECT de los ids de la representación, o None si no se valida.
+    select_ids: Callable[[AsyncRepository, Request], Select[Any] | None]
+    entity: bool = False
+
+    def version(self, request: Request, rows: list[VersionRow]) -> Version | None:
+        """Validators of ``rows``; ``None`` for an entity that does not exist (the handler returns the 404)."""
+        if self.entity and not rows:
+            return None
+        # La query string entra en el ETag: ?fields=, limit y cursor cambian la representación.
+        key = (request.url.path, request.url.query, [(*row[:3], row[3] and row[3].isoformat()) for row in rows])
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16)
+        timestamps = [updated_at for *_, updated_at in rows if updated_at is not None]
+        return Version(etag=f'W/"{digest.hexdigest()}"', last_modified=max(timestamps, default=None))
+
+
+def entity_version(repository: type[AsyncRepository]) -> VersionSource:
+    """Version of the entity at ``/{id}``."""
+
+    def select_ids(repo: AsyncRepository, request: Request) -> Select[Any]:
+        model = repo.model_type
+        return select(model.id).where(model.id == request.path_params["id"])
+
+    return VersionSource(repository, select_ids, entity=True)
+
+
+def page_version(repository: type[AsyncRepository], filters: PageFilters | None = None) -> VersionSource:
+    """Version of a keyset page (``?cursor=&limit=``) of :meth:`AsyncRepository.list_page`.
+
+    ``filters`` gives the filters the handler applies for the request's
+    query parameters, or ``None`` for requests that must not be validated
+    (their representation depends on more than the page rows).
+    """
+
+    def select_ids(repo: AsyncRepository, request: Request) -> Select[Any] | None:
+        try:
+            limit = int(request.query_params.get("limit", DEFAULT_PAGE_SIZE))
+            page_filters = filters(request) if filters else ()
+        except ValueError:
+            return None
+        if not 1 <= limit <= MAX_PAGE_SIZE or page_filters is None:
+            return None
+        try:
+            return repo.page_ids(*page_filters, cursor=request.query_params.get("cursor"), limit=limit)
+        except ValidationException:
+            # El handler devuelve el 400 del cursor inválido.
+            return None
+
+    return VersionSource(repository, select_ids)
+
+
+def conditional_get(source: VersionSource) -> Callable[[ASGIApp], ASGIApp]:
+    """Route middleware answering conditional requests with ``304`` from ``source``."""
+
+    def middleware(app: ASGIApp) -> ASGIApp:
+        async def handle(scope: Scope, receive: Receive, send: Send) -> None:
+            request: Request = Request(scope, receive)
+            # Misma sesión que usará el handler; crearla no abre una conexión.
+            session = sqlalchemy_config.provide_session(request.app.state, scope)
+            repo = source.repository(session=session)
+            ids = source.select_ids(repo, request)
+            if ids is None:
+                await app(scope, receive, send)
+                return
+
+            current: Version | None = None
+            if is_conditional(request):
+                try:
+                    current = source.version(request, await repo.get_version(ids))
+                finally:
+                    # El commit libera la conexión mientras corre el resto del request.
+                    await session.commit()
+                if current is None:
+                    await app(scope, receive, send)
+                    return
+                if current.matches(request):
+                    await send({"type": "http.response.start", "status": 304, "headers": current.headers()})
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                    return
+
+            capture = VersionCapture(source.repository)
+
+            async def send_with_validators(message: Message) -> None:
+                if message["type"] == "http.response.start" and message["status"] == 200:
+                    version = current
+                    if version is None:
+                        rows = capture.rows if capture.rows is not None else await repo.get_version(ids)
+                        version = source.version(request, rows)
+                    if version is not None:
+                        message["headers"] = [*message.get("headers", []), *version.headers()]
+                await send(message)
+
+            token = version_capture.set(capture)
+            try:
+                await app(scope, receive, send_with_validators)
+            finally:
+                version_capture.reset(token)
+
+        return handle
+
+    return middleware
@@ -1,18 +1,94 @@
 """Application configuration using Pydantic Settings."""
 
+from decimal import Decimal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     """Main application settings."""
     debug: bool = False
+    # Detector de N+1 y consultas lentas (sólo con debug): repeticiones de una
+    # misma sentencia, sentencias por request y milisegundos por sentencia.
+    query_debug_repeat_threshold: int = 5
+    query_debug_budget: int = 20
+    query_debug_slow_ms: float = 100.0
     jwt_secret: str = "secret123"
+    # Modo JWT sin estado: el token lleva id, is_active y versión de la
+    # contraseña, y se valida contra una lista de revocaciones en memoria
+    # que se recarga cada tantos segundos.
+    jwt_stateless: bool = False
+    jwt_revocation_refresh_interval: float = 30.0
     database_url: str = "postgresql+psycopg:///bd2_library_db"
+    # URL usada por el engine async de la API. Si no se define se deriva de
+    # database_url (psycopg 3 ya soporta async; SQLite usa aiosqlite).
+    async_database_url: str | None = None
+    # Pool de conexiones del engine async (por worker): conexiones fijas y
+    # extra, segundos de espera por una conexión, segundos antes de reciclarla,
+    # ping al sacarla del pool y timeout de conexión (PostgreSQL).
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_connect_timeout: float = 10.0
+    # Réplicas de lectura (URLs separadas por comas) para los GET, segundos
+    # entre chequeos de salud y retraso máximo tolerado (PostgreSQL).
+    read_database_url: str | None = None
+    read_replica_check_interval: float = 5.0
+    read_replica_max_lag: float = 30.0
+    # Segundos que se reutiliza el snapshot de /books/stats entre escrituras.
+    book_stats_ttl: float = 300.0
+    # Caché de usuarios autenticados (retrieve_user_handler). El TTL acota cuánto
+    # tarda otro worker en ver una baja, desactivación o cambio de contraseña.
+    user_cache_size: int = 1024
+    user_cache_ttl: float = 10.0
+    # Caché de respuestas (GET /books/recent, /books/stats, /books/{id},
+    # /categories/): tamaño máximo en bytes, segundos de vida y backend
+    # compartido opcional (redis://... o file:///ruta); sin URL es en memoria.
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_ttl: float = 300.0
+    response_cache_url: str | None = None
+    # Hashing de contraseñas (Argon2) y pool de workers dedicado.
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536
+    argon2_parallelism: int = 4
+    password_hash_workers: int = 2
+    password_hash_queue_size: int = 16
+    # Importación masiva de libros: filas por INSERT, máximo de errores reportados
+    # y caracteres de una línea o registro CSV (acota la memoria por fila).
+    book_import_chunk_size: int = 1000
+    book_import_max_errors: int = 1000
+    book_import_max_record_size: int = 65536
+    # Operaciones (altas, cambios y bajas) por solicitud en los endpoints /batch.
+    batch_max_items: int = 1000
+    # Filas por lote del cursor de servidor en los endpoints de exportación.
+    export_batch_size: int = 1000
+    # Barrido de préstamos vencidos: multa diaria, filas por transacción y
+    # segundos entre barridos (0 lo desactiva).
+    loan_fine_per_day: Decimal = Decimal("0.50")
+    overdue_sweep_chunk_size: int = 1000
+    overdue_sweep_interval: float = 3600.0
 
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
     )
 
+    @property
+    def async_url(self) -> str:
+        """Connection string for the async engine."""
+        if self.async_database_url:
+            return self.async_database_url
+        if self.database_url.startswith("sqlite://"):
+            return self.database_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+        return self.database_url
+
+    @property
+    def read_async_urls(self) -> list[str]:
+        """Connection strings of the read replicas, converted like :attr:`async_url`."""
+        urls = [url.strip() for url in (self.read_database_url or "").split(",") if url.strip()]
+        return [url.replace("sqlite://", "sqlite+aiosqlite://", 1) if url.startswith("sqlite://") else url for url in urls]
+
 
 settings = Settings()  # type: ignore
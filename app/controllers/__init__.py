@@ -5,6 +5,25 @@ from typing import Any
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
 from litestar import Request, Response
 
+from app.response_cache import response_cache
+
+# Etiquetas de la caché de respuestas: listados/agregados de libros, todos los
+# GET /books/{id} y todo lo que incluye categorías.
+BOOKS_TAG = "books"
+BOOK_DETAILS_TAG = "books:detail"
+CATEGORIES_TAG = "categories"
+
+
+def book_tag(book_id: int) -> str:
+    """Cache tag of ``GET /books/{book_id}``."""
+    return f"book:{book_id}"
+
+
+async def invalidate_books(*book_ids: int) -> None:
+    """Drop cached responses built from books; without ids, every book detail too."""
+    details = [book_tag(book_id) for book_id in book_ids] if book_ids else [BOOK_DETAILS_TAG]
+    await response_cache.invalidate(BOOKS_TAG, *details)
+
 
 def not_found_error_handler(_: Request[Any, Any, Any], __: NotFoundError) -> Response[Any]:
     """Handle not found errors."""
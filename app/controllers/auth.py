@@ -2,17 +2,22 @@
 
 from typing import Annotated
 
-from litestar import Controller, Response, post
+from litestar import Controller, Response, get, post
 from litestar.di import Provide
 from litestar.enums import RequestEncodingType
 from litestar.exceptions import HTTPException
 from litestar.params import Body
 from litestar.security.jwt import OAuth2Login
 
+from app.cache import CacheStats
+from app.db import PoolStats, pool_stats
 from app.dtos.user import UserLoginDTO
 from app.models import User
-from app.repositories.user import UserRepository, password_hasher, provide_user_repo
-from app.security import oauth2_auth
+from app.passwords import password_pool
+from app.replicas import ReplicaStats, replica_router
+from app.repositories.user import UserRepository, provide_user_repo
+from app.response_cache import ResponseCacheStats, response_cache
+from app.security import RevocationStats, oauth2_auth, token_claims, token_revocations, user_cache
 
 
 class AuthController(Controller):
@@ -32,10 +37,35 @@ class AuthController(Controller):
         users_repo: UserRepository,
     ) -> Response[OAuth2Login]:
         """Authenticate user and generate OAuth2 token."""
-        user = users_repo.get_one_or_none(username=data.username)
+        user = await users_repo.get_one_or_none(username=data.username)
 
         if user is not None:
-            if password_hasher.verify(data.password, user.password):
-                return oauth2_auth.login(identifier=user.username)
+            if await password_pool.verify(data.password, user.password):
+                return oauth2_auth.login(identifier=user.username, token_extras=token_claims(user))
 
         raise HTTPException(status_code=401, detail="Usuario o contraseña incorrectos")
+
+    @get("/user-cache")
+    async def get_user_cache_stats(self) -> CacheStats:
+        """Get hit/miss counters of the authenticated-user cache."""
+        return user_cache.stats()
+
+    @get("/response-cache")
+    async def get_response_cache_stats(self) -> ResponseCacheStats:
+        """Get hit ratio, size and eviction counters of the response cache."""
+        return response_cache.stats()
+
+    @get("/db-pool")
+    async def get_db_pool_stats(self) -> PoolStats | None:
+        """Get usage, checkout wait-time histogram and timeouts of the connection pool."""
+        return pool_stats()
+
+    @get("/db-replicas")
+    async def get_db_replica_stats(self) -> list[ReplicaStats]:
+        """Get health, lag and routed reads of the read replicas."""
+        return replica_router.stats()
+
+    @get("/token-revocations")
+    async def get_token_revocation_stats(self) -> RevocationStats:
+        """Get the size and freshness of the stateless-token revocation list."""
+        return token_revocations.stats()
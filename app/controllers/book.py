@@ -1,20 +1,65 @@
 """Controller for Book endpoints."""
 
-from typing import Annotated, Sequence
+from typing import Annotated, Any, Sequence
 
+import msgspec
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
 from advanced_alchemy.filters import LimitOffset
-from litestar import Controller, delete, get, patch, post
+from litestar import Controller, Request, delete, get, patch, post
 from litestar.di import Provide
 from litestar.dto import DTOData
 from litestar.exceptions import HTTPException
 from litestar.params import Parameter
-
-from app.controllers import duplicate_error_handler, not_found_error_handler
+from litestar.response import Stream
+from sqlalchemy import ColumnElement
+
+from app.batch import BatchResults, BookChanges, changes
+from app.conditional import conditional_get, entity_version, page_version
+from app.config import settings
+from app.controllers import (
+    BOOK_DETAILS_TAG,
+    BOOKS_TAG,
+    CATEGORIES_TAG,
+    book_tag,
+    duplicate_error_handler,
+    invalidate_books,
+    not_found_error_handler,
+)
+from app.dtos import SPARSE_RESPONSE_DESCRIPTION, SparseFields
 from app.dtos.book import BookCreateDTO, BookReadDTO, BookUpdateDTO
-from app.models import Book, BookStats, Category
-from app.repositories.book import BookRepository, provide_book_repo
+from app.exporters import ExportFormat, export_response
+from app.importers import CONTENT_TYPES, BookImportRow, iter_book_rows
+from app.models import (
+    BatchReport,
+    BatchRequest,
+    Book,
+    BookRating,
+    BookStats,
+    BulkCategoryAssignment,
+    Category,
+    CategoryAssignmentReport,
+    ImportReport,
+    ImportRowError,
+)
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorPage, FacetedPage
+from app.repositories.book import BookRepository, CategoryMatch, book_stats_cache, provide_book_repo
 from app.repositories.category import provide_category_repo, CategoryRepository
+from app.response_cache import cached_response
+from app.validators import validate_book_update, validate_new_book
+
+# Libros por solicitud en la asignación masiva de categorías.
+MAX_BULK_BOOKS = 10_000
+
+
+def _list_filters(request: Request) -> tuple[ColumnElement[bool], ...] | None:
+    """Filters of ``GET /books`` for the request; ``None`` with ``?facets=``, which counts beyond the page."""
+    if "facets" in request.query_params:
+        return None
+    match = request.query_params.get("category_match", "any")
+    if match not in ("any", "all"):
+        return None
+    category_ids = [int(value) for value in request.query_params.getall("category", [])]
+    return BookRepository.category_filters(category_ids, match)
 
 
 class BookController(Controller):
@@ -30,15 +75,72 @@ class BookController(Controller):
         DuplicateKeyError: duplicate_error_handler,
     }
 
-    @get("/")
-    async def list_books(self, books_repo: BookRepository) -> Sequence[Book]:
-        """Get all books."""
-        return books_repo.list()
-
-    @get("/{id:int}")
-    async def get_book(self, id: int, books_repo: BookRepository) -> Book:
-        """Get a book by ID."""
-        return books_repo.get(id)
+    @get(
+        "/",
+        middleware=[conditional_get(page_version(BookRepository, _list_filters))],
+        response_description=SPARSE_RESPONSE_DESCRIPTION,
+    )
+    async def list_books(
+        self,
+        books_repo: BookRepository,
+        limit: Annotated[int, Parameter(query="limit", default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)],
+        cursor: str | None = None,
+        fields: SparseFields = None,
+        category: Annotated[list[int] | None, Parameter(max_items=MAX_PAGE_SIZE)] = None,
+        category_match: CategoryMatch = "any",
+        facets: bool = False,
+    ) -> CursorPage[Book]:
+        """Get a page of books using keyset pagination.
+
+        ``?category=1&category=2`` keeps the books in any (``category_match=any``)
+        or all (``category_match=all``) of those categories, ``?facets=true``
+        adds the book counts per language and decade of the whole filtered
+        result and ``?fields=`` selects the fields returned.
+        """
+        fieldset = BookReadDTO.fieldset(fields)
+        filters = books_repo.category_filters(category or (), category_match)
+        page = await books_repo.list_page(
+            *filters, cursor=cursor, limit=limit, load=fieldset.load(books_repo.read_options)
+        )
+        if facets:
+            page = FacetedPage(**vars(page), facets=await books_repo.get_facets(*filters))
+        return fieldset.apply(page)
+
+    @get("/export")
+    async def export_books(self, format: ExportFormat = "ndjson") -> Stream:
+        """Export all books as CSV or NDJSON, streamed from a server-side cursor."""
+        return export_response(Book.__table__, format)
+
+    @get(
+        "/{id:int}",
+        middleware=[
+            cached_response(lambda request: (book_tag(request.path_params["id"]), BOOK_DETAILS_TAG, CATEGORIES_TAG)),
+            conditional_get(entity_version(BookRepository)),
+        ],
+        response_description=SPARSE_RESPONSE_DESCRIPTION,
+    )
+    async def get_book(self, id: int, books_repo: BookRepository, fields: SparseFields = None) -> Book:
+        """Get a book by ID (``?fields=`` selects the fields returned)."""
+        fieldset = BookReadDTO.fieldset(fields)
+        book = await books_repo.get(id, load=fieldset.load(books_repo.read_options))
+        return fieldset.apply(book)
+
+    @get("/{id:int}/rating")
+    async def get_book_rating(self, id: int, books_repo: BookRepository) -> BookRating:
+        """Get the review count, average rating and 1-5 histogram of a book."""
+        (rating,) = await books_repo.get_ratings([id])
+        if not rating.review_count and not await books_repo.exists(id=id):
+            raise NotFoundError(f"No item found when filtering by id={id}")
+        return rating
+
+    @get("/ratings")
+    async def get_book_ratings(
+        self,
+        ids: Annotated[list[int], Parameter(min_items=1, max_items=MAX_PAGE_SIZE)],
+        books_repo: BookRepository,
+    ) -> list[BookRating]:
+        """Get the rating aggregates of several books (``?ids=1&ids=2``), in the order requested."""
+        return await books_repo.get_ratings(ids)
 
     @post("/", dto=BookCreateDTO)
     async def create_book(
@@ -46,33 +148,15 @@ class BookController(Controller):
         data: DTOData[Book],
         books_repo: BookRepository,
     ) -> Book:
-        
-        valid_languages = {"es", "en", "fr", "de", "it", "pt"}
-
-        language = data.as_builtins().get("language")
-
-        if language not in valid_languages:
-            raise HTTPException(
-                status_code=400,
-                detail="El idioma debe ser uno de: es, en, fr, de, it, pt."
-            )
-        
-        # Validar stock > 0
-        if data.as_builtins().get("stock", 1) <= 0:
-            raise HTTPException(
-                status_code=400,
-                detail="El stock debe ser mayor a 0."
-    )
-
-
         """Create a new book."""
-        # Validar que el año esté entre 1000 y el año actual
-        if not (1000 <= data.as_builtins()["published_year"] <= 2024):
-            raise HTTPException(
-                detail="El año de publicación debe estar entre 1000 y 2024",
-                status_code=400,
-            )
-        return books_repo.add(data.create_instance())
+        error = validate_new_book(data.as_builtins())
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+
+        book = await books_repo.add(data.create_instance())
+        book_stats_cache.invalidate()
+        await invalidate_books(book.id)
+        return book
 
     @patch("/{id:int}", dto=BookUpdateDTO)
     async def update_book(
@@ -81,94 +165,171 @@ class BookController(Controller):
         data: DTOData[Book],
         books_repo: BookRepository,
     ) -> Book:
-        
+        """Update a book by ID."""
         payload = data.as_builtins()
 
-        # Validar stock >= 0 si viene en el body
-        if "stock" in payload and payload["stock"] < 0:
-            raise HTTPException(
-                status_code=400,
-                detail="El stock no puede ser negativo."
-            )
-
-        # Validar language en update también
-        if "language" in payload:
-            valid_languages = {"es", "en", "fr", "de", "it", "pt"}
-            if payload["language"] not in valid_languages:
-                raise HTTPException(
-                    status_code=400,
-                    detail="El idioma debe ser uno de: es, en, fr, de, it, pt."
-                )
+        error = validate_book_update(payload)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
 
-
-        """Update a book by ID."""
-        book, _ = books_repo.get_and_update(match_fields="id", id=id, **data.as_builtins())
+        book, _ = await books_repo.get_and_update(match_fields="id", id=id, load=books_repo.read_options, **payload)
+        book_stats_cache.invalidate()
+        await invalidate_books(id)
 
         return book
 
     @delete("/{id:int}")
     async def delete_book(self, id: int, books_repo: BookRepository) -> None:
         """Delete a book by ID."""
-        books_repo.delete(id)
+        await books_repo.delete(id)
+        book_stats_cache.invalidate()
+        await invalidate_books(id)
+
+    @post("/import", status_code=200, request_max_body_size=None)
+    async def import_books(self, request: Request, books_repo: BookRepository) -> ImportReport:
+        """Bulk import books from a streamed CSV or NDJSON body, upserting on isbn."""
+        import_format = CONTENT_TYPES.get(request.content_type[0])
+        if import_format is None:
+            raise HTTPException(
+                status_code=415,
+                detail="Formatos soportados: text/csv, application/x-ndjson.",
+            )
 
-    @get("/search/")
-    async def search_book_by_title(
+        report = ImportReport()
+
+        def add_error(row_number: int, detail: str) -> None:
+            report.failed += 1
+            if len(report.errors) < settings.book_import_max_errors:
+                report.errors.append(ImportRowError(row=row_number, detail=detail))
+            else:
+                report.errors_truncated = True
+
+        async def write(chunk: list[tuple[int, dict[str, Any]]]) -> None:
+            imported, errors = await books_repo.import_chunk(chunk)
+            for row_number, detail in errors:
+                add_error(row_number, detail)
+            report.imported += imported
+
+        chunk: list[tuple[int, dict[str, Any]]] = []
+        async for row_number, row, error in iter_book_rows(request.stream(), import_format):
+            error = error or validate_new_book(row)
+            if error:
+                add_error(row_number, error)
+                continue
+
+            chunk.append((row_number, row))
+            if len(chunk) >= settings.book_import_chunk_size:
+                await write(chunk)
+                chunk = []
+
+        if chunk:
+            await write(chunk)
+
+        book_stats_cache.invalidate()
+        # Las filas existentes se actualizan por isbn: se invalidan todos los detalles.
+        await invalidate_books()
+        return report
+
+    @post("/batch", status_code=200)
+    async def batch_books(self, data: BatchRequest, books_repo: BookRepository) -> BatchReport:
+        """Create, update and delete many books in one transaction, with one result per item."""
+        results = BatchResults(data)
+        creates = []
+        for index, row in results.parse("create", data.create, BookImportRow):
+            values = msgspec.structs.asdict(row)
+            error = validate_new_book(values)
+            if error:
+                results.fail("create", index, 400, error)
+            else:
+                creates.append((index, values))
+        updates = []
+        for index, item in results.parse("update", data.update, BookChanges):
+            values = changes(item)
+            error = validate_book_update(values)
+            if error:
+                results.fail("update", index, 400, error, id=item.id)
+            else:
+                updates.append((index, item.id, values))
+
+        await books_repo.write_batch(creates, updates, results.parse_ids(data.delete), results)
+        ids = results.ids()
+        if ids:
+            book_stats_cache.invalidate()
+            await invalidate_books(*ids)
+        return results.report()
+
+    @get("/search/", response_description=SPARSE_RESPONSE_DESCRIPTION)
+    async def search_books(
         self,
-        title: str,
         books_repo: BookRepository,
-    ) -> Sequence[Book]:
-        """Search books by title."""
-        return books_repo.list(Book.title.ilike(f"%{title}%"))
+        limit: Annotated[int, Parameter(query="limit", default=20, ge=1, le=MAX_PAGE_SIZE)],
+        q: Annotated[str | None, Parameter(min_length=1, max_length=200)] = None,
+        title: Annotated[
+            str | None,
+            Parameter(
+                min_length=1,
+                max_length=200,
+                description="Deprecated alias of `q`, kept for existing clients.",
+                schema_extra={"deprecated": True},
+            ),
+        ] = None,
+        cursor: str | None = None,
+        fields: SparseFields = None,
+    ) -> CursorPage[Book]:
+        """Search books by title, author, publisher and description, ranked by relevance."""
+        # ?title= era el parámetro original (sólo título); se acepta como alias de ?q=.
+        query = q or title
+        if query is None:
+            raise HTTPException(status_code=400, detail="Falta el parámetro q.")
+        fieldset = BookReadDTO.fieldset(fields)
+        page = await books_repo.search_page(
+            query, cursor=cursor, limit=limit, load=fieldset.load(books_repo.read_options)
+        )
+        return fieldset.apply(page)
 
-    @get("/filter")
+    @get("/filter", response_description=SPARSE_RESPONSE_DESCRIPTION)
     async def filter_books_by_year(
         self,
         year_from: Annotated[int, Parameter(query="from")],
         to: int,
         books_repo: BookRepository,
+        fields: SparseFields = None,
     ) -> Sequence[Book]:
         """Filter books by published year."""
-        return books_repo.list(Book.published_year.between(year_from, to))
+        fieldset = BookReadDTO.fieldset(fields)
+        books = await books_repo.list(
+            Book.published_year.between(year_from, to),
+            load=fieldset.load(books_repo.read_options),
+        )
+        return fieldset.apply(books)
 
-    @get("/recent")
+    @get(
+        "/recent",
+        middleware=[cached_response(lambda request: (BOOKS_TAG,))],
+        response_description=SPARSE_RESPONSE_DESCRIPTION,
+    )
     async def get_recent_books(
         self,
         limit: Annotated[int, Parameter(query="limit", default=10, ge=1, le=50)],
         books_repo: BookRepository,
+        fields: SparseFields = None,
     ) -> Sequence[Book]:
         """Get most recent books."""
-        return books_repo.list(
+        fieldset = BookReadDTO.fieldset(fields)
+        books = await books_repo.list(
             LimitOffset(offset=0, limit=limit),
             order_by=Book.created_at.desc(),
+            load=fieldset.load(books_repo.read_options),
         )
+        return fieldset.apply(books)
 
-    @get("/stats")
+    @get("/stats", middleware=[cached_response(lambda request: (BOOKS_TAG, CATEGORIES_TAG))])
     async def get_book_stats(
         self,
         books_repo: BookRepository,
     ) -> BookStats:
         """Get statistics about books."""
-        total_books = books_repo.count()
-        if total_books == 0:
-            return BookStats(
-                total_books=0,
-                average_pages=0,
-                oldest_publication_year=None,
-                newest_publication_year=None,
-            )
-
-        books = books_repo.list()
-
-        average_pages = sum(book.pages for book in books) / total_books
-        oldest_year = min(book.published_year for book in books)
-        newest_year = max(book.published_year for book in books)
-
-        return BookStats(
-            total_books=total_books,
-            average_pages=average_pages,
-            oldest_publication_year=oldest_year,
-            newest_publication_year=newest_year,
-        )
+        return await books_repo.get_stats()
     
     @post("/{id:int}/assign-categories")
     async def assign_categories(
@@ -178,24 +339,45 @@ class BookController(Controller):
         books_repo: BookRepository,
         categories_repo: CategoryRepository,
     ) -> Book:
-        """Assign categories to a book."""
-        # Obtener el libro
-        book = books_repo.get(id)
-
-        # Obtener las categorías existentes
-        categories = categories_repo.list(Category.id.in_(category_ids))
+        """Assign categories to a book, writing only the links that change."""
+        if not await books_repo.exists(id=id):
+            raise NotFoundError(f"No item found when filtering by id={id}")
 
-        if len(categories) != len(category_ids):
+        # Validar que existan todas las categorías (sin cargarlas)
+        if await categories_repo.count(Category.id.in_(category_ids)) != len(set(category_ids)):
             raise HTTPException(
                 status_code=400,
                 detail="Una o más categorías no existen."
             )
 
-        # Asignar categorías
-        book.categories = categories
+        report = await books_repo.set_categories(id, category_ids)
+        if report.added or report.removed:
+            book_stats_cache.invalidate()
+            await invalidate_books(id)
 
-        # Guardar cambios
-        books_repo.update(book)
+        return await books_repo.get(id, load=books_repo.read_options)
 
-        return book
+    @post("/assign-categories", status_code=200)
+    async def assign_categories_bulk(
+        self,
+        data: BulkCategoryAssignment,
+        books_repo: BookRepository,
+        categories_repo: CategoryRepository,
+    ) -> CategoryAssignmentReport:
+        """Add and remove categories on many books in one transaction, writing only the links that change."""
+        book_ids, add, remove = set(data.book_ids), set(data.add), set(data.remove)
+        if len(book_ids) > MAX_BULK_BOOKS:
+            raise HTTPException(status_code=400, detail=f"Máximo {MAX_BULK_BOOKS} libros por solicitud.")
+        if add & remove:
+            raise HTTPException(status_code=400, detail="Una categoría no puede agregarse y quitarse a la vez.")
+        if await books_repo.count(Book.id.in_(book_ids)) != len(book_ids):
+            raise HTTPException(status_code=400, detail="Uno o más libros no existen.")
+        if await categories_repo.count(Category.id.in_(add | remove)) != len(add | remove):
+            raise HTTPException(status_code=400, detail="Una o más categorías no existen.")
+
+        report = await books_repo.change_categories(book_ids, add, remove)
+        if report.added or report.removed:
+            book_stats_cache.invalidate()
+            await invalidate_books()
+        return report
 
@@ -1,13 +1,20 @@
-from typing import Sequence
+from dataclasses import replace
+from typing import Annotated
 from litestar import Controller, get, post, delete, patch
 from litestar.di import Provide
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
 
+from app.conditional import conditional_get, entity_version, page_version
 from app.dtos.category import CategoryCreateDTO, CategoryReadDTO, CategoryUpdateDTO
+from app.repositories.book import book_stats_cache
 from app.repositories.category import CategoryRepository, provide_category_repo
-from app.controllers import duplicate_error_handler, not_found_error_handler
+from app.response_cache import cached_response, response_cache
+from app.controllers import BOOKS_TAG, CATEGORIES_TAG, duplicate_error_handler, not_found_error_handler
 from litestar.dto import DTOData
-from app.models import Category
+from litestar.params import Parameter
+from app.dtos import SparseResult
+from app.models import Category, CategoryCount
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorPage
 
 
 class CategoryController(Controller):
@@ -20,15 +27,36 @@ class CategoryController(Controller):
         DuplicateKeyError: duplicate_error_handler,
     }
 
-    @get("/")
-    async def list_categories(self, categories_repo: CategoryRepository) -> Sequence[Category]:
-        """Get all categories."""
-        return categories_repo.list()
+    @get(
+        "/",
+        middleware=[
+            cached_response(lambda request: (CATEGORIES_TAG, BOOKS_TAG)),
+            conditional_get(page_version(CategoryRepository)),
+        ],
+    )
+    async def list_categories(
+        self,
+        categories_repo: CategoryRepository,
+        limit: Annotated[int, Parameter(query="limit", default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)],
+        cursor: str | None = None,
+        with_counts: bool = False,
+    ) -> CursorPage[Category]:
+        """Get a page of categories using keyset pagination.
+
+        ``?with_counts=true`` returns ``id``, ``name`` and ``book_count``
+        instead of the full categories, without loading their books.
+        """
+        if not with_counts:
+            return await categories_repo.list_page(cursor=cursor, limit=limit, load=categories_repo.read_options)
+        page = await categories_repo.list_page(cursor=cursor, limit=limit)
+        counts = await categories_repo.get_book_counts([category.id for category in page.items])
+        items = [CategoryCount(category.id, category.name, counts.get(category.id, 0)) for category in page.items]
+        return SparseResult(replace(page, items=items))
 
-    @get("/{id:int}")
+    @get("/{id:int}", middleware=[conditional_get(entity_version(CategoryRepository))])
     async def get_category(self, id: int, categories_repo: CategoryRepository) -> Category:
         """Get category by ID."""
-        return categories_repo.get(id)
+        return await categories_repo.get(id, load=categories_repo.read_options)
 
     @post("/", dto=CategoryCreateDTO)
     async def create_category(
@@ -37,7 +65,9 @@ class CategoryController(Controller):
         categories_repo: CategoryRepository
     ) -> Category:
         """Create a new category."""
-        return categories_repo.add(data.create_instance())
+        category = await categories_repo.add(data.create_instance())
+        await response_cache.invalidate(CATEGORIES_TAG)
+        return category
 
     @patch("/{id:int}", dto=CategoryUpdateDTO)
     async def update_category(
@@ -47,14 +77,19 @@ class CategoryController(Controller):
         categories_repo: CategoryRepository
     ) -> Category:
         """Update a category."""
-        category, _ = categories_repo.get_and_update(
+        category, _ = await categories_repo.get_and_update(
             match_fields="id",
             id=id,
+            load=categories_repo.read_options,
             **data.as_builtins(),
         )
+        book_stats_cache.invalidate()
+        await response_cache.invalidate(CATEGORIES_TAG)
         return category
 
     @delete("/{id:int}")
     async def delete_category(self, id: int, categories_repo: CategoryRepository) -> None:
         """Delete a category."""
-        categories_repo.delete(id)
+        await categories_repo.delete(id)
+        book_stats_cache.invalidate()
+        await response_cache.invalidate(CATEGORIES_TAG)
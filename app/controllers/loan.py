@@ -1,6 +1,6 @@
 """Controller for Loan endpoints."""
 
-from typing import Sequence
+from typing import Annotated
 from datetime import timedelta
 
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
@@ -8,11 +8,19 @@ from litestar import Controller, delete, get, patch, post
 from litestar.di import Provide
 from litestar.dto import DTOData
 from litestar.exceptions import HTTPException
+from litestar.params import Parameter
+from litestar.response import Stream
 
-from app.controllers import duplicate_error_handler, not_found_error_handler
+from app.batch import BatchResults, LoanChanges, NewLoan
+from app.conditional import conditional_get, page_version
+from app.controllers import duplicate_error_handler, invalidate_books, not_found_error_handler
+from app.dtos import SPARSE_RESPONSE_DESCRIPTION, SparseFields
 from app.dtos.loan import LoanCreateDTO, LoanReadDTO, LoanUpdateDTO
-from app.models import Loan , LoanStatus
-from app.repositories.loan import LoanRepository, provide_loan_repo
+from app.exporters import ExportFormat, export_response
+from app.jobs import overdue_sweeper
+from app.models import BatchReport, BatchRequest, Loan , LoanStatus, OverdueSweepReport
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorPage
+from app.repositories.loan import LOAN_DAYS, LoanRepository, provide_loan_repo
 
 
 class LoanController(Controller):
@@ -27,15 +35,57 @@ class LoanController(Controller):
         DuplicateKeyError: duplicate_error_handler,
     }
 
-    @get("/")
-    async def list_loans(self, loans_repo: LoanRepository) -> Sequence[Loan]:
-        """Get all loans."""
-        return loans_repo.list()
+    @get(
+        "/",
+        middleware=[conditional_get(page_version(LoanRepository))],
+        response_description=SPARSE_RESPONSE_DESCRIPTION,
+    )
+    async def list_loans(
+        self,
+        loans_repo: LoanRepository,
+        limit: Annotated[int, Parameter(query="limit", default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)],
+        cursor: str | None = None,
+        fields: SparseFields = None,
+    ) -> CursorPage[Loan]:
+        """Get a page of loans using keyset pagination (``?fields=`` selects the fields returned)."""
+        fieldset = LoanReadDTO.fieldset(fields)
+        page = await loans_repo.list_page(cursor=cursor, limit=limit, load=fieldset.load(loans_repo.read_options))
+        return fieldset.apply(page)
+
+    @get("/export")
+    async def export_loans(self, format: ExportFormat = "ndjson") -> Stream:
+        """Export all loans as CSV or NDJSON, streamed from a server-side cursor."""
+        return export_response(Loan.__table__, format)
+
+    @post("/sweep-overdue", status_code=200)
+    async def sweep_overdue_loans(self) -> OverdueSweepReport:
+        """Mark overdue loans and compute their fines now instead of waiting for the scheduled sweep."""
+        return await overdue_sweeper.run_once()
+
+    @post("/batch", status_code=200)
+    async def batch_loans(self, data: BatchRequest, loans_repo: LoanRepository) -> BatchReport:
+        """Create loans, change their status and delete them in one transaction, with one result per item."""
+        results = BatchResults(data)
+        creates = results.parse("create", data.create, NewLoan)
+        updates = [(index, item.id, item.status) for index, item in results.parse("update", data.update, LoanChanges)]
+        books = await loans_repo.write_batch(creates, updates, results.parse_ids(data.delete), results)
+        if books is None:
+            raise HTTPException(
+                status_code=409,
+                detail="Los préstamos o el stock cambiaron durante el lote; no se aplicó ningún cambio.",
+            )
+
+        # Los libros en caché incluyen sus préstamos.
+        if books:
+            await invalidate_books(*books)
+        return results.report()
 
-    @get("/{id:int}")
-    async def get_loan(self, id: int, loans_repo: LoanRepository) -> Loan:
-        """Get a loan by ID."""
-        return loans_repo.get(id)
+    @get("/{id:int}", response_description=SPARSE_RESPONSE_DESCRIPTION)
+    async def get_loan(self, id: int, loans_repo: LoanRepository, fields: SparseFields = None) -> Loan:
+        """Get a loan by ID (``?fields=`` selects the fields returned)."""
+        fieldset = LoanReadDTO.fieldset(fields)
+        loan = await loans_repo.get(id, load=fieldset.load(loans_repo.read_options))
+        return fieldset.apply(loan)
 
     @post("/", dto=LoanCreateDTO)
     async def create_loan(
@@ -47,7 +97,7 @@ class LoanController(Controller):
 
         loan = data.create_instance()
 
-        loan.due_date = loan.loan_dt + timedelta(days=14)
+        loan.due_date = loan.loan_dt + timedelta(days=LOAN_DAYS)
 
         # status por defecto
         loan.status = LoanStatus.ACTIVE
@@ -55,7 +105,17 @@ class LoanController(Controller):
         # fine_amount siempre inicia en None
         loan.fine_amount = None
 
-        return loans_repo.add(loan)
+        # Reserva un ejemplar en la misma transacción que el préstamo.
+        created = await loans_repo.add_reserving_copy(loan)
+        if created is None:
+            raise HTTPException(
+                status_code=409,
+                detail="No hay ejemplares disponibles de este libro.",
+            )
+
+        # Los libros en caché incluyen sus préstamos.
+        await invalidate_books(created.book_id)
+        return created
 
     @patch("/{id:int}", dto=LoanUpdateDTO)
     async def update_loan(
@@ -74,15 +134,19 @@ class LoanController(Controller):
                 detail="Solo se permite actualizar el estado (status).",
             )
 
-        loan, _ = loans_repo.get_and_update(
-            match_fields="id",
-            id=id,
-            **payload,
-        )
+        loan = await loans_repo.get(id, load=loans_repo.read_options)
+        status = LoanStatus(payload["status"])
+
+        if loan.status != status and not await loans_repo.update_status(loan, status):
+            raise HTTPException(
+                status_code=409,
+                detail="El préstamo cambió durante la actualización o no hay ejemplares disponibles.",
+            )
 
+        await invalidate_books(loan.book_id)
         return loan
 
     @delete("/{id:int}")
     async def delete_loan(self, id: int, loans_repo: LoanRepository) -> None:
-        """Delete a loan by ID."""
-        loans_repo.delete(id)
+        """Delete a loan by ID, returning its copy to the book if it was still out."""
+        await invalidate_books(await loans_repo.delete_returning_copy(id))
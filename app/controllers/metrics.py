@@ -0,0 +1,95 @@
+"""Controller for the Prometheus metrics endpoint."""
+
+from litestar import Controller, MediaType, get
+
+from app.db import pool_stats
+from app.metrics import PrometheusWriter, request_metrics
+from app.replicas import replica_router
+from app.response_cache import response_cache
+from app.security import user_cache
+
+
+class MetricsController(Controller):
+    """Exposes request, database and cache metrics in Prometheus text format.
+
+    Excluded from authentication (see ``oauth2_auth``) so Prometheus can
+    scrape it.
+    """
+
+    path = "/metrics"
+    tags = ["metrics"]
+
+    @get("/", media_type=MediaType.TEXT, include_in_schema=False)
+    async def get_metrics(self) -> str:
+        """Get the metrics of this worker."""
+        writer = PrometheusWriter()
+        routes = sorted(request_metrics.routes.items())
+
+        writer.metric(
+            "http_requests_total",
+            "counter",
+            "HTTP requests by route and status code.",
+            (
+                ({"method": method, "route": route, "status": status}, count)
+                for (method, route), metrics in routes
+                for status, count in sorted(metrics.statuses.items())
+            ),
+        )
+        writer.histogram(
+            "http_request_duration_seconds",
+            "Time to serve a request, authentication included.",
+            (({"method": method, "route": route}, metrics.latency.snapshot()) for (method, route), metrics in routes),
+        )
+        writer.metric(
+            "http_request_db_statements_total",
+            "counter",
+            "SQL statements executed while serving the route.",
+            (({"method": method, "route": route}, metrics.statements) for (method, route), metrics in routes),
+        )
+        writer.metric(
+            "http_request_db_seconds_total",
+            "counter",
+            "Time spent executing SQL statements while serving the route.",
+            (({"method": method, "route": route}, metrics.db_time) for (method, route), metrics in routes),
+        )
+
+        pool = pool_stats()
+        if pool is not None:
+            writer.metric("db_pool_size", "gauge", "Connections kept in the pool.", [({}, pool.pool_size)])
+            writer.metric("db_pool_checked_out", "gauge", "Connections in use.", [({}, pool.checked_out)])
+            writer.metric("db_pool_overflow", "gauge", "Connections open beyond the pool size.", [({}, pool.overflow)])
+            writer.metric("db_pool_checkouts_total", "counter", "Connection checkouts.", [({}, pool.checkouts)])
+            writer.metric("db_pool_timeouts_total", "counter", "Checkouts that timed out.", [({}, pool.timeouts)])
+            writer.histogram(
+                "db_pool_checkout_wait_seconds", "Time waiting for a pooled connection.", [({}, pool.checkout_wait)]
+            )
+
+        replicas = replica_router.stats()
+        if replicas:
+            writer.metric(
+                "db_replica_healthy",
+                "gauge",
+                "Whether the read replica is in rotation.",
+                (({"replica": replica.name}, int(replica.healthy)) for replica in replicas),
+            )
+            writer.metric(
+                "db_replica_lag_seconds",
+                "gauge",
+                "Replication lag seen by the last health check.",
+                (({"replica": replica.name}, replica.lag_seconds) for replica in replicas if replica.lag_seconds is not None),
+            )
+            writer.metric(
+                "db_replica_reads_total",
+                "counter",
+                "Statements routed to the read replica.",
+                (({"replica": replica.name}, replica.reads) for replica in replicas),
+            )
+
+        for name, stats in (("response", response_cache.stats()), ("user", user_cache.stats())):
+            writer.metric(f"{name}_cache_hits_total", "counter", f"Hits of the {name} cache.", [({}, stats.hits)])
+            writer.metric(f"{name}_cache_misses_total", "counter", f"Misses of the {name} cache.", [({}, stats.misses)])
+            writer.metric(
+                f"{name}_cache_evictions_total", "counter", f"Evictions of the {name} cache.", [({}, stats.evictions)]
+            )
+
+        return writer.render()
@@ -1,19 +1,29 @@
 """Controller for Review endpoints."""
 
 from datetime import date
-from typing import Sequence
+from typing import Annotated
 
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
 from litestar import Controller, get, post, patch, delete
 from litestar.di import Provide
 from litestar.dto import DTOData
 from litestar.exceptions import HTTPException
+from litestar.params import Parameter
+from litestar.response import Stream
 
-from app.controllers import duplicate_error_handler, not_found_error_handler
+from app.batch import BatchResults, NewReview, ReviewChanges, changes
+from app.conditional import conditional_get, page_version
+from app.controllers import duplicate_error_handler, invalidate_books, not_found_error_handler
+from app.dtos import SPARSE_RESPONSE_DESCRIPTION, SparseFields
 from app.dtos.review import ReviewCreateDTO, ReviewReadDTO, ReviewUpdateDTO
-from app.models import Review
+from app.exporters import ExportFormat, export_response
+from app.models import BatchReport, BatchRequest, Review
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorPage
 from app.repositories.review import ReviewRepository, provide_review_repo
 
+# Máximo de reseñas de un mismo usuario para un mismo libro.
+MAX_REVIEWS_PER_BOOK = 3
+
 
 class ReviewController(Controller):
     """Controller for review management operations."""
@@ -27,16 +37,67 @@ class ReviewController(Controller):
         DuplicateKeyError: duplicate_error_handler,
     }
 
-    @get("/")
-    async def list_reviews(self, reviews_repo: ReviewRepository) -> Sequence[Review]:
-        """Get all reviews."""
-        return reviews_repo.list()
+    @get(
+        "/",
+        middleware=[conditional_get(page_version(ReviewRepository))],
+        response_description=SPARSE_RESPONSE_DESCRIPTION,
+    )
+    async def list_reviews(
+        self,
+        reviews_repo: ReviewRepository,
+        limit: Annotated[int, Parameter(query="limit", default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)],
+        cursor: str | None = None,
+        fields: SparseFields = None,
+    ) -> CursorPage[Review]:
+        """Get a page of reviews using keyset pagination (``?fields=`` selects the fields returned)."""
+        fieldset = ReviewReadDTO.fieldset(fields)
+        page = await reviews_repo.list_page(cursor=cursor, limit=limit, load=fieldset.load(reviews_repo.read_options))
+        return fieldset.apply(page)
+
+
+    @get("/export")
+    async def export_reviews(self, format: ExportFormat = "ndjson") -> Stream:
+        """Export all reviews as CSV or NDJSON, streamed from a server-side cursor."""
+        return export_response(Review.__table__, format)
+
+    @post("/batch", status_code=200)
+    async def batch_reviews(self, data: BatchRequest, reviews_repo: ReviewRepository) -> BatchReport:
+        """Create, update and delete many reviews in one transaction, with one result per item."""
+        results = BatchResults(data)
+        creates = []
+        for index, review in results.parse("create", data.create, NewReview):
+            if not (1 <= review.rating <= 5):
+                results.fail("create", index, 400, "El rating debe estar entre 1 y 5.")
+            else:
+                creates.append((index, review))
+        updates = []
+        for index, item in results.parse("update", data.update, ReviewChanges):
+            values = changes(item)
+            if "rating" in values and not (1 <= values["rating"] <= 5):
+                results.fail("update", index, 400, "El rating debe estar entre 1 y 5.", id=item.id)
+            else:
+                updates.append((index, item.id, values))
+
+        books = await reviews_repo.write_batch(
+            creates, updates, results.parse_ids(data.delete), results, max_per_user=MAX_REVIEWS_PER_BOOK
+        )
+        if books is None:
+            raise HTTPException(
+                status_code=409,
+                detail="Las reseñas cambiaron durante el lote; no se aplicó ningún cambio.",
+            )
 
+        # Los libros en caché incluyen sus reseñas.
+        if books:
+            await invalidate_books(*books)
+        return results.report()
 
-    @get("/{id:int}")
-    async def get_review(self, id: int, reviews_repo: ReviewRepository) -> Review:
-        """Get a review by ID."""
-        return reviews_repo.get(id)
+    @get("/{id:int}", response_description=SPARSE_RESPONSE_DESCRIPTION)
+    async def get_review(self, id: int, reviews_repo: ReviewRepository, fields: SparseFields = None) -> Review:
+        """Get a review by ID (``?fields=`` selects the fields returned)."""
+        fieldset = ReviewReadDTO.fieldset(fields)
+        review = await reviews_repo.get(id, load=fieldset.load(reviews_repo.read_options))
+        return fieldset.apply(review)
 
 
     @post("/", dto=ReviewCreateDTO)
@@ -56,25 +117,19 @@ class ReviewController(Controller):
                 detail="El rating debe estar entre 1 y 5.",
             )
 
-        # Validación 2: máx 3 reseñas por usuario para el mismo libro
-        existing_count = (
-            reviews_repo.session.query(Review)
-            .filter(
-                Review.book_id == review.book_id,
-                Review.user_id == review.user_id,
-            )
-            .count()
-        )
+        review.review_date = date.today()
 
-        if existing_count >= 3:
+        # Validación 2: máx 3 reseñas por usuario para el mismo libro (contador indexado)
+        created = await reviews_repo.add_counted(review, max_per_user=MAX_REVIEWS_PER_BOOK)
+        if created is None:
             raise HTTPException(
                 status_code=400,
                 detail="El usuario ya tiene 3 reseñas para este libro.",
             )
 
-        review.review_date = date.today()
-
-        return reviews_repo.add(review)
+        # Los libros en caché incluyen sus reseñas.
+        await invalidate_books(created.book_id)
+        return created
 
 
     @patch("/{id:int}", dto=ReviewUpdateDTO)
@@ -85,16 +140,30 @@ class ReviewController(Controller):
         reviews_repo: ReviewRepository,
     ) -> Review:
         """Update a review."""
-        review, _ = reviews_repo.get_and_update(
-            match_fields="id",
-            id=id,
-            **data.as_builtins(),
-        )
+        payload = data.as_builtins()
+
+        if "rating" in payload and not (1 <= payload["rating"] <= 5):
+            raise HTTPException(
+                status_code=400,
+                detail="El rating debe estar entre 1 y 5.",
+            )
+
+        review = await reviews_repo.update_counted(id, payload, max_per_user=MAX_REVIEWS_PER_BOOK)
+        if review is None:
+            raise HTTPException(
+                status_code=400,
+                detail="El usuario ya tiene 3 reseñas para este libro.",
+            )
 
+        # Si la reseña cambió de libro no se conoce el anterior: se invalidan todos.
+        if "book_id" in payload:
+            await invalidate_books()
+        else:
+            await invalidate_books(review.book_id)
         return review
 
 
     @delete("/{id:int}")
     async def delete_review(self, id: int, reviews_repo: ReviewRepository) -> None:
         """Delete a review by ID."""
-        reviews_repo.delete(id)
+        await invalidate_books(await reviews_repo.delete_counted(id))
@@ -1,17 +1,24 @@
 """Controller for User endpoints."""
 
-from typing import Sequence
+from typing import Annotated
 
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
 from litestar import Controller, delete, get, patch, post
 from litestar.di import Provide
 from litestar.dto import DTOData
 from litestar.exceptions import HTTPException
+from litestar.params import Parameter
 
+from app.conditional import conditional_get, entity_version, page_version
+from app.config import settings
 from app.controllers import duplicate_error_handler, not_found_error_handler
+from app.dtos import SPARSE_RESPONSE_DESCRIPTION, SparseFields
 from app.dtos.user import UserCreateDTO, UserReadDTO, UserUpdateDTO
 from app.models import PasswordUpdate, User
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorPage
+from app.passwords import password_pool
 from app.repositories.user import UserRepository, provide_user_repo
+from app.security import invalidate_cached_user, token_revocations
 
 import re
 
@@ -29,15 +36,33 @@ class UserController(Controller):
         DuplicateKeyError: duplicate_error_handler,
     }
 
-    @get("/")
-    async def list_users(self, users_repo: UserRepository) -> Sequence[User]:
-        """Get all users."""
-        return users_repo.list()
-
-    @get("/{id:int}")
-    async def get_user(self, id: int, users_repo: UserRepository) -> User:
-        """Get a user by ID."""
-        return users_repo.get(id)
+    @get(
+        "/",
+        middleware=[conditional_get(page_version(UserRepository))],
+        response_description=SPARSE_RESPONSE_DESCRIPTION,
+    )
+    async def list_users(
+        self,
+        users_repo: UserRepository,
+        limit: Annotated[int, Parameter(query="limit", default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)],
+        cursor: str | None = None,
+        fields: SparseFields = None,
+    ) -> CursorPage[User]:
+        """Get a page of users using keyset pagination (``?fields=`` selects the fields returned)."""
+        fieldset = UserReadDTO.fieldset(fields)
+        page = await users_repo.list_page(cursor=cursor, limit=limit, load=fieldset.load(users_repo.read_options))
+        return fieldset.apply(page)
+
+    @get(
+        "/{id:int}",
+        middleware=[conditional_get(entity_version(UserRepository))],
+        response_description=SPARSE_RESPONSE_DESCRIPTION,
+    )
+    async def get_user(self, id: int, users_repo: UserRepository, fields: SparseFields = None) -> User:
+        """Get a user by ID (``?fields=`` selects the fields returned)."""
+        fieldset = UserReadDTO.fieldset(fields)
+        user = await users_repo.get(id, load=fieldset.load(users_repo.read_options))
+        return fieldset.apply(user)
 
     @post("/", dto=UserCreateDTO)
     async def create_user(
@@ -60,7 +85,7 @@ class UserController(Controller):
         # is_active NO debe poder ser seteado por el usuario
         payload.pop("is_active", None)
 
-        return users_repo.add_with_hashed_password(data)
+        return await users_repo.add_with_hashed_password(data)
 
     @patch("/{id:int}", dto=UserUpdateDTO)
     async def update_user(
@@ -83,11 +108,13 @@ class UserController(Controller):
         if "is_active" in payload:
             payload.pop("is_active")
 
-        user, _ = users_repo.get_and_update(
+        user, _ = await users_repo.get_and_update(
             match_fields="id",
             id=id,
+            load=users_repo.read_options,
             **payload
         )
+        invalidate_cached_user(id)
 
         return user
 
@@ -99,18 +126,26 @@ class UserController(Controller):
         users_repo: UserRepository,
     ) -> None:
         """Update a user's password."""
-        user = users_repo.get(id)
+        user = await users_repo.get(id)
 
-        if user.password != data.current_password:
+        if not await password_pool.verify(data.current_password, user.password):
             raise HTTPException(
                 detail="Contraseña incorrecta",
                 status_code=401,
             )
 
-        user.password = data.new_password
-        users_repo.update(user)
+        user.password = await password_pool.hash(data.new_password)
+        if settings.jwt_stateless:
+            await users_repo.revoke_tokens(id)
+        await users_repo.update(user)
+        invalidate_cached_user(id)
+        token_revocations.revoke(id, user.password)
 
     @delete("/{id:int}")
     async def delete_user(self, id: int, users_repo: UserRepository) -> None:
         """Delete a user by ID."""
-        users_repo.delete(id)
+        if settings.jwt_stateless:
+            await users_repo.revoke_tokens(id)
+        await users_repo.delete(id)
+        invalidate_cached_user(id)
+        token_revocations.revoke(id, None)
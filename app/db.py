@@ -1,9 +1,119 @@
 """Database configuration with SQLAlchemy."""
 
-from advanced_alchemy.extensions.litestar import SQLAlchemyPlugin, SQLAlchemySyncConfig
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from advanced_alchemy.extensions.litestar import (
+    AsyncSessionConfig,
+    EngineConfig,
+    SQLAlchemyAsyncConfig,
+    SQLAlchemyPlugin,
+)
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, PoolProxiedConnection
 
 from app.config import settings
+from app.metrics import Histogram, HistogramSnapshot, request_metrics
+from app.query_debug import query_detector
+
+
+@dataclass
+class PoolStats:
+    """Connection pool usage, used to size ``DB_POOL_SIZE`` / ``DB_MAX_OVERFLOW`` per worker."""
+
+    pool_size: int
+    max_overflow: int
+    checked_out: int
+    idle: int
+    overflow: int
+    checkouts: int
+    connects: int
+    timeouts: int
+    checkout_wait: HistogramSnapshot
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that times every checkout and counts the ones that time out."""
+
+    # Loguea bajo "sqlalchemy.pool" como los pools de SQLAlchemy, no bajo "app".
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.InstrumentedPool"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = Histogram()
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+
+    def _create_connection(self) -> ConnectionPoolEntry:
+        self.connects += 1
+        return super()._create_connection()
 
-sqlalchemy_config = SQLAlchemySyncConfig(connection_string=settings.database_url)
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - start)
+        self.checkouts += 1
+        return connection
+
+    def stats(self) -> PoolStats:
+        """Return the current usage and counters."""
+        return PoolStats(
+            pool_size=self.size(),
+            max_overflow=self._max_overflow,
+            checked_out=self.checkedout(),
+            idle=self.checkedin(),
+            overflow=max(self.overflow(), 0),
+            checkouts=self.checkouts,
+            connects=self.connects,
+            timeouts=self.timeouts,
+            checkout_wait=self.checkout_wait.snapshot(),
+        )
+
+
+def _engine_config(url: str) -> EngineConfig:
+    # SQLite en memoria usa un StaticPool (una sola conexión): no hay pool que configurar.
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        return EngineConfig()
+    connect_args: dict[str, Any] = {}
+    if url.startswith("postgresql+asyncpg"):
+        connect_args["timeout"] = settings.db_connect_timeout
+    elif url.startswith("postgresql"):
+        connect_args["connect_timeout"] = int(settings.db_connect_timeout)
+    return EngineConfig(
+        poolclass=InstrumentedPool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=connect_args,
+    )
+
+
+sqlalchemy_config = SQLAlchemyAsyncConfig(
+    connection_string=settings.async_url,
+    engine_config=_engine_config(settings.async_url),
+    session_config=AsyncSessionConfig(expire_on_commit=False),
+)
 
 sqlalchemy_plugin = SQLAlchemyPlugin(config=sqlalchemy_config)
+
+
+def instrument_engine() -> None:
+    """Count the statements and DB time of each request, and record them in debug mode."""
+    engine = sqlalchemy_config.get_engine()
+    request_metrics.instrument(engine)
+    query_detector.instrument(engine)
+
+
+def pool_stats() -> PoolStats | None:
+    """Usage of the API engine's pool, or ``None`` if it is not an :class:`InstrumentedPool`."""
+    pool = sqlalchemy_config.get_engine().pool
+    return pool.stats() if isinstance(pool, InstrumentedPool) else None
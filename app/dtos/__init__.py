@@ -1 +1,144 @@
 """Data Transfer Objects for API requests and responses."""
+
+from dataclasses import dataclass, replace
+from typing import Annotated, Any, ClassVar
+
+from advanced_alchemy.extensions.litestar import SQLAlchemyDTO
+from advanced_alchemy.repository import LoadSpec
+from litestar.exceptions import ValidationException
+from litestar.params import Parameter
+from sqlalchemy import inspect
+from sqlalchemy.orm import MANYTOONE, joinedload, load_only, selectinload
+
+from app.pagination import CursorPage
+
+# Nunca se serializan en objetos anidados.
+HIDDEN_FIELDS = {"password"}
+
+# El esquema OpenAPI de la respuesta es el del DTO de lectura completo; con
+# ?fields= se devuelve un objeto parcial, y así lo documentan el parámetro y la respuesta.
+SparseFields = Annotated[
+    str | None,
+    Parameter(
+        query="fields",
+        description=(
+            "Comma-separated fields to return (e.g. `id,title`). Each object of the response is then "
+            "a partial object with only those fields, not the full response schema."
+        ),
+    ),
+]
+SPARSE_RESPONSE_DESCRIPTION = (
+    "The full representation. With `?fields=` every object is partial: it has only the requested "
+    "fields and the schema describes the full object."
+)
+
+
+@dataclass
+class SparseResult:
+    """Response built outside the read DTO (e.g. for ``?fields=``); read DTOs pass it through.
+
+    Handlers returning one document it with :data:`SparseFields` and
+    :data:`SPARSE_RESPONSE_DESCRIPTION`, since the OpenAPI schema is the DTO's.
+    """
+
+    content: Any
+
+
+@dataclass(frozen=True)
+class FieldSet:
+    """Fields requested with ``?fields=``; ``None`` fields means the full read DTO."""
+
+    model: type
+    fields: tuple[str, ...] | None = None
+
+    def load(self, read_options: LoadSpec) -> LoadSpec:
+        """Loader options that fetch only the requested columns and relationships."""
+        if self.fields is None:
+            return read_options
+        mapper = inspect(self.model)
+        # La PK siempre se carga (identidad del objeto y cursores de paginación).
+        keys = [mapper.get_property_by_column(column).key for column in mapper.primary_key]
+        columns = [
+            getattr(self.model, name) for name in dict.fromkeys((*keys, *self.fields)) if name in mapper.column_attrs
+        ]
+        options: list[Any] = [load_only(*columns, raiseload=True)]
+        for name in self.fields:
+            if name in mapper.relationships:
+                relationship = getattr(self.model, name)
+                strategy = joinedload if mapper.relationships[name].direction is MANYTOONE else selectinload
+                options.append(strategy(relationship))
+        return options
+
+    def apply(self, data: Any) -> Any:
+        """Return ``data`` unchanged for full reads, or only the requested fields."""
+        if self.fields is None:
+            return data
+        if isinstance(data, CursorPage):
+            return SparseResult(replace(data, items=[self._serialize(item) for item in data.items]))
+        if isinstance(data, (list, tuple)):
+            return SparseResult([self._serialize(item) for item in data])
+        return SparseResult(self._serialize(data))
+
+    def _serialize(self, instance: Any) -> dict[str, Any]:
+        return {name: _serialize_value(getattr(instance, name)) for name in self.fields or ()}
+
+
+def _columns(instance: Any) -> dict[str, Any]:
+    return {
+        attr.key: getattr(instance, attr.key)
+        for attr in inspect(instance).mapper.column_attrs
+        if attr.key not in HIDDEN_FIELDS
+    }
+
+
+def _serialize_value(value: Any) -> Any:
+    # Las relaciones se devuelven con sus columnas, como hace el DTO (un nivel).
+    if isinstance(value, list):
+        return [_columns(item) for item in value]
+    if hasattr(value, "__mapper__"):
+        return _columns(value)
+    return value
+
+
+class SparseReadDTO(SQLAlchemyDTO):
+    """Read DTO that also supports ``?fields=`` sparse fieldsets.
+
+    Usage in a handler::
+
+        @get("/{id:int}", response_description=SPARSE_RESPONSE_DESCRIPTION)
+        async def get_book(self, id: int, books_repo: BookRepository, fields: SparseFields = None) -> Book:
+            fieldset = BookReadDTO.fieldset(fields)
+            book = await books_repo.get(id, load=fieldset.load(books_repo.read_options))
+            return fieldset.apply(book)
+    """
+
+    _field_names: ClassVar[frozenset[str] | None] = None
+
+    @classmethod
+    def field_names(cls) -> frozenset[str]:
+        """Names this DTO serializes, as allowed in ``?fields=``."""
+        if cls._field_names is None:
+            mapper = inspect(cls.model_type)
+            names = {attr.key for attr in mapper.column_attrs} | set(mapper.relationships.keys())
+            if cls.config.include:
+                names &= set(cls.config.include)
+            cls._field_names = frozenset(names - set(cls.config.exclude))
+        return cls._field_names
+
+    @classmethod
+    def fieldset(cls, fields: str | None) -> FieldSet:
+        """Parse a comma-separated ``?fields=`` value."""
+        if not fields:
+            return FieldSet(cls.model_type)
+        requested = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in requested if name not in cls.field_names()]
+        if unknown or not requested:
+            raise ValidationException(
+                f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(sorted(cls.field_names()))}."
+            )
+        return FieldSet(cls.model_type, requested)
+
+    def data_to_encodable_type(self, data: Any) -> Any:
+        if isinstance(data, SparseResult):
+            return data.content
+        return super().data_to_encodable_type(data)
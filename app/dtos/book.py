@@ -2,10 +2,11 @@
 
 from advanced_alchemy.extensions.litestar import SQLAlchemyDTO, SQLAlchemyDTOConfig
 
+from app.dtos import SparseReadDTO
 from app.models import Book
 
 
-class BookReadDTO(SQLAlchemyDTO[Book]):
+class BookReadDTO(SparseReadDTO[Book]):
     """DTO for reading book data."""
 
     config = SQLAlchemyDTOConfig()
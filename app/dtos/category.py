@@ -1,7 +1,8 @@
 from advanced_alchemy.extensions.litestar import SQLAlchemyDTO, SQLAlchemyDTOConfig
+from app.dtos import SparseReadDTO
 from app.models import Category
 
-class CategoryReadDTO(SQLAlchemyDTO[Category]):
+class CategoryReadDTO(SparseReadDTO[Category]):
     config = SQLAlchemyDTOConfig()
 
 class CategoryCreateDTO(SQLAlchemyDTO[Category]):
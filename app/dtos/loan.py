@@ -2,10 +2,11 @@
 
 from advanced_alchemy.extensions.litestar import SQLAlchemyDTO, SQLAlchemyDTOConfig
 
+from app.dtos import SparseReadDTO
 from app.models import Loan
 
 
-class LoanReadDTO(SQLAlchemyDTO[Loan]):
+class LoanReadDTO(SparseReadDTO[Loan]):
     """DTO for reading loan data."""
 
     config = SQLAlchemyDTOConfig()
@@ -1,7 +1,8 @@
 from advanced_alchemy.extensions.litestar import SQLAlchemyDTO, SQLAlchemyDTOConfig
+from app.dtos import SparseReadDTO
 from app.models import Review
 
-class ReviewReadDTO(SQLAlchemyDTO[Review]):
+class ReviewReadDTO(SparseReadDTO[Review]):
     
     config = SQLAlchemyDTOConfig(
         include={"user", "book"}
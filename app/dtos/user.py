@@ -2,10 +2,11 @@
 
 from advanced_alchemy.extensions.litestar import SQLAlchemyDTO, SQLAlchemyDTOConfig
 
+from app.dtos import SparseReadDTO
 from app.models import User
 
 
-class UserReadDTO(SQLAlchemyDTO[User]):
+class UserReadDTO(SparseReadDTO[User]):
     """DTO for reading user data without password."""
 
     config = SQLAlchemyDTOConfig(exclude={"password", "loans"})
@@ -0,0 +1,157 @@
+"""Streaming parsers for bulk imports in CSV or NDJSON format."""
+
+import codecs
+import csv
+import json
+from collections.abc import AsyncIterator
+from typing import Any, Literal
+
+import msgspec
+
+from app.config import settings
+
+ImportFormat = Literal["csv", "ndjson"]
+
+CONTENT_TYPES: dict[str, ImportFormat] = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+class BookImportRow(msgspec.Struct, forbid_unknown_fields=True):
+    """Shape and types of one new book, imported or created in a batch."""
+
+    title: str
+    author: str
+    isbn: str
+    pages: int
+    published_year: int
+    language: str
+    stock: int = 1
+    description: str | None = None
+    publisher: str | None = None
+
+
+class RecordError(ValueError):
+    """A record that could not be read; its message is the row's error."""
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str | RecordError]:
+    """Yield the text lines of a byte stream without buffering the whole body.
+
+    Only the line being read is kept in memory: one longer than
+    ``book_import_max_record_size`` characters is discarded as it arrives
+    and a :class:`RecordError` is yielded in its place.
+    """
+    max_size = settings.book_import_max_record_size
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    # Trozos de la línea en curso; se descartan en cuanto pasa del máximo.
+    parts: list[str] = []
+    size = 0
+    too_long = False
+
+    def line_error() -> RecordError:
+        return RecordError(f"Línea de más de {max_size} caracteres; se descartó.")
+
+    async def texts() -> AsyncIterator[str]:
+        async for chunk in stream:
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+
+    async for text in texts():
+        # Sólo se separa el texto nuevo, no la línea acumulada.
+        pieces = text.split("\n")
+        for index, piece in enumerate(pieces):
+            if not too_long:
+                size += len(piece)
+                too_long = size > max_size
+                if too_long:
+                    parts.clear()
+                else:
+                    parts.append(piece)
+            if index < len(pieces) - 1:
+                yield line_error() if too_long else "".join(parts).rstrip("\r")
+                parts, size, too_long = [], 0, False
+
+    if size or too_long:
+        yield line_error() if too_long else "".join(parts).rstrip("\r")
+
+
+async def _iter_csv_records(lines: AsyncIterator[str | RecordError]) -> AsyncIterator[dict[str, str] | RecordError]:
+    header: list[str] | None = None
+    record = ""
+    record_lines = 0
+    async for line in lines:
+        if isinstance(line, RecordError):
+            # Una línea descartada también corta el registro que la contenía.
+            yield line
+            record, record_lines = "", 0
+            continue
+        record = f"{record}\n{line}" if record else line
+        record_lines += 1
+        # Un campo entre comillas puede contener saltos de línea: el registro
+        # está completo cuando el número de comillas es par.
+        if record and record.count('"') % 2:
+            # Una comilla suelta juntaría el resto del archivo en un registro.
+            if len(record) > settings.book_import_max_record_size:
+                yield RecordError(
+                    f"Registro de más de {settings.book_import_max_record_size} caracteres, "
+                    f"probablemente por comillas sin cerrar; se descartaron sus {record_lines} líneas."
+                )
+                record, record_lines = "", 0
+            continue
+        if not record:
+            record_lines = 0
+            continue
+        values = next(csv.reader([record]))
+        record, record_lines = "", 0
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield dict(zip(header, values))
+
+    if record:
+        yield RecordError(
+            f"Comillas sin cerrar al final del archivo: se descartó el último registro ({record_lines} líneas)."
+        )
+
+
+async def _iter_ndjson_records(lines: AsyncIterator[str | RecordError]) -> AsyncIterator[Any]:
+    async for line in lines:
+        if isinstance(line, RecordError):
+            yield line
+        elif line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                yield exc
+
+
+async def iter_book_rows(
+    stream: AsyncIterator[bytes],
+    import_format: ImportFormat,
+) -> AsyncIterator[tuple[int, dict[str, Any] | None, str | None]]:
+    """Yield ``(row_number, values, error)`` for every record of the stream.
+
+    ``values`` holds the typed columns of a :class:`BookImportRow` when the
+    record could be parsed, otherwise ``error`` describes the problem.
+    """
+    lines = iter_lines(stream)
+    records = _iter_csv_records(lines) if import_format == "csv" else _iter_ndjson_records(lines)
+
+    row_number = 0
+    async for record in records:
+        row_number += 1
+        if isinstance(record, Exception):
+            yield row_number, None, str(record) if isinstance(record, RecordError) else f"JSON inválido: {record}"
+            continue
+        if isinstance(record, dict) and import_format == "csv":
+            # En CSV una celda vacía equivale a un campo ausente.
+            record = {key: value for key, value in record.items() if value != ""}
+        try:
+            row = msgspec.convert(record, BookImportRow, strict=False)
+        except msgspec.ValidationError as exc:
+            yield row_number, None, str(exc)
+            continue
+        yield row_number, msgspec.structs.asdict(row), None
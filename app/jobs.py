@@ -0,0 +1,70 @@
+"""Background jobs started with the application."""
+
+import asyncio
+import contextlib
+import logging
+from datetime import date
+
+from app.config import settings
+from app.controllers import invalidate_books
+from app.models import OverdueSweepReport
+from app.repositories.loan import LoanRepository
+
+logger = logging.getLogger(__name__)
+
+
+class OverdueSweeper:
+    """Run :meth:`LoanRepository.sweep_overdue` every ``interval`` seconds.
+
+    Each worker process runs its own sweeper; sweeps are idempotent, so
+    overlapping runs only repeat the (empty) check.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._task: asyncio.Task[None] | None = None
+
+    async def run_once(self) -> OverdueSweepReport:
+        """Sweep once in a session of its own."""
+        from app.db import sqlalchemy_config
+
+        async with sqlalchemy_config.get_session() as session:
+            report = await LoanRepository(session=session).sweep_overdue(
+                date.today(), settings.loan_fine_per_day, settings.overdue_sweep_chunk_size
+            )
+        if report.processed:
+            # Los libros en caché incluyen sus préstamos.
+            await invalidate_books()
+        return report
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                report = await self.run_once()
+                logger.info(
+                    "overdue sweep: %d loans in %d chunks, %.1fs (%.0f rows/s)",
+                    report.processed,
+                    report.chunks,
+                    report.elapsed,
+                    report.rows_per_second,
+                )
+            except Exception:
+                logger.exception("overdue sweep failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the periodic sweep (no-op when the interval is 0)."""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Cancel the periodic sweep and wait for it to finish."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+
+overdue_sweeper = OverdueSweeper(interval=settings.overdue_sweep_interval)
@@ -0,0 +1,197 @@
+"""Lightweight in-process metrics shared by the telemetry endpoints."""
+
+import time
+from bisect import bisect_left
+from collections.abc import Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from litestar.config.app import AppConfig
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import Connection, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Límites (segundos) de los buckets de latencia, al estilo de Prometheus.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class HistogramSnapshot:
+    """Cumulative counts of a :class:`Histogram`; ``counts`` has one more entry, for ``+Inf``."""
+
+    buckets: list[float]
+    counts: list[int]
+    count: int
+    sum: float
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``observe`` is a bisect and two additions."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> HistogramSnapshot:
+        """Return cumulative counts per bucket."""
+        cumulative, total = [], 0
+        for count in self._counts:
+            total += count
+            cumulative.append(total)
+        return HistogramSnapshot(buckets=list(self.buckets), counts=cumulative, count=self.count, sum=self.sum)
+
+
+@dataclass
+class RouteMetrics:
+    """Counters of one ``(method, route)`` pair."""
+
+    latency: Histogram = field(default_factory=Histogram)
+    statuses: dict[int, int] = field(default_factory=dict)
+    statements: int = 0
+    db_time: float = 0.0
+
+
+@dataclass
+class _RequestDB:
+    statements: int = 0
+    db_time: float = 0.0
+
+
+_current_request: ContextVar[_RequestDB | None] = ContextVar("request_db", default=None)
+
+
+def _before_cursor_execute(conn: Connection, *_: Any) -> None:
+    if _current_request.get() is not None:
+        conn.info["metrics_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn: Connection, *_: Any) -> None:
+    request = _current_request.get()
+    started = conn.info.pop("metrics_started", None)
+    if request is not None and started is not None:
+        request.statements += 1
+        request.db_time += time.perf_counter() - started
+
+
+class RequestMetrics:
+    """Per-route request count, status codes, latency and SQL work of the API.
+
+    ``on_app_init`` puts the middleware first, outside authentication, so
+    rejected requests and the time spent authenticating are measured too.
+    Routes are keyed by their path template (``/books/{id:int}``), so the
+    number of series does not grow with the ids requested. The engine
+    listeners only add to the current request's counters, kept in a context
+    variable.
+    """
+
+    def __init__(self) -> None:
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+
+    def on_app_init(self, app_config: AppConfig) -> AppConfig:
+        """Install the middleware as the outermost one."""
+        app_config.middleware.insert(0, self.middleware)
+        return app_config
+
+    def instrument(self, engine: AsyncEngine) -> None:
+        """Attach the statement counting listeners to ``engine`` (idempotent)."""
+        for name, listener in (
+            ("before_cursor_execute", _before_cursor_execute),
+            ("after_cursor_execute", _after_cursor_execute),
+        ):
+            if not event.contains(engine.sync_engine, name, listener):
+                event.listen(engine.sync_engine, name, listener)
+
+    def middleware(self, app: ASGIApp) -> ASGIApp:
+        """ASGI middleware recording every HTTP request."""
+
+        async def handle(scope: Scope, receive: Receive, send: Send) -> None:
+            if scope["type"] != "http":
+                await app(scope, receive, send)
+                return
+
+            status = 500
+            request = _RequestDB()
+            token = _current_request.set(request)
+
+            async def send_with_status(message: Message) -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                await send(message)
+
+            start = time.perf_counter()
+            try:
+                await app(scope, receive, send_with_status)
+            except Exception as exc:
+                # El manejador de excepciones de la app está por fuera: p. ej. el 401 de la autenticación.
+                status = getattr(exc, "status_code", 500)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                _current_request.reset(token)
+                key = (scope["method"], scope.get("path_template") or scope["path"])
+                route = self.routes.get(key)
+                if route is None:
+                    route = self.routes[key] = RouteMetrics()
+                route.latency.observe(elapsed)
+                route.statuses[status] = route.statuses.get(status, 0) + 1
+                route.statements += request.statements
+                route.db_time += request.db_time
+
+        return handle
+
+
+request_metrics = RequestMetrics()
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PrometheusWriter:
+    """Builds a Prometheus text exposition (format 0.0.4)."""
+
+    def __init__(self) -> None:
+        self._lines: list[str] = []
+
+    def _header(self, name: str, kind: str, help: str) -> None:
+        self._lines.append(f"# HELP {name} {help}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def metric(self, name: str, kind: str, help: str, samples: Iterable[tuple[dict[str, Any], float]]) -> None:
+        """Write a counter or gauge with one sample per label set."""
+        self._header(name, kind, help)
+        self._lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+
+    def histogram(self, name: str, help: str, samples: Iterable[tuple[dict[str, Any], HistogramSnapshot]]) -> None:
+        """Write a histogram with one series per label set."""
+        self._header(name, "histogram", help)
+        for labels, snapshot in samples:
+            for bound, count in zip((*snapshot.buckets, "+Inf"), snapshot.counts):
+                le = bound if isinstance(bound, str) else _number(bound)
+                self._lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {count}")
+            self._lines.append(f"{name}_sum{_labels(labels)} {_number(snapshot.sum)}")
+            self._lines.append(f"{name}_count{_labels(labels)} {snapshot.count}")
+
+    def render(self) -> str:
+        """Return the exposition text."""
+        return "\n".join(self._lines) + "\n"
@@ -1,14 +1,15 @@
 """Database models for the library management system."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date, datetime
 
 from advanced_alchemy.base import BigIntAuditBase
-from sqlalchemy import ForeignKey, Table, Column, String, Numeric, Enum as SAEnum
+from advanced_alchemy.types import DateTimeUTC
+from sqlalchemy import BigInteger, CheckConstraint, ColumnElement, ForeignKey, Index, Integer, Table, Column, String, Numeric, Enum as SAEnum, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from decimal import Decimal
-from typing import Optional
+from typing import Any, Optional
 
 from enum import Enum
 
@@ -45,6 +46,8 @@ books_categories = Table(
     BigIntAuditBase.metadata,
     Column("book_id", ForeignKey("books.id"), primary_key=True),
     Column("category_id", ForeignKey("categories.id"), primary_key=True),
+    # La PK (book_id, category_id) no sirve para buscar por categoría.
+    Index("ix_books_categories_category_id_book_id", "category_id", "book_id"),
 )
 
 
@@ -52,6 +55,10 @@ class Book(BigIntAuditBase):
     """Book model with audit fields."""
 
     __tablename__ = "books"
+    __table_args__ = (
+        Index("ix_books_published_year", "published_year"),
+        Index("ix_books_created_at_id", "created_at", "id"),
+    )
 
     title: Mapped[str] = mapped_column(unique=True)
     author: Mapped[str]
@@ -76,6 +83,36 @@ class Book(BigIntAuditBase):
     )
 
 
+def _weighted_tsvector(column: ColumnElement[str | None], weight: str) -> ColumnElement:
+    return func.setweight(
+        func.to_tsvector(text("'simple'::regconfig"), func.coalesce(column, text("''"))),
+        text(f"'{weight}'"),
+    )
+
+
+def book_search_document() -> ColumnElement:
+    """Full-text document of a book (PostgreSQL), weighted title > author > publisher > description.
+
+    Must stay identical to the expression of ``ix_books_search`` so the index is used.
+    """
+    return (
+        _weighted_tsvector(Book.title, "A")
+        .op("||")(_weighted_tsvector(Book.author, "B"))
+        .op("||")(_weighted_tsvector(Book.publisher, "C"))
+        .op("||")(_weighted_tsvector(Book.description, "D"))
+    )
+
+
+# Índices de búsqueda: solo existen en PostgreSQL (GIN + pg_trgm).
+Index("ix_books_search", book_search_document(), postgresql_using="gin").ddl_if(dialect="postgresql")
+Index(
+    "ix_books_title_trgm", Book.title, postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_books_author_trgm", Book.author, postgresql_using="gin", postgresql_ops={"author": "gin_trgm_ops"}
+).ddl_if(dialect="postgresql")
+
+
 
 # Nueva class
 class Category(BigIntAuditBase):
@@ -97,6 +134,17 @@ class Loan(BigIntAuditBase):
     """Loan model with audit fields."""
 
     __tablename__ = "loans"
+    __table_args__ = (
+        Index("ix_loans_user_id_status", "user_id", "status"),
+        Index("ix_loans_book_id_status", "book_id", "status"),
+        # Solo los préstamos activos pueden vencer.
+        Index(
+            "ix_loans_active_due_date",
+            "due_date",
+            postgresql_where=text("status = 'ACTIVE'"),
+            sqlite_where=text("status = 'ACTIVE'"),
+        ),
+    )
 
     loan_dt: Mapped[date] = mapped_column(default=datetime.today)
     return_dt: Mapped[date | None]
@@ -119,6 +167,11 @@ class Review(BigIntAuditBase):
     """Review model."""
 
     __tablename__ = "reviews"
+    __table_args__ = (
+        Index("ix_reviews_book_id_user_id", "book_id", "user_id"),
+        Index("ix_reviews_user_id", "user_id"),
+        CheckConstraint("rating BETWEEN 1 AND 5", name="rating_range"),
+    )
 
     rating: Mapped[int]
     comment: Mapped[str]
@@ -133,6 +186,40 @@ class Review(BigIntAuditBase):
     book: Mapped["Book"] = relationship(back_populates="reviews")
 
 
+# Agregados de reseñas por libro, mantenidos por ReviewRepository en la misma
+# transacción que cada alta, cambio o baja de una reseña.
+RATING_VALUES = range(1, 6)
+
+book_ratings = Table(
+    "book_ratings",
+    BigIntAuditBase.metadata,
+    Column("book_id", ForeignKey("books.id", ondelete="CASCADE"), primary_key=True),
+    Column("review_count", Integer, nullable=False, server_default="0"),
+    Column("rating_sum", Integer, nullable=False, server_default="0"),
+    *(Column(f"rating_{value}", Integer, nullable=False, server_default="0") for value in RATING_VALUES),
+)
+
+# Reseñas por (usuario, libro) para la regla de máximo 3.
+review_counts = Table(
+    "review_counts",
+    BigIntAuditBase.metadata,
+    Column("user_id", ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("book_id", ForeignKey("books.id", ondelete="CASCADE"), primary_key=True),
+    Column("review_count", Integer, nullable=False, server_default="0"),
+)
+
+# Cambios de contraseña y bajas de usuarios, leídos periódicamente por cada
+# worker para revocar los tokens del modo JWT sin estado. Sin FK: la fila
+# sobrevive al borrado del usuario.
+token_revocations = Table(
+    "token_revocations",
+    BigIntAuditBase.metadata,
+    Column("user_id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True),
+    Column("revoked_at", DateTimeUTC(timezone=True), primary_key=True),
+    Index("ix_token_revocations_revoked_at", "revoked_at"),
+)
+
+
 
 @dataclass
 class PasswordUpdate:
@@ -142,6 +229,89 @@ class PasswordUpdate:
     new_password: str
 
 
+@dataclass
+class BulkCategoryAssignment:
+    """Categories to add to and remove from several books at once."""
+
+    book_ids: list[int]
+    add: list[int] = field(default_factory=list)
+    remove: list[int] = field(default_factory=list)
+
+
+@dataclass
+class CategoryAssignmentReport:
+    """Result of a category assignment: links actually inserted and deleted."""
+
+    books: int
+    added: int
+    removed: int
+
+
+@dataclass
+class CategoryCount:
+    """A category with the number of books linked to it."""
+
+    id: int
+    name: str
+    book_count: int
+
+
+@dataclass
+class BatchRequest:
+    """Creates, updates (objects with an ``id``) and deletes (ids) of a ``/batch`` request."""
+
+    create: list[dict[str, Any]] = field(default_factory=list)
+    update: list[dict[str, Any]] = field(default_factory=list)
+    delete: list[int] = field(default_factory=list)
+
+
+@dataclass
+class BatchItemResult:
+    """Outcome of one item of a batch, with the status the single-item endpoint would return."""
+
+    operation: str
+    index: int
+    status: int
+    id: int | None = None
+    detail: str | None = None
+
+
+@dataclass
+class BatchReport:
+    """Result of a batch: one entry per item, in request order."""
+
+    succeeded: int
+    failed: int
+    results: list[BatchItemResult]
+
+
+@dataclass
+class ImportRowError:
+    """Error of a single row of a bulk import."""
+
+    row: int
+    detail: str
+
+
+@dataclass
+class ImportReport:
+    """Result of a bulk import."""
+
+    imported: int = 0
+    failed: int = 0
+    errors: list[ImportRowError] = field(default_factory=list)
+    errors_truncated: bool = False
+
+
+@dataclass
+class BookGroupStats:
+    """Book statistics for a single language or category."""
+
+    key: str
+    total_books: int
+    average_pages: float
+
+
 @dataclass
 class BookStats:
     """Book statistics data."""
@@ -150,3 +320,25 @@ class BookStats:
     average_pages: float
     oldest_publication_year: int | None
     newest_publication_year: int | None
+    by_language: list[BookGroupStats] = field(default_factory=list)
+    by_category: list[BookGroupStats] = field(default_factory=list)
+
+
+@dataclass
+class OverdueSweepReport:
+    """Result of a sweep marking overdue loans and computing their fines."""
+
+    processed: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+    rows_per_second: float = 0.0
+
+
+@dataclass
+class BookRating:
+    """Rating aggregates of a book; ``histogram[i]`` counts the ``i + 1`` star reviews."""
+
+    book_id: int
+    review_count: int
+    average_rating: float | None
+    histogram: list[int]
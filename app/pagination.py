@@ -0,0 +1,88 @@
+"""Keyset (cursor) pagination helpers for list endpoints."""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from typing import Any, Generic, Literal, TypeVar
+
+from litestar.exceptions import ValidationException
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+Direction = Literal["next", "prev"]
+
+
+@dataclass
+class CursorPage(Generic[T]):
+    """A page of results with opaque cursors to the neighbouring pages."""
+
+    items: list[T]
+    limit: int
+    next: str | None
+    prev: str | None
+
+
+@dataclass
+class FacetCount:
+    """Number of results sharing one value of a facet."""
+
+    value: Any
+    count: int
+
+
+@dataclass
+class FacetedPage(CursorPage[T]):
+    """A :class:`CursorPage` plus facet counts over every result of the query, not just the page."""
+
+    facets: dict[str, list[FacetCount]] = field(default_factory=dict)
+
+
+def encode_cursor(direction: Direction, key: int) -> str:
+    """Encode a keyset position as an opaque, URL-safe cursor."""
+    raw = json.dumps([direction, key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Direction, int]:
+    """Decode a cursor produced by :func:`encode_cursor`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, key = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValidationException(detail="Cursor inválido.") from None
+
+    if direction not in ("next", "prev") or not isinstance(key, int):
+        raise ValidationException(detail="Cursor inválido.")
+    return direction, key
+
+
+def encode_search_cursor(direction: Direction, rank: float | None, key: int) -> str:
+    """Encode a position in ranked search results: the ``(rank, id)`` of the boundary row.
+
+    Search cursors are tagged, so they cannot be mistaken for list cursors
+    (and the other way around).
+    """
+    raw = json.dumps(["search", direction, rank, key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> tuple[Direction, float | None, int]:
+    """Decode a cursor produced by :func:`encode_search_cursor`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        kind, direction, rank, key = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValidationException(detail="Cursor inválido.") from None
+
+    if (
+        kind != "search"
+        or direction not in ("next", "prev")
+        or not (rank is None or isinstance(rank, (int, float)))
+        or not isinstance(key, int)
+    ):
+        raise ValidationException(detail="Cursor inválido.")
+    return direction, rank, key
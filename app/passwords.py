@@ -0,0 +1,71 @@
+"""Password hashing offloaded to a bounded worker pool."""
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from litestar.exceptions import ServiceUnavailableException
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+from app.config import settings
+
+T = TypeVar("T")
+
+password_hasher = PasswordHash(
+    (
+        Argon2Hasher(
+            time_cost=settings.argon2_time_cost,
+            memory_cost=settings.argon2_memory_cost,
+            parallelism=settings.argon2_parallelism,
+        ),
+    )
+)
+
+
+class PasswordHashPool:
+    """Runs Argon2 hashing and verification outside the event loop.
+
+    argon2-cffi releases the GIL while hashing, so a thread pool gives real
+    parallelism. At most ``workers + queue_size`` operations are admitted at
+    once; beyond that callers get an immediate 503 instead of queueing.
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.capacity = workers + queue_size
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+
+    async def _run(self, fn: Callable[..., T], *args: str) -> T:
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise ServiceUnavailableException(
+                detail="Servidor ocupado, intenta nuevamente.",
+                headers={"Retry-After": "1"},
+            )
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash a password in the worker pool."""
+        return await self._run(password_hasher.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """Verify a password against its hash in the worker pool."""
+        return await self._run(password_hasher.verify, password, hashed)
+
+    def shutdown(self) -> None:
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_pool = PasswordHashPool(
+    workers=settings.password_hash_workers,
+    queue_size=settings.password_hash_queue_size,
+)
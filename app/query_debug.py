@@ -0,0 +1,172 @@
+"""N+1 and slow-query detector, active only with ``settings.debug``.
+
+Records every SQL statement a request executes with its duration and its
+*shape* (the statement with literals, bound parameters and ``IN`` lists
+normalized away) and flags the request when:
+
+* one shape runs more than ``query_debug_repeat_threshold`` times (the
+  signature of an N+1: a relationship loaded once per row);
+* it runs more than ``query_debug_budget`` statements in total;
+* a single statement takes longer than ``query_debug_slow_ms``.
+
+Findings are logged as one JSON object per request (logger
+``app.query_debug``) and summarized in the ``X-Query-Findings`` response
+header; every response also gets ``X-Query-Stats`` with the statement count
+and DB time.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from litestar.config.app import AppConfig
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import Connection, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|\$\d+")
+_IN_LISTS = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize ``statement`` so executions that differ only in their values compare equal."""
+    shape = _LITERALS.sub("?", statement)
+    shape = _IN_LISTS.sub("IN (...)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+@dataclass
+class QueryFinding:
+    """One problem found in a request."""
+
+    kind: str  # "n_plus_one", "budget" o "slow"
+    detail: str
+    shape: str | None = None
+    count: int | None = None
+    duration_ms: float | None = None
+
+
+@dataclass
+class _RequestQueries:
+    durations: list[tuple[str, float]] = field(default_factory=list)
+
+    def findings(self) -> list[QueryFinding]:
+        findings = []
+        counts = Counter(shape for shape, _ in self.durations)
+        for shape, count in counts.most_common():
+            if count <= settings.query_debug_repeat_threshold:
+                break
+            findings.append(QueryFinding("n_plus_one", f"{count}x", shape=shape, count=count))
+        if len(self.durations) > settings.query_debug_budget:
+            findings.append(
+                QueryFinding("budget", f"{len(self.durations)}>{settings.query_debug_budget}", count=len(self.durations))
+            )
+        # Una entrada por forma lenta, con su peor duración.
+        slowest: dict[str, float] = {}
+        for shape, duration in self.durations:
+            duration_ms = duration * 1000
+            if duration_ms > settings.query_debug_slow_ms:
+                slowest[shape] = max(duration_ms, slowest.get(shape, 0.0))
+        for shape, duration_ms in slowest.items():
+            findings.append(QueryFinding("slow", f"{duration_ms:.1f}ms", shape=shape, duration_ms=duration_ms))
+        return findings
+
+
+_current_request: ContextVar[_RequestQueries | None] = ContextVar("request_queries", default=None)
+
+
+def _before_cursor_execute(conn: Connection, *_: Any) -> None:
+    if _current_request.get() is not None:
+        conn.info["query_debug_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn: Connection, _cursor: Any, statement: str, *_: Any) -> None:
+    request = _current_request.get()
+    started = conn.info.pop("query_debug_started", None)
+    if request is not None and started is not None:
+        request.durations.append((statement_shape(statement), time.perf_counter() - started))
+
+
+class QueryDetector:
+    """Installs the detector middleware and engine listeners when ``settings.debug`` is on."""
+
+    def on_app_init(self, app_config: AppConfig) -> AppConfig:
+        """Add the middleware as the outermost one, so authentication queries count too (debug only)."""
+        if settings.debug:
+            app_config.middleware.insert(0, self.middleware)
+        return app_config
+
+    def instrument(self, engine: AsyncEngine) -> None:
+        """Attach the recording listeners to ``engine`` (debug only, idempotent)."""
+        if not settings.debug:
+            return
+        for name, listener in (
+            ("before_cursor_execute", _before_cursor_execute),
+            ("after_cursor_execute", _after_cursor_execute),
+        ):
+            if not event.contains(engine.sync_engine, name, listener):
+                event.listen(engine.sync_engine, name, listener)
+
+    def middleware(self, app: ASGIApp) -> ASGIApp:
+        """ASGI middleware recording the statements of each HTTP request."""
+
+        async def handle(scope: Scope, receive: Receive, send: Send) -> None:
+            if scope["type"] != "http":
+                await app(scope, receive, send)
+                return
+
+            request = _RequestQueries()
+            token = _current_request.set(request)
+
+            async def send_with_findings(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    db_ms = sum(duration for _, duration in request.durations) * 1000
+                    headers = [
+                        *message.get("headers", []),
+                        (b"x-query-stats", f"statements={len(request.durations)}; db_ms={db_ms:.2f}".encode()),
+                    ]
+                    findings = request.findings()
+                    if findings:
+                        summary = "; ".join(f"{finding.kind}={finding.detail}" for finding in findings)
+                        headers.append((b"x-query-findings", summary.encode()))
+                    message["headers"] = headers
+                await send(message)
+
+            try:
+                await app(scope, receive, send_with_findings)
+            finally:
+                _current_request.reset(token)
+                findings = request.findings()
+                if findings:
+                    logger.warning(
+                        "query findings %s",
+                        json.dumps(
+                            {
+                                "method": scope["method"],
+                                "route": scope.get("path_template") or scope["path"],
+                                "path": scope["path"],
+                                "statements": len(request.durations),
+                                "db_ms": round(sum(duration for _, duration in request.durations) * 1000, 2),
+                                "findings": [
+                                    {key: value for key, value in asdict(finding).items() if value is not None}
+                                    for finding in findings
+                                ],
+                            },
+                            ensure_ascii=False,
+                        ),
+                    )
+
+        return handle
+
+
+query_detector = QueryDetector()
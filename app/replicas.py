@@ -0,0 +1,257 @@
+"""Read-replica routing for GET requests.
+
+With ``READ_DATABASE_URL`` set (one or more comma-separated URLs), the
+middleware of :class:`ReplicaRouter` picks a healthy replica, round-robin,
+for every ``GET`` / ``HEAD`` request and a ``do_orm_execute`` hook sends that
+request's plain SELECTs to it; writes, ``SELECT ... FOR UPDATE`` and every
+other request keep using the primary. A request with
+``X-Read-Your-Writes: true`` reads from the primary, so a client can see its
+own write right after making it; it also skips the response and stats
+caches, and those caches only store what was read from the primary.
+
+Replicas are checked every ``read_replica_check_interval`` seconds (on
+PostgreSQL also their replication lag, against ``read_replica_max_lag``) and
+a replica whose connection fails is taken out of rotation (the request that
+hit the failure still errors) until the next successful check; with no
+healthy replica reads go to the primary. The
+``X-DB-Read`` response header tells where a request read from.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass
+from itertools import count
+
+from advanced_alchemy.utils.dataclass import simple_asdict
+from litestar.config.app import AppConfig
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import event, text
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.config import settings
+from app.db import _engine_config
+from app.metrics import request_metrics
+from app.query_debug import query_detector
+
+logger = logging.getLogger(__name__)
+
+# Segundos de retraso de la réplica; 0 si reprodujo todo lo recibido.
+_PG_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+@dataclass
+class ReplicaStats:
+    """Health and usage of one read replica."""
+
+    name: str
+    healthy: bool
+    lag_seconds: float | None
+    last_error: str | None
+    checked_at: float | None
+    reads: int
+
+
+class Replica:
+    """One read replica with its engine and health state."""
+
+    def __init__(self, name: str, engine: AsyncEngine) -> None:
+        self.name = name
+        self.engine = engine
+        # Hasta el primer chequeo se asume sana: el fallo de una consulta la saca igual.
+        self.healthy = True
+        self.lag: float | None = None
+        self.last_error: str | None = None
+        self.checked_at: float | None = None
+        self.reads = 0
+
+    def fail(self, error: str) -> None:
+        """Take the replica out of rotation until it passes a check."""
+        if self.healthy:
+            logger.warning("read replica %s marked unhealthy: %s", self.name, error)
+        self.healthy = False
+        self.last_error = error
+
+    def on_error(self, context: ExceptionContext) -> None:
+        """``handle_error`` listener: connection failures take the replica out of rotation."""
+        # Solo errores de conexión, no de la consulta (p. ej. una sintaxis no soportada).
+        if context.is_disconnect or context.connection is None:
+            self.fail(str(context.original_exception))
+
+    def stats(self) -> ReplicaStats:
+        return ReplicaStats(
+            name=self.name,
+            healthy=self.healthy,
+            lag_seconds=self.lag,
+            last_error=self.last_error,
+            checked_at=self.checked_at,
+            reads=self.reads,
+        )
+
+
+_current_replica: ContextVar[Replica | None] = ContextVar("read_replica", default=None)
+_read_your_writes: ContextVar[bool] = ContextVar("read_your_writes", default=False)
+
+
+def reading_from_replica() -> bool:
+    """Whether the reads of the current request go to a replica."""
+    return _current_replica.get() is not None
+
+
+def read_your_writes() -> bool:
+    """Whether the current request asked to see its own writes (``X-Read-Your-Writes``)."""
+    return _read_your_writes.get()
+
+
+@contextlib.contextmanager
+def primary_reads() -> Iterator[None]:
+    """Send the reads made inside the block to the primary."""
+    token = _current_replica.set(None)
+    try:
+        yield
+    finally:
+        _current_replica.reset(token)
+
+
+def _route_reads(state: ORMExecuteState) -> None:
+    replica = _current_replica.get()
+    if replica is None or not state.is_select or getattr(state.statement, "_for_update_arg", None) is not None:
+        return
+    state.bind_arguments["bind"] = replica.engine.sync_engine
+    replica.reads += 1
+
+
+class ReplicaRouter:
+    """Routes the reads of GET requests to healthy replicas, falling back to the primary."""
+
+    def __init__(self, urls: list[str], check_interval: float, max_lag: float) -> None:
+        self.replicas = [
+            Replica(f"replica-{index}", create_async_engine(url, **simple_asdict(_engine_config(url), exclude_empty=True)))
+            for index, url in enumerate(urls)
+        ]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._turn = count()
+        self._task: asyncio.Task[None] | None = None
+
+    def choose(self) -> Replica | None:
+        """Next healthy replica in round-robin order, or ``None`` to read from the primary."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        return healthy[next(self._turn) % len(healthy)] if healthy else None
+
+    def on_app_init(self, app_config: AppConfig) -> AppConfig:
+        """Install the routing middleware (only when replicas are configured)."""
+        if self.replicas:
+            app_config.middleware.insert(0, self.middleware)
+        return app_config
+
+    def instrument(self) -> None:
+        """Register the read routing hook and instrument the replica engines like the primary."""
+        if not self.replicas:
+            return
+        if not event.contains(Session, "do_orm_execute", _route_reads):
+            event.listen(Session, "do_orm_execute", _route_reads)
+        for replica in self.replicas:
+            request_metrics.instrument(replica.engine)
+            query_detector.instrument(replica.engine)
+            if not event.contains(replica.engine.sync_engine, "handle_error", replica.on_error):
+                event.listen(replica.engine.sync_engine, "handle_error", replica.on_error)
+
+    def middleware(self, app: ASGIApp) -> ASGIApp:
+        """ASGI middleware choosing where each GET request reads from."""
+
+        async def handle(scope: Scope, receive: Receive, send: Send) -> None:
+            if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+                await app(scope, receive, send)
+                return
+
+            headers = dict(scope["headers"])
+            own_writes = headers.get(b"x-read-your-writes", b"").lower() in (b"1", b"true", b"yes")
+            replica = None if own_writes else self.choose()
+
+            async def send_with_source(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    # Se lee al enviar: un bloque primary_reads() pudo cambiar el origen.
+                    current = _current_replica.get()
+                    source = current.name if current else "primary"
+                    message["headers"] = [*message.get("headers", []), (b"x-db-read", source.encode())]
+                await send(message)
+
+            replica_token = _current_replica.set(replica)
+            read_your_writes_token = _read_your_writes.set(own_writes)
+            try:
+                await app(scope, receive, send_with_source)
+            finally:
+                _read_your_writes.reset(read_your_writes_token)
+                _current_replica.reset(replica_token)
+
+        return handle
+
+    async def check(self) -> None:
+        """Check every replica once, updating its health and lag."""
+        for replica in self.replicas:
+            try:
+                async with asyncio.timeout(settings.db_connect_timeout):
+                    async with replica.engine.connect() as connection:
+                        if connection.dialect.name == "postgresql":
+                            lag = float(await connection.scalar(_PG_LAG) or 0)
+                        else:
+                            await connection.execute(text("SELECT 1"))
+                            lag = 0.0
+            except (DBAPIError, OSError, TimeoutError) as exc:
+                replica.fail(str(getattr(exc, "orig", None) or exc) or type(exc).__name__)
+                replica.lag = None
+            else:
+                replica.lag = lag
+                if lag > self.max_lag:
+                    replica.fail(f"retraso de {lag:.1f}s")
+                else:
+                    if not replica.healthy:
+                        logger.info("read replica %s back in rotation", replica.name)
+                    replica.healthy = True
+                    replica.last_error = None
+            replica.checked_at = time.time()
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("read replica check failed")
+            await asyncio.sleep(self.check_interval)
+
+    def start(self) -> None:
+        """Start the periodic health checks (no-op without replicas or with a 0 interval)."""
+        if self.replicas and self.check_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Stop the health checks and close the replica connections."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> list[ReplicaStats]:
+        """Health and routed reads of every replica."""
+        return [replica.stats() for replica in self.replicas]
+
+
+replica_router = ReplicaRouter(
+    settings.read_async_urls,
+    check_interval=settings.read_replica_check_interval,
+    max_lag=settings.read_replica_max_lag,
+)
+
@@ -1 +1,225 @@
 """Repository layer for database operations."""
+
+from collections.abc import Sequence
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, ClassVar
+
+from advanced_alchemy.filters import LimitOffset
+from advanced_alchemy.repository import LoadSpec, ModelT, SQLAlchemyAsyncRepository
+from sqlalchemy import (
+    ColumnElement,
+    CursorResult,
+    Executable,
+    Insert,
+    Select,
+    Table,
+    UnaryExpression,
+    func,
+    inspect,
+    literal,
+    select,
+    union_all,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app.pagination import CursorPage, decode_cursor, encode_cursor
+
+# (parte, id del padre, id, updated_at): parte 0 son las filas pedidas y la
+# parte i la relación i de read_options, enlazada a su fila padre.
+VersionRow = tuple[int, int, int, datetime | None]
+
+
+@dataclass
+class VersionCapture:
+    """Version rows of what a conditional GET's handler loaded, taken without a query.
+
+    Set by :func:`app.conditional.conditional_get`; the first :meth:`AsyncRepository.get`
+    or :meth:`AsyncRepository.list_page` of ``repository`` fills it. ``rows``
+    stays ``None`` when the handler did not load every read relationship
+    (e.g. with ``?fields=``).
+    """
+
+    repository: type["AsyncRepository[Any]"]
+    captured: bool = False
+    rows: list[VersionRow] | None = None
+
+
+version_capture: ContextVar[VersionCapture | None] = ContextVar("version_capture", default=None)
+
+
+class AsyncRepository(SQLAlchemyAsyncRepository[ModelT]):
+    """Base async repository shared by every model repository.
+
+    With an ``AsyncSession`` relationships cannot be lazy-loaded while the DTO
+    serializes the response. Queries load no relationships by default; read
+    endpoints pass ``load=repo.read_options`` (the relationships their read DTO
+    returns) so they are fetched up front with a fixed number of queries:
+    ``joinedload`` for many-to-one, ``selectinload`` for collections.
+    """
+
+    read_options: ClassVar[LoadSpec] = []
+
+    async def add(self, data: ModelT, **kwargs: Any) -> ModelT:
+        """Add ``data`` and load the relationships of its read DTO before returning it."""
+        instance = await super().add(data, **kwargs)
+        return await self.get(self.get_id_attribute_value(instance), load=self.read_options)
+
+    async def get(self, item_id: Any, **kwargs: Any) -> ModelT:
+        """Get one row by primary key (see ``SQLAlchemyAsyncRepository.get``)."""
+        instance = await super().get(item_id, **kwargs)
+        self._capture_version([instance])
+        return instance
+
+    def _capture_version(self, instances: Sequence[ModelT]) -> None:
+        capture = version_capture.get()
+        if capture is None or capture.captured or not isinstance(self, capture.repository):
+            return
+        capture.captured = True
+        capture.rows = self.version_rows(instances)
+
+    def version_rows(self, instances: Sequence[ModelT]) -> list[VersionRow] | None:
+        """The rows :meth:`get_version` returns for ``instances``, from the loaded objects.
+
+        ``None`` if a relationship of :attr:`read_options` or an
+        ``updated_at`` was not loaded.
+        """
+        rows: list[VersionRow] = []
+        for instance in instances:
+            state = inspect(instance)
+            if "updated_at" in state.unloaded:
+                return None
+            rows.append((0, instance.id, instance.id, instance.updated_at))
+            for index, option in enumerate(self.read_options, start=1):
+                key = option.path[1].key
+                if key in state.unloaded:
+                    return None
+                value = getattr(instance, key)
+                for related in value if isinstance(value, list) else [value] if value is not None else []:
+                    if "updated_at" in inspect(related).unloaded:
+                        return None
+                    rows.append((index, instance.id, related.id, related.updated_at))
+        return sorted(rows)
+
+    def _insert(self, table: Table) -> Insert:
+        """Core INSERT for the session's dialect, which supports ``ON CONFLICT``."""
+        insert = postgresql.insert if self.session.get_bind().dialect.name == "postgresql" else sqlite.insert
+        return insert(table)
+
+    async def _execute_rows(
+        self, rows: list[tuple[int, dict[str, Any]]], *statements: Executable, conflict: str
+    ) -> tuple[dict[int, Any], list[tuple[int, str]]]:
+        """Execute ``statements`` for every row as executemany calls inside one savepoint.
+
+        If a row violates a constraint the rows are retried one by one in
+        their own savepoints, so only the offending ones fail. Returns the
+        first RETURNING column of the last statement per row (when it has
+        one) and ``(row, error)`` for the rows that failed, ``conflict``
+        being the start of their message.
+        """
+        returned: dict[int, Any] = {}
+        errors: list[tuple[int, str]] = []
+
+        async def execute(chunk: list[tuple[int, dict[str, Any]]]) -> None:
+            for statement in statements:
+                result = await self.session.execute(statement, [row for _, row in chunk])
+            # El UPDATE masivo del ORM por clave primaria no devuelve un CursorResult.
+            if isinstance(result, CursorResult) and result.returns_rows:
+                returned.update(zip((key for key, _ in chunk), result.scalars()))
+
+        if not rows:
+            return returned, errors
+        try:
+            async with self.session.begin_nested():
+                await execute(rows)
+        except IntegrityError:
+            returned.clear()
+            for row in rows:
+                try:
+                    async with self.session.begin_nested():
+                        await execute([row])
+                except IntegrityError as exc:
+                    errors.append((row[0], f"{conflict}: {exc.orig}"))
+        return returned, errors
+
+    async def list_page(
+        self,
+        *filters: ColumnElement[bool],
+        cursor: str | None,
+        limit: int,
+        load: LoadSpec | None = None,
+    ) -> CursorPage[ModelT]:
+        """Return one page ordered by ``id`` using keyset pagination.
+
+        Pages are selected with ``id > key`` / ``id < key`` on the primary key
+        index instead of an OFFSET, so the cost of a page does not depend on
+        how deep into the table it is.
+        """
+        filters, order_by, direction, key = self._keyset(filters, cursor)
+        # Se pide un registro extra para saber si hay más páginas.
+        items = list(
+            await self.list(*filters, LimitOffset(limit=limit + 1, offset=0), order_by=order_by, load=load)
+        )
+        self._capture_version(items)
+        has_more = len(items) > limit
+        items = items[:limit]
+
+        if direction == "prev":
+            items.reverse()
+            has_next, has_prev = True, has_more
+        else:
+            has_next, has_prev = has_more, key is not None
+
+        return CursorPage(
+            items=items,
+            limit=limit,
+            next=encode_cursor("next", items[-1].id) if items and has_next else None,
+            prev=encode_cursor("prev", items[0].id) if items and has_prev else None,
+        )
+
+    def _keyset(
+        self, filters: tuple[ColumnElement[bool], ...], cursor: str | None
+    ) -> tuple[tuple[ColumnElement[bool], ...], UnaryExpression[Any], str, int | None]:
+        id_column = self.model_type.id
+        direction, key = decode_cursor(cursor) if cursor else ("next", None)
+        if direction == "next":
+            if key is not None:
+                filters = (*filters, id_column > key)
+            return filters, id_column.asc(), direction, key
+        return (*filters, id_column < key), id_column.desc(), direction, key
+
+    def page_ids(self, *filters: ColumnElement[bool], cursor: str | None, limit: int) -> Select[Any]:
+        """SELECT of the ids :meth:`list_page` reads for the same arguments.
+
+        Includes the extra row that tells whether there is a next page, so
+        its fingerprint also changes when the page gains a ``next`` cursor.
+        """
+        filters, order_by, _, _ = self._keyset(filters, cursor)
+        return select(self.model_type.id).where(*filters).order_by(order_by).limit(limit + 1)
+
+    async def get_version(self, ids: Select[Any]) -> list[VersionRow]:
+        """Fingerprint rows of the rows selected by ``ids`` and of their read relationships.
+
+        Returns ``(part, parent id, id, updated_at)`` for every row and every
+        related row of :attr:`read_options`, sorted, in one UNION ALL query
+        that reads only keys and timestamps. Any insert, update or delete,
+        and any link added or removed, changes the list.
+        """
+        ids = ids.subquery()
+        model = self.model_type
+        parts = [
+            select(literal(0), model.id, model.id, model.updated_at).where(model.id.in_(select(ids.c.id)))
+        ]
+        for index, option in enumerate(self.read_options, start=1):
+            relationship = option.path[1]
+            target = relationship.entity.class_
+            parts.append(
+                select(literal(index), model.id, target.id, target.updated_at)
+                .select_from(model)
+                .join(relationship.class_attribute)
+                .where(model.id.in_(select(ids.c.id)))
+            )
+        rows = (await self.session.execute(union_all(*parts))).all()
+        return sorted((part, parent_id, id, updated_at) for part, parent_id, id, updated_at in rows)
@@ -1,17 +1,429 @@
 """Repository for Book database operations."""
 
-from advanced_alchemy.repository import SQLAlchemySyncRepository
-from sqlalchemy.orm import Session
+import time
 
-from app.models import Book
+from collections.abc import Collection
+from typing import Any, Literal
 
+from advanced_alchemy.repository import LoadSpec
+from litestar.exceptions import ValidationException
+from sqlalchemy import (
+    ColumnElement,
+    Double,
+    Insert,
+    and_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    null,
+    or_,
+    select,
+    text,
+    true,
+    union,
+    union_all,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-class BookRepository(SQLAlchemySyncRepository[Book]):
+from app.batch import BatchResults, not_found
+from app.config import settings
+from app.models import (
+    RATING_VALUES,
+    Book,
+    BookGroupStats,
+    BookRating,
+    BookStats,
+    Category,
+    CategoryAssignmentReport,
+    Loan,
+    Review,
+    book_ratings,
+    book_search_document,
+    books_categories,
+)
+from app.pagination import CursorPage, FacetCount, decode_search_cursor, encode_search_cursor
+from app.replicas import read_your_writes, reading_from_replica
+from app.repositories import AsyncRepository
+
+
+class BookStatsCache:
+    """Process-local snapshot of the catalog statistics.
+
+    Book writes call :meth:`invalidate`; the TTL bounds staleness for writes
+    made by other workers. Every invalidation bumps a generation, so a
+    snapshot computed before a write is not stored after it.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._stats: BookStats | None = None
+        self._expires_at = 0.0
+        self._generation = 0
+
+    def get(self) -> tuple[BookStats | None, int]:
+        """Return the cached snapshot if it is still fresh, and the current generation."""
+        if self._stats is not None and time.monotonic() < self._expires_at:
+            return self._stats, self._generation
+        return None, self._generation
+
+    def set(self, stats: BookStats, generation: int) -> bool:
+        """Store a new snapshot computed at ``generation`` (see :meth:`get`)."""
+        # Una invalidación durante el cálculo deja el snapshot obsoleto: no se guarda.
+        if generation != self._generation:
+            return False
+        self._stats = stats
+        self._expires_at = time.monotonic() + self.ttl
+        return True
+
+    def invalidate(self) -> None:
+        """Drop the snapshot so the next read recomputes it."""
+        self._stats = None
+        self._generation += 1
+
+
+book_stats_cache = BookStatsCache(ttl=settings.book_stats_ttl)
+
+CategoryMatch = Literal["any", "all"]
+
+
+class BookRepository(AsyncRepository[Book]):
     """Repository for book database operations."""
 
     model_type = Book
+    # Relaciones que serializa BookReadDTO (colecciones: una consulta cada una).
+    read_options = [
+        selectinload(Book.categories),
+        selectinload(Book.loans),
+        selectinload(Book.reviews),
+    ]
+
+    async def get_stats(self) -> BookStats:
+        """Get catalog statistics computed with one SQL aggregate query, cached between writes.
+
+        Requests with ``X-Read-Your-Writes`` skip the snapshot, and one read
+        from a replica is not stored.
+        """
+        stats, generation = book_stats_cache.get()
+        if stats is not None and not read_your_writes():
+            return stats
+
+        # Totales, idiomas y categorías en una sola sentencia: parte 0, 1 y 2.
+        totals = select(
+            literal(0).label("part"),
+            null().label("key"),
+            func.count(Book.id),
+            func.avg(Book.pages),
+            func.min(Book.published_year),
+            func.max(Book.published_year),
+        )
+        by_language = select(
+            literal(1), Book.language, func.count(Book.id), func.avg(Book.pages), null(), null()
+        ).group_by(Book.language)
+        by_category = (
+            select(literal(2), Category.name, func.count(Book.id), func.avg(Book.pages), null(), null())
+            .join(books_categories, books_categories.c.category_id == Category.id)
+            .join(Book, Book.id == books_categories.c.book_id)
+            .group_by(Category.name)
+        )
+        rows = await self.session.execute(union_all(totals, by_language, by_category).order_by("part", "key"))
+
+        groups: dict[int, list[BookGroupStats]] = {1: [], 2: []}
+        for part, key, count, avg, oldest_year, newest_year in rows:
+            if part == 0:
+                total_books, average_pages, oldest, newest = count, avg, oldest_year, newest_year
+            else:
+                groups[part].append(BookGroupStats(key=key, total_books=count, average_pages=float(avg or 0)))
+
+        stats = BookStats(
+            total_books=total_books,
+            average_pages=float(average_pages or 0),
+            oldest_publication_year=oldest,
+            newest_publication_year=newest,
+            by_language=groups[1],
+            by_category=groups[2],
+        )
+        if not reading_from_replica():
+            book_stats_cache.set(stats, generation)
+        return stats
+
+    async def get_ratings(self, ids: list[int]) -> list[BookRating]:
+        """Get the rating aggregates of several books in one query, in ``ids`` order.
+
+        Books without reviews get zero counts. Missing books are not checked here.
+        """
+        rows = {
+            row.book_id: row
+            for row in await self.session.execute(select(book_ratings).where(book_ratings.c.book_id.in_(ids)))
+        }
+        ratings = []
+        for book_id in ids:
+            row = rows.get(book_id)
+            if row is None or not row.review_count:
+                ratings.append(BookRating(book_id=book_id, review_count=0, average_rating=None, histogram=[0] * 5))
+                continue
+            ratings.append(
+                BookRating(
+                    book_id=book_id,
+                    review_count=row.review_count,
+                    average_rating=round(row.rating_sum / row.review_count, 2),
+                    histogram=[row._mapping[f"rating_{value}"] for value in RATING_VALUES],
+                )
+            )
+        return ratings
+
+    @staticmethod
+    def category_filters(category_ids: Collection[int], match: CategoryMatch = "any") -> tuple[ColumnElement[bool], ...]:
+        """Filters for books in any (or all) of ``category_ids``.
+
+        A semi-join on ``books_categories`` that reads only the
+        ``(category_id, book_id)`` index; with ``all`` the links are grouped
+        per book and only books linked to every category are kept.
+        """
+        ids = set(category_ids)
+        if not ids:
+            return ()
+        linked = select(books_categories.c.book_id).where(books_categories.c.category_id.in_(ids))
+        if match == "all":
+            linked = linked.group_by(books_categories.c.book_id).having(func.count() == len(ids))
+        return (Book.id.in_(linked),)
+
+    async def get_facets(self, *filters: ColumnElement[bool]) -> dict[str, list[FacetCount]]:
+        """Count the books matching ``filters`` per language and per publication decade."""
+        decade = (Book.published_year // 10 * 10).label("decade")
+        languages = await self.session.execute(
+            select(Book.language, func.count()).where(*filters).group_by(Book.language).order_by(Book.language)
+        )
+        decades = await self.session.execute(
+            select(decade, func.count()).where(*filters).group_by(decade).order_by(decade)
+        )
+        return {
+            "language": [FacetCount(value=value, count=count) for value, count in languages],
+            "decade": [FacetCount(value=value, count=count) for value, count in decades],
+        }
+
+    def _upsert_by_isbn(self) -> Insert:
+        # INSERT de Core sobre la tabla: evita el procesamiento por fila del ORM.
+        statement = self._insert(Book.__table__)
+        updated = ("title", "author", "pages", "published_year", "stock", "description", "language", "publisher")
+        return statement.on_conflict_do_update(
+            index_elements=["isbn"],
+            set_={
+                **{name: statement.excluded[name] for name in updated},
+                "updated_at": statement.excluded.updated_at,
+            },
+        )
+
+    async def import_chunk(self, rows: list[tuple[int, dict[str, Any]]]) -> tuple[int, list[tuple[int, str]]]:
+        """Insert or update (by ``isbn``) a chunk of validated rows in one transaction.
+
+        The chunk is written with a single multi-row upsert. If it violates a
+        constraint (e.g. a repeated title) it is retried row by row in
+        savepoints so only the offending rows fail. Returns the number of
+        rows written and ``(row, error)`` for the rows that could not be.
+        Of several rows with the same ``isbn`` only the last one is written.
+        """
+        # Un mismo isbn dos veces en un INSERT ... ON CONFLICT falla; gana la última fila.
+        rows = list({row["isbn"]: (row_number, row) for row_number, row in rows}.values())
+        _, errors = await self._execute_rows(rows, self._upsert_by_isbn(), conflict="Conflicto con un libro existente")
+        await self.session.commit()
+        return len(rows) - len(errors), errors
+
+    async def write_batch(
+        self,
+        creates: list[tuple[int, dict[str, Any]]],
+        updates: list[tuple[int, int, dict[str, Any]]],
+        deletes: list[tuple[int, int]],
+        results: BatchResults,
+    ) -> None:
+        """Apply validated book creates, updates and deletes in one transaction.
+
+        Each kind is one executemany (an INSERT ... RETURNING, an ORM bulk
+        UPDATE by primary key and a DELETE of the books and their category
+        links), retried row by row only when a row violates a constraint.
+        """
+        targets = [id for _, id, _ in updates] + [id for _, id in deletes]
+        existing = set(await self.session.scalars(select(Book.id).where(Book.id.in_(targets)))) if targets else set()
+        for operation, items in (("update", [(index, id) for index, id, _ in updates]), ("delete", deletes)):
+            for index, id in items:
+                if id not in existing:
+                    results.fail(operation, index, 404, not_found(id), id=id)
+        # Como en DELETE /books/{id}, un libro con préstamos o reseñas no se borra.
+        deleted = [id for _, id in deletes if id in existing]
+        referenced: set[int] = set()
+        if deleted:
+            referenced = set(
+                await self.session.scalars(
+                    union(
+                        select(Loan.book_id).where(Loan.book_id.in_(deleted)),
+                        select(Review.book_id).where(Review.book_id.in_(deleted)),
+                    )
+                )
+            )
+        for index, id in deletes:
+            if id in referenced:
+                results.fail("delete", index, 409, "El libro tiene préstamos o reseñas.", id=id)
+
+        table = Book.__table__
+        statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        ids, errors = await self._execute_rows(creates, statement, conflict="Conflicto con un libro existente")
+        for index, id in ids.items():
+            results.succeed("create", index, 201, id)
+        for index, detail in errors:
+            results.fail("create", index, 409, detail)
+
+        rows = [(index, {"id": id, **values}) for index, id, values in updates if id in existing]
+        _, errors = await self._execute_rows(rows, update(Book), conflict="Conflicto con un libro existente")
+        failed = dict(errors)
+        for index, row in rows:
+            if index in failed:
+                results.fail("update", index, 409, failed[index], id=row["id"])
+            else:
+                results.succeed("update", index, 200, row["id"])
+
+        rows = [(index, {"book_id": id}) for index, id in deletes if id in existing and id not in referenced]
+        _, errors = await self._execute_rows(
+            rows,
+            delete(books_categories).where(books_categories.c.book_id == bindparam("book_id")),
+            delete(table).where(table.c.id == bindparam("book_id")),
+            conflict="El libro tiene registros asociados",
+        )
+        failed = dict(errors)
+        for index, row in rows:
+            if index in failed:
+                results.fail("delete", index, 409, failed[index], id=row["book_id"])
+            else:
+                results.succeed("delete", index, 204, row["book_id"])
+
+        await self.session.commit()
+
+    async def change_categories(
+        self, book_ids: Collection[int], add: Collection[int], remove: Collection[int]
+    ) -> CategoryAssignmentReport:
+        """Link ``add`` to and unlink ``remove`` from every book in ``book_ids`` in one transaction.
+
+        Two set-based statements on ``books_categories``: an INSERT ... SELECT
+        with ON CONFLICT DO NOTHING and a DELETE, so links that already are in
+        the wanted state are not written and the row count is the number of
+        links actually changed. Ids are not checked here.
+        """
+        added = removed = 0
+        if book_ids and remove:
+            result = await self.session.execute(
+                delete(books_categories).where(
+                    books_categories.c.book_id.in_(book_ids), books_categories.c.category_id.in_(remove)
+                )
+            )
+            removed = result.rowcount
+        if book_ids and add:
+            # Producto cruzado explícito (ON true): todas las parejas libro-categoría existentes.
+            pairs = (
+                select(Book.id, Category.id)
+                .select_from(Book)
+                .join(Category, true())
+                .where(Book.id.in_(book_ids), Category.id.in_(add))
+            )
+            statement = self._insert(books_categories).from_select(["book_id", "category_id"], pairs)
+            result = await self.session.execute(statement.on_conflict_do_nothing())
+            added = result.rowcount
+        await self.session.commit()
+        return CategoryAssignmentReport(books=len(book_ids), added=added, removed=removed)
+
+    async def set_categories(self, book_id: int, category_ids: Collection[int]) -> CategoryAssignmentReport:
+        """Make ``category_ids`` the categories of the book, writing only the links that change."""
+        current = set(
+            await self.session.scalars(
+                select(books_categories.c.category_id).where(books_categories.c.book_id == book_id)
+            )
+        )
+        wanted = set(category_ids)
+        return await self.change_categories([book_id], add=wanted - current, remove=current - wanted)
+
+    async def search_page(
+        self, query: str, *, cursor: str | None, limit: int, load: LoadSpec | None = None
+    ) -> CursorPage[Book]:
+        """Search books by title, author, publisher and description.
+
+        On PostgreSQL results come from the ``ix_books_search`` full-text index
+        plus trigram matches on title/author (typos), ordered by relevance.
+        Other databases fall back to a case-insensitive LIKE ordered by id.
+        Pages are keyset on ``(rank, id)`` (see :func:`encode_search_cursor`):
+        one query reads the ids and ranks of the page, a second one loads the
+        books with ``load``.
+        """
+        direction, key_rank, key = decode_search_cursor(cursor) if cursor else ("next", None, None)
+        forward = direction == "next"
+
+        if self.session.get_bind().dialect.name == "postgresql":
+            document = book_search_document()
+            ts_query = func.websearch_to_tsquery(text("'simple'::regconfig"), query)
+            filters = [
+                or_(
+                    document.op("@@")(ts_query),
+                    Book.title.op("%>")(query),
+                    Book.author.op("%>")(query),
+                )
+            ]
+            # En double precision el rank vuelve exacto en el cursor (JSON) y la igualdad es confiable.
+            rank = cast(
+                func.ts_rank(document, ts_query)
+                + func.greatest(
+                    func.word_similarity(query, Book.title),
+                    func.word_similarity(query, Book.author),
+                ),
+                Double,
+            )
+            if key is not None:
+                if key_rank is None:
+                    raise ValidationException(detail="Cursor inválido.")
+                filters.append(
+                    or_(rank < key_rank, and_(rank == key_rank, Book.id > key))
+                    if forward
+                    else or_(rank > key_rank, and_(rank == key_rank, Book.id < key))
+                )
+            order_by = [rank.desc(), Book.id.asc()] if forward else [rank.asc(), Book.id.desc()]
+        else:
+            pattern = f"%{query}%"
+            filters = [
+                or_(
+                    Book.title.ilike(pattern),
+                    Book.author.ilike(pattern),
+                    Book.publisher.ilike(pattern),
+                    Book.description.ilike(pattern),
+                )
+            ]
+            rank = null()
+            if key is not None:
+                filters.append(Book.id > key if forward else Book.id < key)
+            order_by = [Book.id.asc()] if forward else [Book.id.desc()]
+
+        # Se pide un registro extra para saber si hay más páginas.
+        rows = list(
+            await self.session.execute(select(Book.id, rank).where(*filters).order_by(*order_by).limit(limit + 1))
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if forward:
+            has_next, has_prev = has_more, key is not None
+        else:
+            rows.reverse()
+            has_next, has_prev = True, has_more
+
+        books: dict[int, Book] = {}
+        if rows:
+            books = {book.id: book for book in await self.list(Book.id.in_([id for id, _ in rows]), load=load)}
+        return CursorPage(
+            items=[books[id] for id, _ in rows if id in books],
+            limit=limit,
+            next=encode_search_cursor("next", rows[-1][1], rows[-1][0]) if rows and has_next else None,
+            prev=encode_search_cursor("prev", rows[0][1], rows[0][0]) if rows and has_prev else None,
+        )
 
 
-async def provide_book_repo(db_session: Session) -> BookRepository:
+async def provide_book_repo(db_session: AsyncSession) -> BookRepository:
     """Provide book repository instance with auto-commit."""
     return BookRepository(session=db_session, auto_commit=True)
@@ -1,9 +1,26 @@
-from advanced_alchemy.repository import SQLAlchemySyncRepository
-from sqlalchemy.orm import Session
-from app.models import Category
+from collections.abc import Collection
 
-class CategoryRepository(SQLAlchemySyncRepository[Category]):
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.models import Category, books_categories
+from app.repositories import AsyncRepository
+
+class CategoryRepository(AsyncRepository[Category]):
     model_type = Category
+    read_options = [selectinload(Category.books)]
+
+    async def get_book_counts(self, category_ids: Collection[int]) -> dict[int, int]:
+        """Number of books of each category, with one GROUP BY over ``books_categories``.
+
+        Categories without books are missing from the result.
+        """
+        rows = await self.session.execute(
+            select(books_categories.c.category_id, func.count())
+            .where(books_categories.c.category_id.in_(category_ids))
+            .group_by(books_categories.c.category_id)
+        )
+        return {category_id: count for category_id, count in rows}
 
-async def provide_category_repo(db_session: Session) -> CategoryRepository:
+async def provide_category_repo(db_session: AsyncSession) -> CategoryRepository:
     return CategoryRepository(session=db_session, auto_commit=True)
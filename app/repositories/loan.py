@@ -1,17 +1,309 @@
 """Repository for Loan database operations."""
 
-from advanced_alchemy.repository import SQLAlchemySyncRepository
-from sqlalchemy.orm import Session
+import time
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
 
-from app.models import Loan
+from advanced_alchemy.exceptions import NotFoundError
+from sqlalchemy import (
+    ColumnElement,
+    Date,
+    Integer,
+    Numeric,
+    and_,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.batch import BatchResults, NewLoan, not_found
+from app.models import Book, Loan, LoanStatus, OverdueSweepReport, User
+from app.repositories import AsyncRepository
 
-class LoanRepository(SQLAlchemySyncRepository[Loan]):
-    """Repository for loan database operations."""
+# Días de préstamo hasta la fecha de vencimiento.
+LOAN_DAYS = 14
+
+
+class LoanRepository(AsyncRepository[Loan]):
+    """Repository for loan database operations.
+
+    ``Book.stock`` counts the copies on the shelf: creating a loan takes one,
+    returning or deleting an unreturned loan puts it back. Every change is a
+    single conditional UPDATE flushed in the same transaction as the loan write,
+    so concurrent checkouts of the same book can never oversell it.
+    """
 
     model_type = Loan
+    # Muchos-a-uno: se traen en la misma consulta con un JOIN.
+    read_options = [joinedload(Loan.user), joinedload(Loan.book)]
+
+    async def _take_copy(self, book_id: int) -> bool:
+        result = await self.session.execute(
+            update(Book)
+            .where(Book.id == book_id, Book.stock > 0)
+            .values(stock=Book.stock - 1)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    async def _return_copy(self, book_id: int) -> None:
+        await self.session.execute(
+            update(Book)
+            .where(Book.id == book_id)
+            .values(stock=Book.stock + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def add_reserving_copy(self, loan: Loan) -> Loan | None:
+        """Insert ``loan`` taking one copy of its book; ``None`` if none is left."""
+        if not await self._take_copy(loan.book_id):
+            await self.session.rollback()
+            if await self.session.scalar(select(Book.id).where(Book.id == loan.book_id)) is None:
+                raise NotFoundError(f"No item found when filtering by id={loan.book_id}")
+            return None
+        return await self.add(loan)
+
+    async def update_status(self, loan: Loan, status: LoanStatus) -> bool:
+        """Move ``loan`` to ``status``, taking or returning its copy as needed.
+
+        The UPDATE only matches while the row still has the status read into
+        ``loan``; ``False`` means another request changed it first or, when
+        reopening a returned loan, that no copy is available.
+        """
+        result = await self.session.execute(
+            update(Loan)
+            .where(Loan.id == loan.id, Loan.status == loan.status)
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            await self.session.rollback()
+            return False
+
+        was_out = loan.status != LoanStatus.RETURNED
+        is_out = status != LoanStatus.RETURNED
+        if was_out and not is_out:
+            await self._return_copy(loan.book_id)
+        elif is_out and not was_out and not await self._take_copy(loan.book_id):
+            await self.session.rollback()
+            return False
+
+        await self.session.commit()
+        set_committed_value(loan, "status", status)
+        return True
+
+    async def delete_returning_copy(self, id: int) -> int:
+        """Delete a loan, returning its copy if it was still out; returns the loan's book id."""
+        row = (
+            await self.session.execute(
+                delete(Loan).where(Loan.id == id).returning(Loan.book_id, Loan.status)
+            )
+        ).one_or_none()
+        if row is None:
+            raise NotFoundError(f"No item found when filtering by id={id}")
+        if row.status != LoanStatus.RETURNED:
+            await self._return_copy(row.book_id)
+        await self.session.commit()
+        return row.book_id
+
+    async def write_batch(
+        self,
+        creates: list[tuple[int, NewLoan]],
+        updates: list[tuple[int, int, LoanStatus]],
+        deletes: list[tuple[int, int]],
+        results: BatchResults,
+    ) -> set[int] | None:
+        """Apply loan creates, status updates and deletes in one transaction.
+
+        Deletes go first and updates before creates, so the copies they put
+        back can be lent by later items. Stock is read once and handed out in
+        item order; every change is then one statement: a DELETE ... RETURNING,
+        an UPDATE of the statuses and one of the stock (``CASE`` per id) and a
+        multi-row INSERT. The UPDATEs only match rows still in the state read,
+        so if another request changed them meanwhile the whole batch is rolled
+        back and ``None`` is returned. Otherwise returns the ids of the books
+        whose loans changed.
+        """
+        books: set[int] = set()
+        # Ejemplares que devuelve (+) o toma (-) el lote, por libro.
+        stock_changes: Counter[int] = Counter()
+
+        if deletes:
+            rows = await self.session.execute(
+                delete(Loan).where(Loan.id.in_([id for _, id in deletes])).returning(Loan.id, Loan.book_id, Loan.status)
+            )
+            deleted = {row.id: row for row in rows}
+            for index, id in deletes:
+                row = deleted.get(id)
+                if row is None:
+                    results.fail("delete", index, 404, not_found(id), id=id)
+                    continue
+                if row.status != LoanStatus.RETURNED:
+                    stock_changes[row.book_id] += 1
+                books.add(row.book_id)
+                results.succeed("delete", index, 204, id)
+
+        current = {}
+        if updates:
+            rows = await self.session.execute(
+                select(Loan.id, Loan.book_id, Loan.status)
+                .where(Loan.id.in_([id for _, id, _ in updates]))
+                .with_for_update()
+            )
+            current = {row.id: row for row in rows}
+        book_ids = {row.book_id for row in current.values()} | {loan.book_id for _, loan in creates}
+        stock = dict((await self.session.execute(select(Book.id, Book.stock).where(Book.id.in_(book_ids)))).all())
+        user_ids = {loan.user_id for _, loan in creates}
+        users = set(await self.session.scalars(select(User.id).where(User.id.in_(user_ids)))) if user_ids else set()
+
+        def take_copy(book_id: int) -> bool:
+            if stock.get(book_id, 0) + stock_changes[book_id] <= 0:
+                return False
+            stock_changes[book_id] -= 1
+            return True
+
+        statuses: dict[int, tuple[LoanStatus, LoanStatus]] = {}
+        for index, id, status in updates:
+            row = current.get(id)
+            if row is None:
+                results.fail("update", index, 404, not_found(id), id=id)
+                continue
+            was_out, is_out = row.status != LoanStatus.RETURNED, status != LoanStatus.RETURNED
+            if is_out and not was_out and not take_copy(row.book_id):
+                results.fail("update", index, 409, "No hay ejemplares disponibles de este libro.", id=id)
+                continue
+            if was_out and not is_out:
+                stock_changes[row.book_id] += 1
+            if status != row.status:
+                statuses[id] = (row.status, status)
+                books.add(row.book_id)
+            results.succeed("update", index, 200, id)
+
+        new_loans = []
+        for index, loan in creates:
+            if loan.book_id not in stock or loan.user_id not in users:
+                missing = loan.book_id if loan.book_id not in stock else loan.user_id
+                results.fail("create", index, 404, not_found(missing))
+            elif not take_copy(loan.book_id):
+                results.fail("create", index, 409, "No hay ejemplares disponibles de este libro.")
+            else:
+                new_loans.append((index, loan))
+
+        if statuses:
+            old = case({id: literal(old, Loan.status.type) for id, (old, _) in statuses.items()}, value=Loan.id)
+            new = case({id: literal(new, Loan.status.type) for id, (_, new) in statuses.items()}, value=Loan.id)
+            result = await self.session.execute(
+                update(Loan)
+                .where(Loan.id.in_(statuses), Loan.status == old)
+                .values(status=new)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != len(statuses):
+                await self.session.rollback()
+                return None
+
+        stock_changes = Counter({book_id: change for book_id, change in stock_changes.items() if change})
+        if stock_changes:
+            change = case(stock_changes, value=Book.id)
+            result = await self.session.execute(
+                update(Book)
+                .where(Book.id.in_(stock_changes), Book.stock + change >= 0)
+                .values(stock=Book.stock + change)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != len(stock_changes):
+                await self.session.rollback()
+                return None
+
+        if new_loans:
+            table = Loan.__table__
+            ids = await self.session.scalars(
+                insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "user_id": loan.user_id,
+                        "book_id": loan.book_id,
+                        "loan_dt": loan.loan_dt,
+                        "return_dt": loan.return_dt,
+                        "due_date": loan.loan_dt + timedelta(days=LOAN_DAYS),
+                        "status": LoanStatus.ACTIVE,
+                        "fine_amount": None,
+                    }
+                    for _, loan in new_loans
+                ],
+            )
+            for (index, loan), id in zip(new_loans, ids):
+                books.add(loan.book_id)
+                results.succeed("create", index, 201, id)
+
+        await self.session.commit()
+        return books
+
+    def _days_overdue(self, today: date) -> ColumnElement[int]:
+        if self.session.get_bind().dialect.name == "postgresql":
+            # date - date devuelve días enteros en PostgreSQL.
+            return literal(today, Date) - Loan.due_date
+        return cast(func.julianday(literal(today, Date)) - func.julianday(Loan.due_date), Integer)
+
+    async def sweep_overdue(self, today: date, fine_per_day: Decimal, chunk_size: int) -> OverdueSweepReport:
+        """Mark loans past their due date as OVERDUE and recompute their fines.
+
+        Works in chunks of ``chunk_size`` loans walked by id, each one a single
+        UPDATE committed on its own so row locks are held only briefly. Loans
+        already up to date for ``today`` are not matched, which makes a sweep
+        idempotent: an interrupted sweep resumes by simply running again.
+        """
+        fine = cast(self._days_overdue(today) * fine_per_day, Numeric(10, 2))
+        pending = and_(
+            Loan.due_date < today,
+            or_(
+                Loan.status == LoanStatus.ACTIVE,
+                and_(
+                    Loan.status == LoanStatus.OVERDUE,
+                    or_(Loan.fine_amount.is_(None), Loan.fine_amount != fine),
+                ),
+            ),
+        )
+
+        report = OverdueSweepReport()
+        start = time.perf_counter()
+        last_id = 0
+        while True:
+            ids = list(
+                await self.session.scalars(
+                    select(Loan.id).where(pending, Loan.id > last_id).order_by(Loan.id).limit(chunk_size)
+                )
+            )
+            if not ids:
+                break
+
+            result = await self.session.execute(
+                update(Loan)
+                .where(Loan.id.in_(ids), pending)
+                .values(status=LoanStatus.OVERDUE, fine_amount=fine)
+                .execution_options(synchronize_session=False)
+            )
+            await self.session.commit()
+
+            report.processed += result.rowcount
+            report.chunks += 1
+            last_id = ids[-1]
+
+        report.elapsed = time.perf_counter() - start
+        report.rows_per_second = report.processed / report.elapsed if report.elapsed else 0.0
+        return report
 
 
-async def provide_loan_repo(db_session: Session) -> LoanRepository:
+async def provide_loan_repo(db_session: AsyncSession) -> LoanRepository:
     """Provide loan repository instance with auto-commit."""
     return LoanRepository(session=db_session, auto_commit=True)
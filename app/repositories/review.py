@@ -1,9 +1,299 @@
-from sqlalchemy.orm import Session
-from advanced_alchemy.repository import SQLAlchemySyncRepository
-from app.models import Review
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Any
+
+from advanced_alchemy.exceptions import NotFoundError
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from app.batch import BatchResults, NewReview, not_found
+from app.models import RATING_VALUES, Book, Review, User, book_ratings, review_counts
+from app.repositories import AsyncRepository
+
+
+def _counted(rating: int) -> bool:
+    # Las reseñas antiguas con rating fuera de 1..5 (anteriores a la restricción
+    # CHECK, que en PostgreSQL se agrega NOT VALID) no entran en book_ratings.
+    return rating in RATING_VALUES
+
+
+class ReviewRepository(AsyncRepository[Review]):
+    """Repository for review operations that keeps the review aggregates in sync.
+
+    ``book_ratings`` (count, sum and histogram per book) and ``review_counts``
+    (reviews per user and book) are adjusted with single-row upserts in the
+    same transaction as the review write, so they never need a scan.
+    """
 
-class ReviewRepository(SQLAlchemySyncRepository[Review]):
     model_type = Review
+    read_options = [joinedload(Review.user), joinedload(Review.book)]
+
+    async def _claim_review_slot(self, user_id: int, book_id: int, limit: int) -> bool:
+        # El WHERE del upsert hace atómico el "contar y luego insertar".
+        statement = self._insert(review_counts).values(user_id=user_id, book_id=book_id, review_count=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id", "book_id"],
+            set_={"review_count": review_counts.c.review_count + 1},
+            where=review_counts.c.review_count < limit,
+        )
+        return (await self.session.execute(statement)).rowcount == 1
+
+    async def _release_review_slot(self, user_id: int, book_id: int) -> None:
+        await self.session.execute(
+            update(review_counts)
+            .where(review_counts.c.user_id == user_id, review_counts.c.book_id == book_id)
+            .values(review_count=review_counts.c.review_count - 1)
+        )
+
+    async def _add_rating(self, book_id: int, rating: int) -> None:
+        if not _counted(rating):
+            return
+        bucket = f"rating_{rating}"
+        statement = self._insert(book_ratings).values(book_id=book_id, review_count=1, rating_sum=rating, **{bucket: 1})
+        await self.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["book_id"],
+                set_={
+                    "review_count": book_ratings.c.review_count + 1,
+                    "rating_sum": book_ratings.c.rating_sum + rating,
+                    bucket: book_ratings.c[bucket] + 1,
+                },
+            )
+        )
+
+    async def _remove_rating(self, book_id: int, rating: int) -> None:
+        if not _counted(rating):
+            return
+        bucket = f"rating_{rating}"
+        await self.session.execute(
+            update(book_ratings)
+            .where(book_ratings.c.book_id == book_id)
+            .values(
+                review_count=book_ratings.c.review_count - 1,
+                rating_sum=book_ratings.c.rating_sum - rating,
+                **{bucket: book_ratings.c[bucket] - 1},
+            )
+        )
+
+    async def add_counted(self, review: Review, max_per_user: int) -> Review | None:
+        """Insert ``review`` and update the aggregates.
+
+        Returns ``None`` if the user already has ``max_per_user`` reviews of the book.
+        """
+        if not await self._claim_review_slot(review.user_id, review.book_id, max_per_user):
+            await self.session.rollback()
+            return None
+        await self._add_rating(review.book_id, review.rating)
+        return await self.add(review)
+
+    async def update_counted(self, id: int, values: dict[str, Any], max_per_user: int) -> Review | None:
+        """Update a review and move its contribution to the aggregates.
+
+        Returns ``None`` if the review would move to a user and book that
+        already have ``max_per_user`` reviews.
+        """
+        old = (
+            await self.session.execute(
+                select(Review.user_id, Review.book_id, Review.rating).where(Review.id == id).with_for_update()
+            )
+        ).one_or_none()
+        if old is None:
+            raise NotFoundError(f"No item found when filtering by id={id}")
+
+        user_id = values.get("user_id", old.user_id)
+        book_id = values.get("book_id", old.book_id)
+        rating = values.get("rating", old.rating)
+
+        if (user_id, book_id) != (old.user_id, old.book_id):
+            if not await self._claim_review_slot(user_id, book_id, max_per_user):
+                await self.session.rollback()
+                return None
+            await self._release_review_slot(old.user_id, old.book_id)
+        if (book_id, rating) != (old.book_id, old.rating):
+            await self._remove_rating(old.book_id, old.rating)
+            await self._add_rating(book_id, rating)
+
+        if values:
+            await self.session.execute(
+                update(Review).where(Review.id == id).values(**values).execution_options(synchronize_session=False)
+            )
+        await self.session.commit()
+        return await self.get(id, load=self.read_options)
+
+    async def delete_counted(self, id: int) -> int:
+        """Delete a review and remove it from the aggregates; returns the review's book id."""
+        row = (
+            await self.session.execute(
+                delete(Review).where(Review.id == id).returning(Review.user_id, Review.book_id, Review.rating)
+            )
+        ).one_or_none()
+        if row is None:
+            raise NotFoundError(f"No item found when filtering by id={id}")
+        await self._release_review_slot(row.user_id, row.book_id)
+        await self._remove_rating(row.book_id, row.rating)
+        await self.session.commit()
+        return row.book_id
+
+    async def write_batch(
+        self,
+        creates: list[tuple[int, NewReview]],
+        updates: list[tuple[int, int, dict[str, Any]]],
+        deletes: list[tuple[int, int]],
+        results: BatchResults,
+        max_per_user: int,
+    ) -> set[int] | None:
+        """Apply review creates, updates and deletes in one transaction, keeping the aggregates in sync.
+
+        Deletes go first and updates before creates, so the slots they free
+        can be used by later items. The changes to ``review_counts`` and
+        ``book_ratings`` are added up per row in Python and written with one
+        multi-row upsert each instead of one per review. The counts upsert
+        only applies while the limit holds; if another request used the slots
+        meanwhile the whole batch is rolled back and ``None`` is returned.
+        Otherwise returns the ids of the books whose reviews changed.
+        """
+        books: set[int] = set()
+        # Cambios netos del lote en review_counts y en book_ratings.
+        slots: Counter[tuple[int, int]] = Counter()
+        ratings: dict[int, Counter[str]] = defaultdict(Counter)
+
+        def count(user_id: int, book_id: int, rating: int, sign: int) -> None:
+            slots[user_id, book_id] += sign
+            if _counted(rating):
+                ratings[book_id].update({"review_count": sign, "rating_sum": sign * rating, f"rating_{rating}": sign})
+            books.add(book_id)
+
+        if deletes:
+            rows = await self.session.execute(
+                delete(Review)
+                .where(Review.id.in_([id for _, id in deletes]))
+                .returning(Review.id, Review.user_id, Review.book_id, Review.rating)
+            )
+            deleted = {row.id: row for row in rows}
+            for index, id in deletes:
+                row = deleted.get(id)
+                if row is None:
+                    results.fail("delete", index, 404, not_found(id), id=id)
+                    continue
+                count(row.user_id, row.book_id, row.rating, -1)
+                results.succeed("delete", index, 204, id)
+
+        current = {}
+        if updates:
+            rows = await self.session.execute(
+                select(Review.id, Review.user_id, Review.book_id, Review.rating)
+                .where(Review.id.in_([id for _, id, _ in updates]))
+                .with_for_update()
+            )
+            current = {row.id: row for row in rows}
+        # Pares (usuario, libro) que reciben una reseña: se validan y consumen cupo.
+        pairs = {(review.user_id, review.book_id) for _, review in creates}
+        for _, id, values in updates:
+            row = current.get(id)
+            if row is not None:
+                pairs.add((values.get("user_id", row.user_id), values.get("book_id", row.book_id)))
+        users: set[int] = set()
+        known_books: set[int] = set()
+        used: dict[tuple[int, int], int] = {}
+        if pairs:
+            users = set(await self.session.scalars(select(User.id).where(User.id.in_({u for u, _ in pairs}))))
+            known_books = set(await self.session.scalars(select(Book.id).where(Book.id.in_({b for _, b in pairs}))))
+            rows = await self.session.execute(
+                select(review_counts).where(tuple_(review_counts.c.user_id, review_counts.c.book_id).in_(pairs))
+            )
+            used = {(row.user_id, row.book_id): row.review_count for row in rows}
+
+        def check(user_id: int, book_id: int) -> tuple[int, str] | None:
+            if user_id not in users or book_id not in known_books:
+                return 404, not_found(user_id if user_id not in users else book_id)
+            if used.get((user_id, book_id), 0) + slots[user_id, book_id] >= max_per_user:
+                return 400, f"El usuario ya tiene {max_per_user} reseñas para este libro."
+            return None
+
+        changed = []
+        for index, id, values in updates:
+            row = current.get(id)
+            if row is None:
+                results.fail("update", index, 404, not_found(id), id=id)
+                continue
+            user_id = values.get("user_id", row.user_id)
+            book_id = values.get("book_id", row.book_id)
+            if (user_id, book_id) != (row.user_id, row.book_id):
+                error = check(user_id, book_id)
+                if error:
+                    results.fail("update", index, *error, id=id)
+                    continue
+            count(row.user_id, row.book_id, row.rating, -1)
+            count(user_id, book_id, values.get("rating", row.rating), 1)
+            changed.append({"id": id, **values})
+            results.succeed("update", index, 200, id)
+
+        new_reviews = []
+        for index, review in creates:
+            error = check(review.user_id, review.book_id)
+            if error:
+                results.fail("create", index, *error)
+                continue
+            count(review.user_id, review.book_id, review.rating, 1)
+            new_reviews.append((index, review))
+
+        slots = Counter({pair: change for pair, change in slots.items() if change})
+        if slots:
+            statement = self._insert(review_counts).values(
+                [
+                    {"user_id": user_id, "book_id": book_id, "review_count": change}
+                    for (user_id, book_id), change in slots.items()
+                ]
+            )
+            total = review_counts.c.review_count + statement.excluded.review_count
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "book_id"],
+                set_={"review_count": total},
+                where=total <= max_per_user,
+            )
+            applied = (await self.session.execute(statement.returning(review_counts.c.user_id))).all()
+            if len(applied) != len(slots):
+                await self.session.rollback()
+                return None
+
+        ratings = {book_id: changes for book_id, changes in ratings.items() if any(changes.values())}
+        if ratings:
+            columns = ["review_count", "rating_sum", *(f"rating_{value}" for value in RATING_VALUES)]
+            statement = self._insert(book_ratings).values(
+                [
+                    {"book_id": book_id, **{name: changes[name] for name in columns}}
+                    for book_id, changes in ratings.items()
+                ]
+            )
+            await self.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["book_id"],
+                    set_={name: book_ratings.c[name] + statement.excluded[name] for name in columns},
+                )
+            )
+
+        if changed:
+            await self.session.execute(update(Review), changed)
+        if new_reviews:
+            table = Review.__table__
+            ids = await self.session.scalars(
+                insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "user_id": review.user_id,
+                        "book_id": review.book_id,
+                        "rating": review.rating,
+                        "comment": review.comment,
+                        "review_date": date.today(),
+                    }
+                    for _, review in new_reviews
+                ],
+            )
+            for (index, _), id in zip(new_reviews, ids):
+                results.succeed("create", index, 201, id)
+
+        await self.session.commit()
+        return books
 
-async def provide_review_repo(db_session: Session) -> ReviewRepository:
+async def provide_review_repo(db_session: AsyncSession) -> ReviewRepository:
     return ReviewRepository(session=db_session, auto_commit=True)
@@ -1,28 +1,54 @@
 """Repository for User database operations."""
 
-from advanced_alchemy.repository import SQLAlchemySyncRepository
-from litestar.dto import DTOData
-from pwdlib import PasswordHash
-from sqlalchemy.orm import Session
+from datetime import UTC, datetime
 
-from app.models import User
+from litestar.dto import DTOData
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-password_hasher = PasswordHash.recommended()
+from app.models import User, token_revocations
+from app.passwords import password_pool
+from app.repositories import AsyncRepository
 
 
-class UserRepository(SQLAlchemySyncRepository[User]):
+class UserRepository(AsyncRepository[User]):
     """Repository for user database operations."""
 
     model_type = User
+    read_options = [selectinload(User.reviews)]
 
-    def add_with_hashed_password(self, data: DTOData[User]):
+    async def add_with_hashed_password(self, data: DTOData[User]) -> User:
         """Add user with hashed password."""
         data_dict = data.as_builtins()
-        data_dict["password"] = password_hasher.hash(data_dict["password"])
-
-        return self.add(User(**data_dict))
-
-
-async def provide_user_repo(db_session: Session) -> UserRepository:
+        data_dict["password"] = await password_pool.hash(data_dict["password"])
+
+        return await self.add(User(**data_dict))
+
+    async def revoke_tokens(self, user_id: int) -> None:
+        """Record that the user's tokens stop being valid, committed with the caller's change."""
+        await self.session.execute(
+            insert(token_revocations).values(user_id=user_id, revoked_at=datetime.now(UTC))
+        )
+
+    async def get_token_revocations(self, since: datetime) -> tuple[dict[int, str | None], set[int]]:
+        """Users revoked since ``since`` with their current password hash (``None`` if deleted), and inactive users.
+
+        Rows older than ``since`` can no longer match an unexpired token and
+        are deleted.
+        """
+        await self.session.execute(delete(token_revocations).where(token_revocations.c.revoked_at < since))
+        rows = await self.session.execute(
+            select(token_revocations.c.user_id, User.password)
+            .distinct()
+            .outerjoin(User, User.id == token_revocations.c.user_id)
+        )
+        revoked = {user_id: password for user_id, password in rows}
+        inactive = set(await self.session.scalars(select(User.id).where(User.is_active.is_(False))))
+        await self.session.commit()
+        return revoked, inactive
+
+
+async def provide_user_repo(db_session: AsyncSession) -> UserRepository:
     """Provide user repository instance with auto-commit."""
     return UserRepository(session=db_session, auto_commit=True)
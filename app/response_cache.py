@@ -0,0 +1,338 @@
+"""Response cache for read-heavy endpoints, invalidated by tags from the writes.
+
+Handlers opt in with a route middleware that stores the encoded response
+(status, headers and body bytes) of a ``200``, so a hit skips the database and
+DTO encoding altogether::
+
+    @get("/recent", middleware=[cached_response(lambda request: (BOOKS_TAG,))])
+
+Every entry carries tags; write handlers call
+``await response_cache.invalidate(tag, ...)`` and any entry with one of those
+tags is dropped. Two backends implement the same interface:
+
+* :class:`MemoryBackend`, an in-process LRU bounded by the total size of the
+  stored bodies (the default);
+* :class:`StoreBackend`, shared between workers through a Litestar
+  :class:`~litestar.stores.base.Store` (Redis in production, a ``FileStore``
+  as a local stand-in). Tags are generation counters kept in the store, so an
+  invalidation from any worker makes the old entries unreachable.
+
+Entries also expire after a TTL, which bounds how stale the in-process
+backend can get for writes made by other workers.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+import msgspec
+from litestar import Request
+from litestar.stores.base import Store
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.conditional import Version, is_conditional
+from app.config import settings
+from app.replicas import primary_reads, read_your_writes
+
+
+@dataclass
+class CachedResponse:
+    """Encoded response replayed on a hit."""
+
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers)
+
+
+@dataclass
+class ResponseCacheStats:
+    """Counters of the response cache, used to size it."""
+
+    backend: str
+    entries: int | None
+    size_bytes: int | None
+    max_bytes: int | None
+    hits: int
+    misses: int
+    hit_ratio: float
+    stores: int
+    evictions: int
+    invalidations: int
+
+
+class ResponseCacheBackend(Protocol):
+    """Storage of :class:`CachedResponse` entries with tag invalidation.
+
+    ``lookup`` also returns an opaque generation of the tags; ``store`` is
+    given it back and must not keep a response computed before an
+    invalidation of one of its tags.
+    """
+
+    name: str
+
+    async def lookup(self, key: str, tags: tuple[str, ...]) -> tuple[CachedResponse | None, Any]: ...
+
+    async def generation(self, tags: tuple[str, ...]) -> Any: ...
+
+    async def store(self, key: str, tags: tuple[str, ...], generation: Any, response: CachedResponse) -> bool: ...
+
+    async def invalidate(self, tags: tuple[str, ...]) -> None: ...
+
+    def usage(self) -> tuple[int | None, int | None, int | None, int]:
+        """``(entries, size_bytes, max_bytes, evictions)``; ``None`` when the backend cannot tell."""
+        ...
+
+
+@dataclass
+class _Entry:
+    response: CachedResponse
+    tags: tuple[str, ...]
+    expires_at: float
+
+
+class MemoryBackend:
+    """In-process LRU bounded by ``max_bytes`` of stored responses."""
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._by_tag: dict[str, set[str]] = {}
+        self._generations: dict[str, int] = {}
+
+    def _generation(self, tags: tuple[str, ...]) -> tuple[int, ...]:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.size -= entry.response.size
+        for tag in entry.tags:
+            keys = self._by_tag[tag]
+            keys.discard(key)
+            if not keys:
+                del self._by_tag[tag]
+
+    async def lookup(self, key: str, tags: tuple[str, ...]) -> tuple[CachedResponse | None, Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return (entry.response if entry else None), self._generation(tags)
+
+    async def generation(self, tags: tuple[str, ...]) -> Any:
+        return self._generation(tags)
+
+    async def store(self, key: str, tags: tuple[str, ...], generation: Any, response: CachedResponse) -> bool:
+        # Una invalidación durante el handler deja la respuesta obsoleta: no se guarda.
+        if generation != self._generation(tags) or response.size > self.max_bytes:
+            return False
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(response, tags, time.monotonic() + self.ttl)
+        self.size += response.size
+        for tag in tags:
+            self._by_tag.setdefault(tag, set()).add(key)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return True
+
+    async def invalidate(self, tags: tuple[str, ...]) -> None:
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in list(self._by_tag.get(tag, ())):
+                self._remove(key)
+
+    def usage(self) -> tuple[int | None, int | None, int | None, int]:
+        return len(self._entries), self.size, self.max_bytes, self.evictions
+
+
+class StoreBackend:
+    """Backend shared between workers through a Litestar ``Store``.
+
+    Each tag has a generation value in the store and the entry key includes
+    the generations of its tags, so invalidating is a single write per tag;
+    superseded entries are left to expire (or to the store's own eviction).
+    """
+
+    name = "store"
+
+    def __init__(self, store: Store, ttl: float, prefix: str = "response-cache") -> None:
+        self._store = store
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def _generation(self, tags: tuple[str, ...]) -> tuple[bytes, ...]:
+        return tuple([await self._store.get(f"{self.prefix}:tag:{tag}") or b"0" for tag in tags])
+
+    def _key(self, key: str, generation: tuple[bytes, ...]) -> str:
+        digest = hashlib.blake2b(repr((key, generation)).encode(), digest_size=16).hexdigest()
+        return f"{self.prefix}:entry:{digest}"
+
+    async def lookup(self, key: str, tags: tuple[str, ...]) -> tuple[CachedResponse | None, Any]:
+        generation = await self._generation(tags)
+        raw = await self._store.get(self._key(key, generation))
+        if raw is None:
+            return None, generation
+        status, headers, body = msgspec.msgpack.decode(raw)
+        return CachedResponse(status, [(bytes(name), bytes(value)) for name, value in headers], body), generation
+
+    async def generation(self, tags: tuple[str, ...]) -> Any:
+        return await self._generation(tags)
+
+    async def store(self, key: str, tags: tuple[str, ...], generation: Any, response: CachedResponse) -> bool:
+        # Con generaciones viejas la clave ya no es alcanzable: guardar es inofensivo.
+        raw = msgspec.msgpack.encode((response.status, response.headers, response.body))
+        await self._store.set(self._key(key, generation), raw, expires_in=int(self.ttl))
+        return True
+
+    async def invalidate(self, tags: tuple[str, ...]) -> None:
+        for tag in tags:
+            await self._store.set(f"{self.prefix}:tag:{tag}", str(time.time_ns()))
+
+    def usage(self) -> tuple[int | None, int | None, int | None, int]:
+        return None, None, None, 0
+
+
+@dataclass
+class ResponseCache:
+    """Front of a :class:`ResponseCacheBackend` that keeps the hit/miss counters."""
+
+    backend: ResponseCacheBackend
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    invalidations: int = 0
+
+    async def lookup(self, key: str, tags: tuple[str, ...]) -> tuple[CachedResponse | None, Any]:
+        """Return the cached response for ``key`` (or ``None``) and the current generation of ``tags``."""
+        response, generation = await self.backend.lookup(key, tags)
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response, generation
+
+    async def generation(self, tags: tuple[str, ...]) -> Any:
+        """Current generation of ``tags``, for a :meth:`store` without a lookup."""
+        return await self.backend.generation(tags)
+
+    async def store(self, key: str, tags: tuple[str, ...], generation: Any, response: CachedResponse) -> None:
+        """Store ``response`` unless one of ``tags`` was invalidated since ``generation``."""
+        if await self.backend.store(key, tags, generation, response):
+            self.stores += 1
+
+    async def invalidate(self, *tags: str) -> None:
+        """Drop every entry carrying one of ``tags``."""
+        self.invalidations += 1
+        await self.backend.invalidate(tags)
+
+    def stats(self) -> ResponseCacheStats:
+        """Return the current counters."""
+        entries, size, max_bytes, evictions = self.backend.usage()
+        lookups = self.hits + self.misses
+        return ResponseCacheStats(
+            backend=self.backend.name,
+            entries=entries,
+            size_bytes=size,
+            max_bytes=max_bytes,
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / lookups if lookups else 0.0,
+            stores=self.stores,
+            evictions=evictions,
+            invalidations=self.invalidations,
+        )
+
+
+def _create_backend() -> ResponseCacheBackend:
+    url = settings.response_cache_url
+    if not url:
+        return MemoryBackend(max_bytes=settings.response_cache_max_bytes, ttl=settings.response_cache_ttl)
+    if url.startswith("file://"):
+        from litestar.stores.file import FileStore
+
+        store: Store = FileStore(url.removeprefix("file://"))
+    else:
+        # Dependencia opcional: sólo se necesita con un Redis compartido.
+        from litestar.stores.redis import RedisStore
+
+        store = RedisStore.with_client(url=url)
+    return StoreBackend(store, ttl=settings.response_cache_ttl)
+
+
+response_cache = ResponseCache(_create_backend())
+
+
+def cached_response(tags: Callable[[Request], Iterable[str]]) -> Callable[[ASGIApp], ASGIApp]:
+    """Route middleware serving ``200`` responses from :data:`response_cache`.
+
+    The key is the path and query string; ``tags`` gives the tags of the
+    entry from the request (e.g. ``book:{id}``). With read replicas, a miss
+    is read from the primary, so a lagging replica never ends up cached, and
+    a request with ``X-Read-Your-Writes`` skips the lookup (its fresh
+    response replaces the entry). Put it before ``conditional_get`` in the
+    route's middleware so entries keep their ``ETag`` / ``Last-Modified``
+    and a hit answers conditional requests itself.
+    """
+
+    def middleware(app: ASGIApp) -> ASGIApp:
+        async def handle(scope: Scope, receive: Receive, send: Send) -> None:
+            request: Request = Request(scope, receive)
+            key = f"{request.url.path}?{request.url.query}"
+            entry_tags = tuple(tags(request))
+            if read_your_writes():
+                cached, generation = None, await response_cache.generation(entry_tags)
+            else:
+                cached, generation = await response_cache.lookup(key, entry_tags)
+            if cached is not None:
+                # Con conditional_get por dentro la entrada guarda sus validadores: un acierto responde el 304.
+                version = Version.from_headers(cached.headers) if is_conditional(request) else None
+                if version is not None and version.matches(request):
+                    await send({"type": "http.response.start", "status": 304, "headers": version.headers()})
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                    return
+                await send({"type": "http.response.start", "status": cached.status, "headers": cached.headers})
+                await send({"type": "http.response.body", "body": cached.body, "more_body": False})
+                return
+
+            status: int | None = None
+            headers: list[tuple[bytes, bytes]] = []
+            body: list[bytes] = []
+
+            async def capture(message: Message) -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    # Se copian antes de enviar: otros middlewares pueden agregar cabeceras al mensaje.
+                    status = message["status"]
+                    # Las cookies son de cada cliente: no se guardan.
+                    headers.extend(
+                        (bytes(name), bytes(value))
+                        for name, value in message.get("headers", [])
+                        if bytes(name).lower() != b"set-cookie"
+                    )
+                elif message["type"] == "http.response.body":
+                    body.append(message.get("body", b""))
+                await send(message)
+
+            with primary_reads():
+                await app(scope, receive, capture)
+            if status == 200:
+                await response_cache.store(key, entry_tags, generation, CachedResponse(200, headers, b"".join(body)))
+
+        return handle
+
+    return middleware
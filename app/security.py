@@ -1,29 +1,238 @@
-"""OAuth2 authentication and security configuration."""
+"""OAuth2 authentication and security configuration.
+
+By default every request loads its user by username (through
+``user_cache``, which keeps an immutable :class:`CachedUser` per username
+for ``user_cache_ttl`` seconds; other workers only notice a change to the
+user when their entry expires). With ``settings.jwt_stateless`` the login also embeds the
+user id, ``is_active`` and a credential version (an HMAC of the password
+hash) in the token. Requests carrying those claims are then authorized from
+the token alone, checked against :data:`token_revocations`: an in-memory
+list of the users deleted, deactivated or with a new password, refreshed
+from the database every ``jwt_revocation_refresh_interval`` seconds. While
+that list is stale, or for tokens issued without the claims, the database
+lookup is used.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import logging
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
 
 from litestar.connection import ASGIConnection
 from litestar.security.jwt import OAuth2PasswordBearerAuth, Token
 
+from app.cache import TTLCache
 from app.config import settings
 from app.models import User
 from app.repositories.user import UserRepository
 
+logger = logging.getLogger(__name__)
 
-async def retrieve_user_handler(token: Token, _: ASGIConnection) -> User | None:
-    """Retrieve user based on JWT token."""
-    from app.db import sqlalchemy_config
+@dataclass(frozen=True)
+class CachedUser:
+    """Immutable snapshot of an authenticated user, shared between requests.
 
-    with sqlalchemy_config.get_session() as session:
-        users_repo = UserRepository(session=session)
+    Each request gets its own transient :class:`User` built from it (see
+    :meth:`to_user`), so no request can change what the others see.
+    """
+
+    id: int
+    username: str
+    is_active: bool
+    # Versión de la credencial (no el hash): basta para validar los tokens.
+    version: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        return cls(
+            id=user.id, username=user.username, is_active=user.is_active, version=credential_version(user.password)
+        )
+
+    def to_user(self) -> User:
+        """A transient ``User`` with the snapshot's fields, not attached to any session."""
+        return User(id=self.id, username=self.username, is_active=self.is_active)
+
+
+# Usuarios autenticados por subject (username) para evitar una consulta por request.
+# La invalidación es local al worker: en los demás un usuario borrado,
+# desactivado o con nueva contraseña puede seguir en caché hasta user_cache_ttl.
+user_cache: TTLCache[str, CachedUser] = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Drop a user from the authentication cache after it changes."""
+    user_cache.discard_where(lambda user: user.id == user_id)
+
+
+def credential_version(password_hash: str) -> str:
+    """Short fingerprint of a password hash; it changes with every new password."""
+    return hmac.new(settings.jwt_secret.encode(), password_hash.encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def token_claims(user: User) -> dict[str, Any]:
+    """Extra claims of a login token: enough to authorize it without the database (stateless mode only)."""
+    if not settings.jwt_stateless:
+        return {}
+    return {"uid": user.id, "active": user.is_active, "ver": credential_version(user.password)}
+
+
+@dataclass
+class RevocationStats:
+    """State of the revocation list and how requests were authenticated."""
+
+    revoked: int
+    inactive: int
+    fresh: bool
+    refreshed_at: float | None
+    stateless_hits: int
+    database_lookups: int
+
+
+class TokenRevocations:
+    """Users whose stateless tokens must be rejected, refreshed periodically.
+
+    ``revoked`` maps a user to the credential version of its current password
+    (``None`` once deleted): a token passes only if it carries that version.
+    Each worker keeps its own copy; the changes made by this worker are
+    applied at once, the ones of other workers on the next refresh. After
+    three missed refreshes the list is considered stale and authentication
+    falls back to the database.
+    """
 
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.revoked: dict[int, str | None] = {}
+        self.inactive: set[int] = set()
+        self.refreshed_at: float | None = None
+        self.stateless_hits = 0
+        self.database_lookups = 0
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def fresh(self) -> bool:
+        """Whether the list was refreshed recently enough to trust it."""
+        return self.refreshed_at is not None and time.monotonic() - self.refreshed_at <= 3 * self.interval
+
+    def is_revoked(self, user_id: int, version: str) -> bool:
+        """Whether a token of ``user_id`` with credential ``version`` is no longer valid."""
+        if user_id in self.inactive:
+            return True
+        return user_id in self.revoked and self.revoked[user_id] != version
+
+    def revoke(self, user_id: int, password_hash: str | None) -> None:
+        """Apply a password change (or a deletion, with ``None``) made by this worker."""
+        self.revoked[user_id] = credential_version(password_hash) if password_hash is not None else None
+
+    async def refresh(self) -> None:
+        """Reload the list from the database in a session of its own."""
+        from app.db import sqlalchemy_config
+
+        since = datetime.now(UTC) - oauth2_auth.default_token_expiration
+        async with sqlalchemy_config.get_session() as session:
+            revoked, inactive = await UserRepository(session=session).get_token_revocations(since)
+        self.revoked = {
+            user_id: credential_version(password) if password is not None else None
+            for user_id, password in revoked.items()
+        }
+        self.inactive = inactive
+        self.refreshed_at = time.monotonic()
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("token revocation refresh failed")
+
+    async def start(self) -> None:
+        """Load the list and start refreshing it (stateless mode only)."""
+        if not settings.jwt_stateless or self.interval <= 0 or self._task is not None:
+            return
         try:
-            return users_repo.get_one(username=token.sub)
+            await self.refresh()
         except Exception:
+            # Sin lista se autentica contra la base hasta el próximo refresco.
+            logger.exception("token revocation refresh failed")
+        self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Cancel the periodic refresh and wait for it to finish."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    def stats(self) -> RevocationStats:
+        return RevocationStats(
+            revoked=len(self.revoked),
+            inactive=len(self.inactive),
+            fresh=self.fresh,
+            refreshed_at=self.refreshed_at,
+            stateless_hits=self.stateless_hits,
+            database_lookups=self.database_lookups,
+        )
+
+
+token_revocations = TokenRevocations(interval=settings.jwt_revocation_refresh_interval)
+
+
+def _user_from_claims(token: Token) -> User | None:
+    user_id, active, version = (token.extras.get(claim) for claim in ("uid", "active", "ver"))
+    if not isinstance(user_id, int) or not isinstance(version, str):
+        return None
+    if not active or token_revocations.is_revoked(user_id, version):
+        return None
+    # Usuario transitorio: sólo los campos del token, sin tocar la base.
+    return User(id=user_id, username=token.sub, is_active=True)
+
+
+async def retrieve_user_handler(token: Token, connection: ASGIConnection) -> User | None:
+    """Retrieve user based on JWT token.
+
+    A token with stateless claims is resolved from the token and the
+    revocation list while the list is fresh. Otherwise the user is loaded
+    with the request's own session (the one later injected into the handler
+    as ``db_session``), so an authenticated request checks out one pooled
+    connection instead of two.
+    """
+    from app.db import sqlalchemy_config
+
+    if settings.jwt_stateless and "uid" in token.extras and token_revocations.fresh:
+        token_revocations.stateless_hits += 1
+        return _user_from_claims(token)
+
+    cached = user_cache.get(token.sub)
+    if cached is None:
+        token_revocations.database_lookups += 1
+        session = sqlalchemy_config.provide_session(connection.app.state, connection.scope)
+        users_repo = UserRepository(session=session)
+        try:
+            user = await users_repo.get_one_or_none(username=token.sub)
+        finally:
+            # Devuelve la conexión al pool mientras corre el resto del request.
+            await session.commit()
+        if user is None:
             return None
+        cached = CachedUser.from_user(user)
+        user_cache.set(token.sub, cached)
 
+    # Un token con claims revocado sigue rechazado aunque la lista no esté al día.
+    version = token.extras.get("ver")
+    if version is not None and (not cached.is_active or cached.version != version):
+        return None
+    return cached.to_user()
 
 oauth2_auth = OAuth2PasswordBearerAuth[User](
     retrieve_user_handler=retrieve_user_handler,
     token_secret=settings.jwt_secret,
     token_url="/auth/login",
-    exclude=["/auth/login", "/schema"],
+    exclude=["/auth/login", "/schema", "^/metrics"],
 )
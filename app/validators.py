@@ -0,0 +1,33 @@
+"""Business validation rules shared by single-item, batch and import endpoints."""
+
+from typing import Any
+
+VALID_LANGUAGES = {"es", "en", "fr", "de", "it", "pt"}
+
+
+def validate_new_book(payload: dict[str, Any]) -> str | None:
+    """Return the error message for a book about to be created, or ``None`` if valid."""
+    if payload.get("language") not in VALID_LANGUAGES:
+        return "El idioma debe ser uno de: es, en, fr, de, it, pt."
+
+    # Validar stock > 0
+    if payload.get("stock", 1) <= 0:
+        return "El stock debe ser mayor a 0."
+
+    # Validar que el año esté entre 1000 y el año actual
+    if not (1000 <= payload["published_year"] <= 2024):
+        return "El año de publicación debe estar entre 1000 y 2024"
+
+    return None
+
+
+def validate_book_update(payload: dict[str, Any]) -> str | None:
+    """Return the error message for a partial book update, or ``None`` if valid."""
+    # Validar stock >= 0 si viene en el body
+    if "stock" in payload and payload["stock"] < 0:
+        return "El stock no puede ser negativo."
+
+    if "language" in payload and payload["language"] not in VALID_LANGUAGES:
+        return "El idioma debe ser uno de: es, en, fr, de, it, pt."
+
+    return None
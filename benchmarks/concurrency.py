@@ -0,0 +1,85 @@
+"""Concurrency benchmark comparing the sync and async data paths.
+
+Runs the same query from many concurrent coroutines, once through a sync
+``Session`` called directly from ``async def`` code (how handlers worked
+before) and once through the ``AsyncSession`` used by the API. Besides total
+throughput it measures event loop lag, which is what other requests on the
+same worker experience while the queries run.
+
+Usage::
+
+    uv run python -m benchmarks.concurrency --concurrency 50 --requests 1000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Book
+
+
+async def _measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Return the worst delay observed between scheduled ticks of the loop."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def _run(worker, concurrency: int, requests: int) -> tuple[float, float]:
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_measure_loop_lag(stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            await worker()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, await lag_task
+
+
+async def main(concurrency: int, requests: int, limit: int) -> None:
+    statement = select(Book).limit(limit)
+
+    sync_engine = create_engine(settings.database_url, pool_size=concurrency, max_overflow=0)
+
+    async def sync_worker() -> None:
+        # Bloquea el event loop mientras dura la consulta.
+        with Session(sync_engine) as session:
+            session.scalars(statement).all()
+
+    async_engine = create_async_engine(settings.async_url, pool_size=concurrency, max_overflow=0)
+
+    async def async_worker() -> None:
+        async with AsyncSession(async_engine) as session:
+            (await session.scalars(statement)).all()
+
+    for name, worker in (("sync", sync_worker), ("async", async_worker)):
+        elapsed, lag = await _run(worker, concurrency, requests)
+        print(
+            f"{name:>5}: {requests / elapsed:8.1f} req/s  "
+            f"total {elapsed:6.2f}s  max loop lag {lag * 1000:7.1f} ms"
+        )
+
+    sync_engine.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100, help="rows fetched per query")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.requests, args.limit))
@@ -0,0 +1,94 @@
+"""Contention benchmark for loan creation on a single popular book.
+
+Creates a book with ``--stock`` copies and has ``--clients`` concurrent
+clients borrow it at once through the ASGI app. Reports throughput and
+latency, and checks that exactly ``--stock`` loans succeeded and the stock
+ended at zero, i.e. that concurrent checkouts never oversell the book.
+
+Needs users in the database (see ``benchmarks.load --seed``).
+
+Usage::
+
+    uv run python -m benchmarks.contention --clients 500 --stock 100
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from collections import Counter
+from datetime import date
+
+from litestar.testing import AsyncTestClient
+from sqlalchemy import delete, func, select
+
+from app import app
+from app.db import sqlalchemy_config
+from app.models import Book, Loan, User
+from app.security import oauth2_auth
+
+
+async def main(clients: int, stock: int) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async with sqlalchemy_config.get_session() as session:
+        users = (await session.execute(select(User.id, User.username).limit(clients))).all()
+        if not users:
+            raise SystemExit("No hay usuarios: ejecuta `benchmarks.load --seed` primero.")
+        suffix = time.time_ns()
+        book = Book(
+            title=f"Contention {suffix}",
+            author="Benchmark",
+            isbn=f"contention-{suffix}",
+            pages=100,
+            published_year=2020,
+            stock=stock,
+            language="es",
+        )
+        session.add(book)
+        await session.commit()
+        book_id = book.id
+
+    async with AsyncTestClient(app=app) as client:
+
+        async def borrow(index: int) -> tuple[int, float]:
+            user_id, username = users[index % len(users)]
+            token = oauth2_auth.create_token(identifier=username)
+            start = time.perf_counter()
+            response = await client.post(
+                "/loans/",
+                json={"user_id": user_id, "book_id": book_id, "loan_dt": date.today().isoformat()},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            return response.status_code, time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(borrow(i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for status, _ in results)
+    latencies = [latency for _, latency in results]
+    p50, p95, p99 = (statistics.quantiles(latencies, n=100)[p - 1] * 1000 for p in (50, 95, 99))
+
+    async with sqlalchemy_config.get_session() as session:
+        final_stock = await session.scalar(select(Book.stock).where(Book.id == book_id))
+        loans = await session.scalar(select(func.count()).select_from(Loan).where(Loan.book_id == book_id))
+        await session.execute(delete(Loan).where(Loan.book_id == book_id))
+        await session.execute(delete(Book).where(Book.id == book_id))
+        await session.commit()
+
+    print(f"clients {clients}  stock {stock}  total {elapsed:.2f}s  {clients / elapsed:.1f} req/s")
+    print(f"latency p50 {p50:.1f} ms  p95 {p95:.1f} ms  p99 {p99:.1f} ms")
+    print(f"responses {dict(sorted(statuses.items()))}")
+    print(f"loans created {loans}  final stock {final_stock}")
+    consistent = loans == statuses[201] == stock - final_stock and final_stock >= 0
+    print("stock consistent" if consistent else "STOCK INCONSISTENT")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.stock))
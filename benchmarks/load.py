@@ -0,0 +1,336 @@
+"""Load and latency benchmark for every API route.
+
+Optionally seeds a synthetic library (users, books, categories, loans and
+reviews) into the database configured by ``DATABASE_URL``, then drives each
+route in-process through the ASGI app at a fixed concurrency. For every route
+it reports throughput, p50/p95/p99 latency and SQL statements per request, and
+writes the numbers to a JSON file; pass a previous file as ``--baseline`` to
+compare two versions.
+
+Writes run before the reads that depend on them and deletes only remove rows
+created by the run itself, so the seeded library can be reused across runs.
+
+Usage::
+
+    DATABASE_URL=sqlite:///bench.db uv run python -m benchmarks.load --create-schema --seed
+    uv run python -m benchmarks.load --concurrency 20 --requests 200 --output before.json
+    uv run python -m benchmarks.load --baseline before.json --output after.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Any
+
+from litestar.testing import AsyncTestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app import app
+from app.config import settings
+from app.db import sqlalchemy_config
+from app.models import Book, Category, Loan, Review, User
+from benchmarks.queries import count_queries, install_query_counter
+from benchmarks.seed import SEED_PASSWORD, WORDS, fake_book, seed_library
+
+# Petición a enviar: (método, url, kwargs de httpx) o None si no hay datos para armarla.
+Request = tuple[str, str, dict[str, Any]] | None
+
+
+@dataclass
+class Library:
+    """Ids available to the request builders, plus rows created during the run."""
+
+    users: list[int]
+    books: list[int]
+    categories: list[int]
+    loans: list[int]
+    reviews: list[int]
+    rng: random.Random = field(default_factory=random.Random)
+    created: dict[str, list[int]] = field(default_factory=lambda: {name: [] for name in MODELS})
+    # Base única por ejecución para títulos, isbn, usernames y nombres nuevos.
+    sequence: itertools.count = field(default_factory=lambda: itertools.count(int(time.time()) * 100_000))
+
+    def pick(self, kind: str) -> int:
+        return self.rng.choice(getattr(self, kind))
+
+    def take_created(self, kind: str) -> int | None:
+        return self.created[kind].pop() if self.created[kind] else None
+
+
+@dataclass
+class Route:
+    name: str
+    build: Callable[[Library], Request]
+    # Grupo cuyas filas nuevas se registran al terminar la ruta.
+    creates: str | None = None
+
+
+MODELS = {"users": User, "books": Book, "categories": Category, "loans": Loan, "reviews": Review}
+
+
+def _new_book(lib: Library, relationships: bool = True) -> dict[str, Any]:
+    book = fake_book(next(lib.sequence), lib.rng)
+    book["published_year"] = min(book["published_year"], 2024)
+    # POST /books recibe las relaciones del DTO; /books/batch sólo las columnas.
+    return {**book, "reviews": [], "categories": []} if relationships else book
+
+
+def _import_body(lib: Library, rows: int = 20) -> str:
+    books = [fake_book(next(lib.sequence), lib.rng) for _ in range(rows)]
+    columns = ("title", "author", "isbn", "pages", "published_year", "stock", "language")
+    lines = [",".join(columns)]
+    lines += [",".join(str(book[column]) for column in columns) for book in books]
+    return "\n".join(lines) + "\n"
+
+
+def _delete(group: str, path: str) -> Callable[[Library], Request]:
+    def build(lib: Library) -> Request:
+        created = lib.take_created(group)
+        return None if created is None else ("DELETE", f"{path}/{created}", {})
+
+    return build
+
+
+def _with_created(group: str, build: Callable[[Library, int], Request]) -> Callable[[Library], Request]:
+    def wrapper(lib: Library) -> Request:
+        if not lib.created[group]:
+            return None
+        return build(lib, lib.rng.choice(lib.created[group]))
+
+    return wrapper
+
+
+ROUTES = [
+    # auth
+    Route("POST /auth/login", lambda lib: ("POST", "/auth/login", {"data": {"username": f"user{lib.rng.randrange(min(10, len(lib.users)))}", "password": SEED_PASSWORD}})),
+    Route("GET /auth/user-cache", lambda lib: ("GET", "/auth/user-cache", {})),
+    # escrituras que generan filas para los endpoints siguientes
+    Route("POST /users", lambda lib: ("POST", "/users/", {"json": {"username": f"bench{(n := next(lib.sequence))}", "fullname": "Bench User", "password": SEED_PASSWORD, "email": f"bench{n}@example.com", "reviews": []}}), creates="users"),
+    Route("POST /categories", lambda lib: ("POST", "/categories/", {"json": {"name": f"{lib.rng.choice(WORDS).title()} {next(lib.sequence)}", "books": []}}), creates="categories"),
+    Route("POST /books", lambda lib: ("POST", "/books/", {"json": _new_book(lib)}), creates="books"),
+    Route("POST /books/import", lambda lib: ("POST", "/books/import", {"content": _import_body(lib), "headers": {"Content-Type": "text/csv"}}), creates="books"),
+    Route("POST /books/batch", lambda lib: ("POST", "/books/batch", {"json": {"create": [_new_book(lib, relationships=False) for _ in range(20)]}}), creates="books"),
+    Route("POST /loans", lambda lib: ("POST", "/loans/", {"json": {"user_id": lib.pick("users"), "book_id": lib.pick("books"), "loan_dt": datetime.now(UTC).date().isoformat()}}), creates="loans"),
+    Route("POST /loans/batch", lambda lib: ("POST", "/loans/batch", {"json": {"create": [{"user_id": lib.pick("users"), "book_id": lib.pick("books")} for _ in range(20)]}}), creates="loans"),
+    Route("POST /reviews", lambda lib: ("POST", "/reviews/", {"json": {"user_id": lib.pick("users"), "book_id": lib.pick("books"), "rating": lib.rng.randint(1, 5), "comment": "benchmark", "review_date": datetime.now(UTC).date().isoformat()}}), creates="reviews"),
+    # lecturas
+    Route("GET /users", lambda lib: ("GET", "/users/", {})),
+    Route("GET /users/{id}", lambda lib: ("GET", f"/users/{lib.pick('users')}", {})),
+    Route("GET /books", lambda lib: ("GET", "/books/", {})),
+    Route("GET /books?fields", lambda lib: ("GET", "/books/", {"params": {"fields": "id,title,author"}})),
+    Route("GET /books?category", lambda lib: ("GET", "/books/", {"params": {"category": [lib.pick("categories") for _ in range(2)], "facets": "true"}})),
+    Route("GET /books/{id}", lambda lib: ("GET", f"/books/{lib.pick('books')}", {})),
+    Route("GET /books/search", lambda lib: ("GET", "/books/search/", {"params": {"q": " ".join(lib.rng.choices(WORDS, k=lib.rng.randint(1, 2)))}})),
+    Route("GET /books/filter", lambda lib: ("GET", "/books/filter", {"params": {"from": (year := lib.rng.randint(1800, 2020)), "to": year + 2}})),
+    Route("GET /books/recent", lambda lib: ("GET", "/books/recent", {})),
+    Route("GET /books/stats", lambda lib: ("GET", "/books/stats", {})),
+    Route("GET /books/export", lambda lib: ("GET", "/books/export", {})),
+    Route("GET /books/{id}/rating", lambda lib: ("GET", f"/books/{lib.pick('books')}/rating", {})),
+    Route("GET /books/ratings", lambda lib: ("GET", "/books/ratings", {"params": {"ids": lib.rng.sample(lib.books, min(20, len(lib.books)))}})),
+    Route("GET /categories", lambda lib: ("GET", "/categories/", {})),
+    Route("GET /categories?with_counts", lambda lib: ("GET", "/categories/", {"params": {"with_counts": "true"}})),
+    Route("GET /categories/{id}", lambda lib: ("GET", f"/categories/{lib.pick('categories')}", {})),
+    Route("GET /loans", lambda lib: ("GET", "/loans/", {})),
+    Route("GET /loans/{id}", lambda lib: ("GET", f"/loans/{lib.pick('loans')}", {})),
+    Route("GET /loans/export", lambda lib: ("GET", "/loans/export", {})),
+    Route("GET /reviews", lambda lib: ("GET", "/reviews/", {})),
+    Route("GET /reviews/{id}", lambda lib: ("GET", f"/reviews/{lib.pick('reviews')}", {})),
+    Route("GET /reviews/export", lambda lib: ("GET", "/reviews/export", {})),
+    # actualizaciones
+    Route("PATCH /users/{id}", _with_created("users", lambda lib, id: ("PATCH", f"/users/{id}", {"json": {"fullname": f"Bench {lib.rng.random():.6f}"}}))),
+    Route("POST /users/{id}/update-password", _with_created("users", lambda lib, id: ("POST", f"/users/{id}/update-password", {"json": {"current_password": SEED_PASSWORD, "new_password": SEED_PASSWORD}}))),
+    Route("PATCH /categories/{id}", _with_created("categories", lambda lib, id: ("PATCH", f"/categories/{id}", {"json": {"name": f"{lib.rng.choice(WORDS).title()} {next(lib.sequence)}"}}))),
+    Route("PATCH /books/{id}", lambda lib: ("PATCH", f"/books/{lib.pick('books')}", {"json": {"stock": lib.rng.randint(1, 10)}})),
+    Route("POST /books/{id}/assign-categories", _with_created("books", lambda lib, id: ("POST", f"/books/{id}/assign-categories", {"params": {"category_ids": lib.rng.sample(lib.categories, min(2, len(lib.categories)))}}))),
+    Route("POST /books/assign-categories", lambda lib: ("POST", "/books/assign-categories", {"json": {"book_ids": lib.created["books"][:100], "add": lib.rng.sample(lib.categories, min(2, len(lib.categories)))}}) if lib.created["books"] else None),
+    Route("PATCH /loans/{id}", _with_created("loans", lambda lib, id: ("PATCH", f"/loans/{id}", {"json": {"status": lib.rng.choice(["ACTIVE", "RETURNED"])}}))),
+    Route("PATCH /reviews/{id}", _with_created("reviews", lambda lib, id: ("PATCH", f"/reviews/{id}", {"json": {"rating": lib.rng.randint(1, 5)}}))),
+    # borrados: sólo filas creadas en esta ejecución, dependientes primero
+    Route("DELETE /reviews/{id}", _delete("reviews", "/reviews")),
+    Route("DELETE /loans/{id}", _delete("loans", "/loans")),
+    Route("DELETE /books/{id}", _delete("books", "/books")),
+    Route("DELETE /categories/{id}", _delete("categories", "/categories")),
+    Route("DELETE /users/{id}", _delete("users", "/users")),
+]
+
+
+def _percentile(quantiles: list[float], p: int) -> float:
+    return quantiles[p - 1] * 1000 if quantiles else 0.0
+
+
+async def _run_route(
+    client: AsyncTestClient, route: Route, lib: Library, requests: int, concurrency: int
+) -> dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    queries: list[int] = []
+    statuses: Counter[int] = Counter()
+    skipped = 0
+
+    async def one() -> None:
+        nonlocal skipped
+        request = route.build(lib)
+        if request is None:
+            skipped += 1
+            return
+        method, url, kwargs = request
+        async with semaphore:
+            with count_queries() as counter:
+                start = time.perf_counter()
+                response = await client.request(method, url, **kwargs)
+                latencies.append(time.perf_counter() - start)
+        queries.append(counter.count)
+        statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "skipped": skipped,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": _percentile(quantiles, 50),
+        "p95_ms": _percentile(quantiles, 95),
+        "p99_ms": _percentile(quantiles, 99),
+        "queries_per_request": statistics.mean(queries) if queries else 0.0,
+    }
+
+
+async def _load_library(sample: int, seed: int) -> Library:
+    async with sqlalchemy_config.get_session() as session:
+        ids = {
+            name: list(await session.scalars(select(model.id).order_by(model.id.desc()).limit(sample)))
+            for name, model in MODELS.items()
+        }
+    return Library(**ids, rng=random.Random(seed))
+
+
+async def _record_created(lib: Library, group: str) -> None:
+    # No todos los DTO de lectura exponen el id, así que las filas nuevas se leen de la base.
+    model = MODELS[group]
+    seeded = getattr(lib, group)
+    async with sqlalchemy_config.get_session() as session:
+        statement = select(model.id).where(model.id > max(seeded, default=0))
+        lib.created[group] = list(await session.scalars(statement))
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_results(results: dict[str, dict[str, Any]], baseline: dict[str, dict[str, Any]]) -> None:
+    print(f"{'route':<36} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/req':>6} {'errors':>6}")
+    for name, row in results.items():
+        line = (
+            f"{name:<36} {row['throughput']:9.1f} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f} "
+            f"{row['p99_ms']:8.2f} {row['queries_per_request']:6.1f} {row['errors']:6d}"
+        )
+        previous = baseline.get(name)
+        if previous and previous["throughput"] and previous["p95_ms"]:
+            line += (
+                f"   req/s {(row['throughput'] / previous['throughput'] - 1) * 100:+6.1f}%"
+                f"  p95 {(row['p95_ms'] / previous['p95_ms'] - 1) * 100:+6.1f}%"
+                f"  q/req {row['queries_per_request'] - previous['queries_per_request']:+5.1f}"
+            )
+        print(line)
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.create_schema or args.seed:
+        engine = create_engine(settings.database_url)
+        if args.create_schema:
+            # En PostgreSQL conviene usar `alembic upgrade head` (extensiones e índices).
+            Book.metadata.create_all(engine)
+        if args.seed:
+            with Session(engine) as session:
+                seed_library(
+                    session,
+                    users=args.users,
+                    books=args.books,
+                    categories=args.categories,
+                    loans=args.loans,
+                    reviews=args.reviews,
+                )
+        engine.dispose()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    install_query_counter(sqlalchemy_config.get_engine())
+    lib = await _load_library(args.sample, args.random_seed)
+    if not lib.users or not lib.books:
+        raise SystemExit("La base de datos está vacía: ejecuta con --seed primero.")
+
+    routes = [route for route in ROUTES if not args.routes or any(part in route.name for part in args.routes)]
+    results: dict[str, dict[str, Any]] = {}
+    async with AsyncTestClient(app=app) as client:
+        login = await client.post("/auth/login", data={"username": "user0", "password": SEED_PASSWORD})
+        login.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+
+        for route in routes:
+            results[route.name] = await _run_route(client, route, lib, args.requests, args.concurrency)
+            if route.creates:
+                await _record_created(lib, route.creates)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["routes"]
+    _print_results(results, baseline)
+
+    if args.output:
+        document = {
+            "meta": {
+                "timestamp": datetime.now(UTC).isoformat(),
+                "revision": _git_revision(),
+                "python": platform.python_version(),
+                "database": sqlalchemy_config.get_engine().dialect.name,
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "library": {name: len(getattr(lib, name)) for name in MODELS},
+            },
+            "routes": results,
+        }
+        with open(args.output, "w") as file:
+            json.dump(document, file, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--create-schema", action="store_true", help="create the tables with metadata.create_all")
+    parser.add_argument("--seed", action="store_true", help="insert the synthetic library before running")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--loans", type=int, default=20000)
+    parser.add_argument("--reviews", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--routes", nargs="*", help="only run routes whose name contains one of these")
+    parser.add_argument("--sample", type=int, default=10000, help="ids per table the requests pick from")
+    parser.add_argument("--random-seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    asyncio.run(main(parser.parse_args()))
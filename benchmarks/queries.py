@@ -0,0 +1,77 @@
+"""Count the SQL statements executed by a block of async code.
+
+The counter lives in a context variable, so concurrent requests driven from
+different tasks are counted separately even though they share one engine.
+
+Usage::
+
+    install_query_counter(engine)
+    with count_queries() as counter:
+        await client.get("/books/1")
+    print(counter.count)
+
+``assert_constant_queries`` uses it to check that an endpoint runs the same
+number of statements whatever the size of its result, i.e. that it has no N+1.
+"""
+
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+@dataclass
+class QueryCounter:
+    count: int = 0
+
+
+_current: ContextVar[QueryCounter | None] = ContextVar("query_counter", default=None)
+
+
+def _before_cursor_execute(*_) -> None:
+    counter = _current.get()
+    if counter is not None:
+        counter.count += 1
+
+
+def install_query_counter(engine: AsyncEngine) -> None:
+    """Attach the counting listener to ``engine`` (idempotent)."""
+    if not event.contains(engine.sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """Count statements run by the current task (and tasks it spawns) inside the block."""
+    counter = QueryCounter()
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+
+async def assert_constant_queries(
+    client: AsyncClient, path: str, param: str, values: Sequence[Any], **params: Any
+) -> int:
+    """Request ``path`` once per value of ``param`` and check every request ran the same number of statements.
+
+    ``values`` should make the (non-empty) result size vary, e.g. ``limit``
+    of 1, 10 and 100. A warm-up request comes first so one-off queries such as
+    the authenticated-user lookup are not counted. Returns the statement
+    count; raises ``AssertionError`` if it changes with the value.
+    """
+    (await client.get(path, params={**params, param: values[0]})).raise_for_status()
+    counts = []
+    for value in values:
+        with count_queries() as counter:
+            (await client.get(path, params={**params, param: value})).raise_for_status()
+        counts.append(counter.count)
+    if len(set(counts)) > 1:
+        raise AssertionError(f"{path}: {counts} queries for {param}={list(values)}")
+    return counts[0]
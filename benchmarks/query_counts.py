@@ -0,0 +1,66 @@
+"""Check that read endpoints run a constant number of queries (no N+1).
+
+Requests every list-style endpoint with growing result sizes against the
+configured database and fails if the number of SQL statements changes with
+the size. Needs a seeded database (see ``benchmarks.load --seed``).
+
+Usage::
+
+    uv run python -m benchmarks.query_counts
+"""
+
+import asyncio
+import logging
+import sys
+
+from litestar.testing import AsyncTestClient
+from sqlalchemy import select
+
+from app import app
+from app.db import sqlalchemy_config
+from app.models import Book, User
+from app.security import oauth2_auth
+from benchmarks.queries import assert_constant_queries, install_query_counter
+
+# selectinload agrupa los ids de a 500, así que los tamaños se mantienen por debajo.
+SIZES = (1, 10, 100)
+
+
+async def main() -> int:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    install_query_counter(sqlalchemy_config.get_engine())
+
+    async with sqlalchemy_config.get_session() as session:
+        username = await session.scalar(select(User.username).limit(1))
+        book_ids = list(await session.scalars(select(Book.id).limit(max(SIZES))))
+    if username is None:
+        raise SystemExit("No hay usuarios: ejecuta `benchmarks.load --seed` primero.")
+
+    checks = [
+        ("/books/", "limit", SIZES, {}),
+        ("/books/search/", "limit", SIZES, {"q": "an"}),
+        ("/books/filter", "to", (1800, 1805, 1840), {"from": 1800}),
+        ("/books/recent", "limit", (1, 10, 50), {}),
+        ("/books/ratings", "ids", [book_ids[:size] for size in SIZES], {}),
+        ("/categories/", "limit", SIZES, {}),
+        ("/loans/", "limit", SIZES, {}),
+        ("/reviews/", "limit", SIZES, {}),
+        ("/users/", "limit", SIZES, {}),
+    ]
+
+    failed = False
+    async with AsyncTestClient(app=app) as client:
+        client.headers["Authorization"] = f"Bearer {oauth2_auth.create_token(identifier=username)}"
+        for path, param, values, params in checks:
+            try:
+                count = await assert_constant_queries(client, path, param, values, **params)
+            except AssertionError as exc:
+                failed = True
+                print(f"FAIL {exc}")
+            else:
+                print(f"ok   {path:<20} {count} queries")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,69 @@
+"""Book search benchmark on a large synthetic catalog.
+
+Compares the previous ``title ILIKE '%q%'`` query with
+``BookRepository.search_page`` (full-text + trigram on PostgreSQL).
+
+Usage::
+
+    uv run python -m benchmarks.search --seed 200000 --runs 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Book
+from app.repositories.book import BookRepository
+from benchmarks.seed import seed_books
+
+QUERIES = ["shadow", "garden empire", "wolf", "mountian", "garcia", "lost crown", "Penguin"]
+
+
+def _report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    print(f"{name:>8}: mean {statistics.mean(timings) * 1000:8.2f} ms  p95 {p95 * 1000:8.2f} ms")
+
+
+async def main(seed: int, runs: int, limit: int) -> None:
+    if seed:
+        engine = create_engine(settings.database_url)
+        with Session(engine) as session:
+            seed_books(session, seed)
+        engine.dispose()
+
+    async_engine = create_async_engine(settings.async_url)
+    async with AsyncSession(async_engine) as session:
+        repo = BookRepository(session=session)
+        print(f"catalog: {await repo.count()} books")
+
+        legacy, search = [], []
+        for _ in range(runs):
+            for query in QUERIES:
+                start = time.perf_counter()
+                await session.scalars(select(Book).where(Book.title.ilike(f"%{query}%")).limit(limit))
+                legacy.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                await repo.search_page(query, cursor=None, limit=limit)
+                search.append(time.perf_counter() - start)
+
+        _report("ilike", legacy)
+        _report("search", search)
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0, help="synthetic books to insert first")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.seed, args.runs, args.limit))
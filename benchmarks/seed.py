@@ -0,0 +1,198 @@
+"""Synthetic data seeding for the benchmarks."""
+
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import (
+    RATING_VALUES,
+    Book,
+    Category,
+    Loan,
+    LoanStatus,
+    Review,
+    User,
+    book_ratings,
+    books_categories,
+    review_counts,
+)
+from app.passwords import password_hasher
+
+# Todos los usuarios sintéticos comparten esta contraseña.
+SEED_PASSWORD = "benchmark"
+
+WORDS = (
+    "shadow river night garden empire silent winter stone crown secret house ocean "
+    "fire glass memory city forest queen storm letter journey island light dream "
+    "iron wolf mountain star mirror broken golden last lost hidden ancient"
+).split()
+NAMES = (
+    "garcia smith muller rossi silva dubois martin lopez weber russo costa bernard "
+    "gonzalez brown schmidt ferrari santos moreau rodriguez jones"
+).split()
+PUBLISHERS = ["Planeta", "Penguin", "Gallimard", "Suhrkamp", "Mondadori", "Porto Editora", None]
+LANGUAGES = ["es", "en", "fr", "de", "it", "pt"]
+
+
+def fake_book(index: int, rng: random.Random) -> dict:
+    """Build the column values of a synthetic book; ``index`` keeps title and isbn unique."""
+    return {
+        "title": f"{' '.join(rng.choices(WORDS, k=rng.randint(2, 5))).title()} {index}",
+        "author": f"{rng.choice(NAMES).title()} {rng.choice(NAMES).title()}",
+        "isbn": f"978{index:010d}",
+        "pages": rng.randint(50, 1200),
+        "published_year": rng.randint(1800, 2024),
+        "stock": rng.randint(1, 10),
+        "description": " ".join(rng.choices(WORDS, k=30)),
+        "language": rng.choice(LANGUAGES),
+        "publisher": rng.choice(PUBLISHERS),
+    }
+
+
+def seed_books(session: Session, count: int, batch_size: int = 5000, seed: int = 0) -> None:
+    """Insert ``count`` synthetic books in batches of ``batch_size``."""
+    rng = random.Random(seed)
+    start = session.query(Book).count()
+    for batch_start in range(start, start + count, batch_size):
+        batch_end = min(batch_start + batch_size, start + count)
+        session.execute(insert(Book), [fake_book(i, rng) for i in range(batch_start, batch_end)])
+        session.commit()
+
+
+def _ids(session: Session, model) -> list[int]:
+    return list(session.scalars(select(model.id)))
+
+
+def _insert_batches(session: Session, table, rows, batch_size: int) -> None:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            session.execute(insert(table), batch)
+            batch = []
+    if batch:
+        session.execute(insert(table), batch)
+    session.commit()
+
+
+def seed_library(
+    session: Session,
+    *,
+    users: int,
+    books: int,
+    categories: int,
+    loans: int,
+    reviews: int,
+    batch_size: int = 5000,
+    seed: int = 0,
+) -> None:
+    """Insert a synthetic library on top of whatever the database already holds.
+
+    Users are named ``user<n>`` and all share ``SEED_PASSWORD``. Each book gets
+    one to three categories; loans and reviews pick random users and books.
+    """
+    rng = random.Random(seed)
+    # Un solo hash: Argon2 por usuario haría que sembrar tarde minutos.
+    password = password_hasher.hash(SEED_PASSWORD)
+
+    start = session.scalar(select(func.count()).select_from(User))
+    _insert_batches(
+        session,
+        User,
+        (
+            {
+                "username": f"user{i}",
+                "fullname": f"{rng.choice(NAMES).title()} {rng.choice(NAMES).title()}",
+                "password": password,
+                "email": f"user{i}@example.com",
+            }
+            for i in range(start, start + users)
+        ),
+        batch_size,
+    )
+
+    start = session.scalar(select(func.count()).select_from(Category))
+    _insert_batches(
+        session,
+        Category,
+        ({"name": f"{rng.choice(WORDS).title()} {i}"} for i in range(start, start + categories)),
+        batch_size,
+    )
+
+    seed_books(session, books, batch_size=batch_size, seed=seed)
+
+    user_ids, book_ids, category_ids = _ids(session, User), _ids(session, Book), _ids(session, Category)
+    if not user_ids or not book_ids:
+        return
+
+    if category_ids:
+        linked = set(session.scalars(select(books_categories.c.book_id).distinct()))
+        _insert_batches(
+            session,
+            books_categories,
+            (
+                {"book_id": book_id, "category_id": category_id}
+                for book_id in book_ids
+                if book_id not in linked
+                for category_id in rng.sample(category_ids, min(len(category_ids), rng.randint(1, 3)))
+            ),
+            batch_size,
+        )
+
+    today = date.today()
+
+    def fake_loan() -> dict:
+        loan_dt = today - timedelta(days=rng.randint(0, 730))
+        due_date = loan_dt + timedelta(days=14)
+        status = LoanStatus.RETURNED if rng.random() < 0.7 else LoanStatus.ACTIVE
+        return {
+            "user_id": rng.choice(user_ids),
+            "book_id": rng.choice(book_ids),
+            "loan_dt": loan_dt,
+            "return_dt": loan_dt + timedelta(days=rng.randint(1, 30)) if status == LoanStatus.RETURNED else None,
+            "due_date": due_date,
+            "status": status,
+        }
+
+    _insert_batches(session, Loan, (fake_loan() for _ in range(loans)), batch_size)
+    _insert_batches(
+        session,
+        Review,
+        (
+            {
+                "user_id": rng.choice(user_ids),
+                "book_id": rng.choice(book_ids),
+                "rating": rng.randint(1, 5),
+                "comment": " ".join(rng.choices(WORDS, k=rng.randint(5, 20))),
+                "review_date": today - timedelta(days=rng.randint(0, 730)),
+            }
+            for _ in range(reviews)
+        ),
+        batch_size,
+    )
+    rebuild_review_aggregates(session)
+
+
+def rebuild_review_aggregates(session: Session) -> None:
+    """Recompute ``book_ratings`` and ``review_counts`` from the reviews table.
+
+    Rows inserted in bulk bypass ``ReviewRepository``, which normally keeps them in sync.
+    """
+    session.execute(delete(book_ratings))
+    session.execute(delete(review_counts))
+    buckets = [func.sum(case((Review.rating == value, 1), else_=0)) for value in RATING_VALUES]
+    session.execute(
+        insert(book_ratings).from_select(
+            ["book_id", "review_count", "rating_sum", *(f"rating_{value}" for value in RATING_VALUES)],
+            select(Review.book_id, func.count(), func.sum(Review.rating), *buckets).group_by(Review.book_id),
+        )
+    )
+    session.execute(
+        insert(review_counts).from_select(
+            ["user_id", "book_id", "review_count"],
+            select(Review.user_id, Review.book_id, func.count()).group_by(Review.user_id, Review.book_id),
+        )
+    )
+    session.commit()
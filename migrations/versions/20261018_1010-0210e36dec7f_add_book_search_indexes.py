@@ -0,0 +1,76 @@
+"""add book search indexes
+
+Revision ID: 0210e36dec7f
+Revises: f817f96fe6ec
+Create Date: 2026-10-18 10:10:41.512230
+
+"""
+from typing import Sequence, Union
+
+import advanced_alchemy
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0210e36dec7f'
+down_revision: Union[str, Sequence[str], None] = 'f817f96fe6ec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Debe coincidir con app.models.book_search_document()
+BOOK_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A')"
+    " || setweight(to_tsvector('simple'::regconfig, coalesce(author, '')), 'B')"
+    " || setweight(to_tsvector('simple'::regconfig, coalesce(publisher, '')), 'C')"
+    " || setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'D')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Búsqueda full-text y por trigramas solo en PostgreSQL; SQLite usa LIKE.
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CONCURRENTLY no puede correr dentro de una transacción.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_books_search",
+            "books",
+            [sa.text(f"({BOOK_SEARCH_DOCUMENT})")],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_books_title_trgm",
+            "books",
+            ["title"],
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_books_author_trgm",
+            "books",
+            ["author"],
+            postgresql_using="gin",
+            postgresql_ops={"author": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_books_author_trgm", table_name="books", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_books_title_trgm", table_name="books", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_books_search", table_name="books", postgresql_concurrently=True, if_exists=True)
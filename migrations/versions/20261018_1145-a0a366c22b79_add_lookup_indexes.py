@@ -0,0 +1,60 @@
+"""add lookup indexes
+
+Revision ID: a0a366c22b79
+Revises: 0210e36dec7f
+Create Date: 2026-10-18 11:45:02.118406
+
+"""
+from typing import Sequence, Union
+
+import advanced_alchemy
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a0a366c22b79'
+down_revision: Union[str, Sequence[str], None] = '0210e36dec7f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_LOANS = sa.text("status = 'ACTIVE'")
+
+# (nombre, tabla, columnas, opciones extra)
+INDEXES = [
+    # filter_books_by_year / get_recent_books
+    ("ix_books_published_year", "books", ["published_year"], {}),
+    ("ix_books_created_at_id", "books", ["created_at", "id"], {}),
+    # FKs de loans + préstamos activos por usuario/libro
+    ("ix_loans_user_id_status", "loans", ["user_id", "status"], {}),
+    ("ix_loans_book_id_status", "loans", ["book_id", "status"], {}),
+    ("ix_loans_active_due_date", "loans", ["due_date"], {"postgresql_where": ACTIVE_LOANS, "sqlite_where": ACTIVE_LOANS}),
+    # conteo de reseñas por (libro, usuario) en create_review + FKs
+    ("ix_reviews_book_id_user_id", "reviews", ["book_id", "user_id"], {}),
+    ("ix_reviews_user_id", "reviews", ["user_id"], {}),
+    # libros de una categoría
+    ("ix_books_categories_category_id_book_id", "books_categories", ["category_id", "book_id"], {}),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY no bloquea escrituras en tablas grandes, pero
+    # no puede correr dentro de una transacción.
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **options,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
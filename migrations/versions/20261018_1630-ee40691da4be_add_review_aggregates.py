@@ -0,0 +1,105 @@
+"""add review aggregates
+
+Revision ID: ee40691da4be
+Revises: a0a366c22b79
+Create Date: 2026-10-18 16:30:11.402115
+
+"""
+import logging
+from typing import Sequence, Union
+
+import advanced_alchemy
+import sqlalchemy as sa
+from alembic import op
+
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# revision identifiers, used by Alembic.
+revision: str = 'ee40691da4be'
+down_revision: Union[str, Sequence[str], None] = 'a0a366c22b79'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # El PATCH no validaba el rating: puede haber reseñas antiguas fuera de 1..5.
+    # No se modifican; se informan y quedan fuera de los agregados.
+    bind = op.get_bind()
+    invalid = bind.execute(sa.text("SELECT COUNT(*) FROM reviews WHERE rating NOT BETWEEN 1 AND 5")).scalar_one()
+    if invalid:
+        ids = bind.execute(
+            sa.text("SELECT id FROM reviews WHERE rating NOT BETWEEN 1 AND 5 ORDER BY id LIMIT 20")
+        ).scalars()
+        logger.warning(
+            "%d reviews have a rating outside 1..5 and are left out of book_ratings (ids: %s%s)",
+            invalid,
+            ", ".join(map(str, ids)),
+            ", ..." if invalid > 20 else "",
+        )
+    if bind.dialect.name == "postgresql":
+        # NOT VALID: se exige a las escrituras nuevas sin revisar las filas existentes.
+        # Tras corregirlas: ALTER TABLE reviews VALIDATE CONSTRAINT ck_reviews_rating_range.
+        op.execute(
+            "ALTER TABLE reviews ADD CONSTRAINT ck_reviews_rating_range CHECK (rating BETWEEN 1 AND 5) NOT VALID"
+        )
+    elif invalid:
+        raise RuntimeError(
+            f"{invalid} reseñas tienen un rating fuera de 1..5; corregirlas antes de migrar "
+            "(esta base no admite una restricción CHECK sin validar)."
+        )
+    else:
+        with op.batch_alter_table("reviews") as batch_op:
+            batch_op.create_check_constraint(op.f("ck_reviews_rating_range"), "rating BETWEEN 1 AND 5")
+
+    op.create_table(
+        "book_ratings",
+        sa.Column("book_id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False),
+        sa.Column("review_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("rating_sum", sa.Integer(), server_default="0", nullable=False),
+        *(sa.Column(f"rating_{value}", sa.Integer(), server_default="0", nullable=False) for value in range(1, 6)),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("book_id"),
+    )
+    op.create_table(
+        "review_counts",
+        sa.Column("user_id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False),
+        sa.Column("book_id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False),
+        sa.Column("review_count", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["book_id"], ["books.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "book_id"),
+    )
+
+    # Carga inicial desde las reseñas existentes.
+    op.execute(
+        """
+        INSERT INTO book_ratings (book_id, review_count, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5)
+        SELECT book_id, COUNT(*), SUM(rating),
+               SUM(CASE WHEN rating = 1 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN rating = 2 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN rating = 3 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN rating = 4 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN rating = 5 THEN 1 ELSE 0 END)
+        FROM reviews
+        WHERE rating BETWEEN 1 AND 5
+        GROUP BY book_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO review_counts (user_id, book_id, review_count)
+        SELECT user_id, book_id, COUNT(*)
+        FROM reviews
+        GROUP BY user_id, book_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("review_counts")
+    op.drop_table("book_ratings")
+    with op.batch_alter_table("reviews") as batch_op:
+        batch_op.drop_constraint(op.f("ck_reviews_rating_range"), type_="check")
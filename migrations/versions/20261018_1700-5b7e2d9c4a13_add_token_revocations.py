@@ -0,0 +1,36 @@
+"""add token revocations
+
+Revision ID: 5b7e2d9c4a13
+Revises: ee40691da4be
+Create Date: 2026-10-18 17:00:42.118305
+
+"""
+from typing import Sequence, Union
+
+import advanced_alchemy
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2d9c4a13'
+down_revision: Union[str, Sequence[str], None] = 'ee40691da4be'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "token_revocations",
+        sa.Column("user_id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False),
+        sa.Column("revoked_at", advanced_alchemy.types.datetime.DateTimeUTC(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "revoked_at"),
+    )
+    op.create_index("ix_token_revocations_revoked_at", "token_revocations", ["revoked_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_token_revocations_revoked_at", table_name="token_revocations")
+    op.drop_table("token_revocations")